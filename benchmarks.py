@@ -0,0 +1,350 @@
+'''
+This is a script file that measures the performance of the hot paths of the games in
+'blackjack.py' and 'ticTacToe.py'. For every benchmark it reports the operations per second
+and the memory allocated per operation, and compares them to the stored baseline: if any
+benchmark is slower or allocates more than the baseline (plus a tolerance) the script fails.
+    python benchmarks.py                   -> run and compare to the baseline
+    python benchmarks.py --save            -> run and store the results as the new baseline
+    python benchmarks.py --filter deck     -> only run the benchmarks whose name contains 'deck'
+All rights reserved.
+'''
+
+# Imports
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from timeit import Timer
+
+import blackjack
+import ticTacToe
+import ticTacToeSelfPlay
+import ticTacToeSolver
+import ticTacToeTablebase
+from ticTacToeBoard import MNKBoard
+from blackjack import Card, Hand, PlayerHand, DealerHand, Player, Table, BasicStrategy, Settlement
+from blackjack import StandardDeck, SixPackDeck, StandardShoe, SixPackShoe
+from blackjackSnapshot import snapshot_table, restore_table
+from terminal import NullFrontend
+
+
+# Global variables
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+
+# Allowed slowdown (fraction of the baseline operations per second) before a benchmark fails
+SPEED_TOLERANCE = 0.3
+# Allowed growth of the memory allocated per operation before a benchmark fails
+ALLOCATION_TOLERANCE = 0.1
+# Number of repetitions of each benchmark (each one lasts at least 0.2 seconds)
+REPEAT = 3
+# Number of operations traced to measure the allocations
+TRACED_OPS = 200
+
+# Cards dealt in a round with one player (about 5.4 on average)
+ROUND_CARDS = 6
+
+# Cards used to build the hands of the benchmarks
+ACES = [Card(suit, 'Ace') for suit in blackjack.SUITS]
+LOW_CARDS = [Card('Hearts', '2'), Card('Spades', '3'), Card('Clubs', '4'), Card('Diamonds', '2')]
+
+# Tic-tac-toe boards used in the benchmarks: empty, in progress, won and full (draw). They are
+# written as the symbols of the positions 1-9 (see 'ticTacToeBoard.py')
+PLAYERS = ('X', 'O')
+BOARD_CELLS = ('         ', 'XO  X   O', 'XXXOO    ', 'XOXXOOOXX')
+
+
+# Script classes
+
+class Benchmark():
+    '''
+    Class that represents a benchmark. 'setup' is called once and returns the function that
+    performs one operation, which is then measured.
+    '''
+    def __init__(self, name, setup):
+        self.name = name
+        self.setup = setup
+
+    def run(self):
+        operation = self.setup()
+        return {
+            'ops_per_sec': measure_speed(operation),
+            'alloc_bytes_per_op': measure_allocations(operation)
+        }
+
+
+# Global functions
+
+def measure_speed(operation):
+    '''
+    Returns the operations per second of the best repetition.
+    '''
+    timer = Timer(operation)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=REPEAT, number=number))
+    return number / best
+
+def measure_allocations(operation):
+    '''
+    Returns the average peak of memory allocated by one operation (in bytes).
+    '''
+    operation()
+    tracemalloc.start()
+    total = 0
+    for _ in range(0, TRACED_OPS):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - before
+    tracemalloc.stop()
+    return total / TRACED_OPS
+
+def build_board(cells, width=3, height=3, k=3):
+    board = MNKBoard(width, height, k)
+    for cell, symbol in enumerate(cells):
+        if symbol in PLAYERS:
+            board.play(cell, PLAYERS.index(symbol))
+    return board
+
+def build_hand(cards, handClass=Hand):
+    hand = handClass()
+    for card in cards:
+        hand.add_card(card)
+    return hand
+
+def deck_shuffle(deckClass):
+    def setup():
+        # the decks shuffled before every hand deal lazily by default, and then shuffling
+        # does nothing (see 'deck_round')
+        return deckClass(lazy=False).shuffle_deck
+    return setup
+
+def deck_round(deckClass):
+    def setup():
+        # a lazy deck does the work of the shuffle while dealing, so it's measured by rounds
+        deck = deckClass(lazy=True)
+        def operation():
+            deck.shuffle_deck()
+            for _ in range(0, ROUND_CARDS):
+                deck.get_card()
+        return operation
+    return setup
+
+def deck_get_card(deckClass):
+    def setup():
+        deck = deckClass()
+        def operation():
+            deck.get_card()
+            if deck.needs_shuffle():
+                deck.shuffle_deck()
+        return operation
+    return setup
+
+def hand_value(numAces):
+    def setup():
+        hand = build_hand(ACES[:numAces] + LOW_CARDS[:max(2 - numAces, 0)])
+        return hand.get_hand_value
+    return setup
+
+def compare_hands():
+    player = Player(0, 100, BasicStrategy())
+    playerHand = build_hand([Card('Hearts', '10'), Card('Spades', '9')], PlayerHand)
+    dealerHand = build_hand([Card('Clubs', '10'), Card('Diamonds', '7')], DealerHand)
+    return lambda: player.compare_hands(dealerHand, playerHand)
+
+def split_hand():
+    cards = [Card('Hearts', '8'), Card('Spades', '8')]
+    return lambda: build_hand(cards, PlayerHand).split_hand()
+
+def table_round(deckType):
+    def setup():
+        players = [Player(0, 0, BasicStrategy())]
+        table = Table(10, 10, deckType, players)
+        def operation():
+            players[0].chips = 1000
+            table.play_round()
+        return operation
+    return setup
+
+def settlement(numSeats):
+    def setup():
+        # every seat has a standing hand, a split pair (one hand doubled) or a natural
+        hands = [[Card('Hearts', '10'), Card('Spades', '9')], [Card('Hearts', 'Ace'), Card('Spades', 'King')],
+            [Card('Clubs', '8'), Card('Diamonds', '3'), Card('Hearts', '10')]]
+        players = []
+        for index in range(0, numSeats):
+            player = Player(index, 0, BasicStrategy())
+            player.hands = [build_hand(cards, PlayerHand) for cards in hands[:1 + index % 3]]
+            for hand in player.hands:
+                hand.bet = 10
+            players.append(player)
+        dealerHand = build_hand([Card('Clubs', '10'), Card('Diamonds', '7'), Card('Hearts', '2')], DealerHand)
+        return lambda: Settlement(dealerHand, players)
+    return setup
+
+def scenario_round(scenarioName):
+    def setup():
+        players = [Player(0, 0, BasicStrategy())]
+        table = Table(10, 10, 1, players)
+        scenario = blackjack.TEST_SCENARIOS[scenarioName]
+        def operation():
+            players[0].chips = 1000
+            table.play_round(scenario)
+        return operation
+    return setup
+
+def table_snapshot(restore):
+    def setup():
+        # a table of three players in the middle of the shoe
+        players = [Player(index, 1000, BasicStrategy()) for index in range(0, 3)]
+        table = Table(10, 10, 1, players)
+        for _ in range(0, 10):
+            table.play_round()
+        if not restore:
+            return lambda: snapshot_table(table)
+        snapshot = snapshot_table(table)
+        return lambda: restore_table(snapshot)
+    return setup
+
+def check_game_status():
+    boards = [build_board(cells) for cells in BOARD_CELLS]
+    return lambda: [ticTacToe.check_game_status(board, PLAYERS) for board in boards]
+
+def board_full():
+    boards = [build_board(cells) for cells in BOARD_CELLS]
+    return lambda: [ticTacToe.board_full(board) for board in boards]
+
+def solver_move():
+    # the moves of a solved game are lookups in the transposition table
+    ticTacToeSolver.SOLVER.solve()
+    boards = [build_board(cells) for cells in BOARD_CELLS[:2]]
+    return lambda: [ticTacToeSolver.best_move(board.masks[0], board.masks[1]) for board in boards]
+
+def tablebase_move():
+    # the best move is a lookup of the position after every free cell
+    tablebase = ticTacToeTablebase.load_tablebase()
+    boards = [build_board(cells) for cells in BOARD_CELLS[:2]]
+    return lambda: [tablebase.best_move(board.masks[0], board.masks[1]) for board in boards]
+
+def gomoku_move():
+    # a stone in the middle of a 15 x 15 board with lines of 4 around it (the win check only
+    # looks at the cells next to it)
+    cells = [' '] * 225
+    for cell in (97, 98, 99, 100, 82, 67, 52, 127, 142, 157):
+        cells[cell] = 'X'
+    for cell in (111, 113, 125, 126, 128, 129, 96, 114):
+        cells[cell] = 'O'
+    board = build_board(cells, 15, 15, 5)
+    def operation():
+        board.play(112, 0)
+        board.undo(112, 0)
+    return operation
+
+def self_play():
+    # a batch of games between random agents (their move tables are built once)
+    agent = ticTacToeSelfPlay.RandomAgent()
+    selfPlay = ticTacToeSelfPlay.SelfPlay(agent, agent, rng=0)
+    agent.move_table()
+    return lambda: selfPlay.run(1000)
+
+BENCHMARKS = [
+    Benchmark('StandardDeck.shuffle_deck', deck_shuffle(StandardDeck)),
+    Benchmark('SixPackDeck.shuffle_deck', deck_shuffle(SixPackDeck)),
+    Benchmark('StandardShoe.shuffle_deck', deck_shuffle(StandardShoe)),
+    Benchmark('SixPackShoe.shuffle_deck', deck_shuffle(SixPackShoe)),
+    Benchmark('SixPackDeck.get_card', deck_get_card(SixPackDeck)),
+    Benchmark('SixPackShoe.get_card', deck_get_card(SixPackShoe)),
+    Benchmark('StandardDeck.deal_round[lazy]', deck_round(StandardDeck)),
+    Benchmark('StandardShoe.deal_round[lazy]', deck_round(StandardShoe))
+] + [
+    Benchmark('Hand.get_hand_value[{0} aces]'.format(numAces), hand_value(numAces))
+    for numAces in range(0, len(ACES) + 1)
+] + [
+    Benchmark('Player.compare_hands', compare_hands),
+    Benchmark('PlayerHand.split_hand', split_hand),
+    Benchmark('Table.play_round[standard]', table_round(0)),
+    Benchmark('Table.play_round[six pack]', table_round(1)),
+    Benchmark('Table.play_round[continuous]', table_round(2)),
+    Benchmark('Table.play_round[scenario]', scenario_round('split-double')),
+    Benchmark('Settlement[7 seats]', settlement(7)),
+    Benchmark('Settlement[256 seats]', settlement(256)),
+    Benchmark('snapshot_table', table_snapshot(False)),
+    Benchmark('restore_table', table_snapshot(True)),
+    Benchmark('ticTacToe.check_game_status', check_game_status),
+    Benchmark('ticTacToe.board_full', board_full),
+    Benchmark('ticTacToeSolver.best_move', solver_move),
+    Benchmark('Tablebase.best_move', tablebase_move),
+    Benchmark('MNKBoard.play[15x15]', gomoku_move),
+    Benchmark('SelfPlay.run[1000 games]', self_play)
+]
+
+def load_baseline():
+    if not os.path.isfile(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as baselineFile:
+        return json.load(baselineFile)
+
+def save_baseline(results):
+    with open(BASELINE_FILE, 'w') as baselineFile:
+        json.dump(results, baselineFile, indent=4, sort_keys=True)
+        baselineFile.write('\n')
+
+def check_regressions(name, result, baseline):
+    '''
+    Returns the list of regressions of the result compared to the baseline.
+    '''
+    regressions = []
+    if name not in baseline:
+        return regressions
+    expected = baseline[name]
+    if result['ops_per_sec'] < expected['ops_per_sec'] * (1 - SPEED_TOLERANCE):
+        regressions.append('{0}: {1:,.0f} ops/sec, baseline {2:,.0f} ops/sec'.format(name,
+            result['ops_per_sec'], expected['ops_per_sec']))
+    allowedBytes = expected['alloc_bytes_per_op'] * (1 + ALLOCATION_TOLERANCE) + 64
+    if result['alloc_bytes_per_op'] > allowedBytes:
+        regressions.append('{0}: {1:,.0f} bytes/op allocated, baseline {2:,.0f} bytes/op'.format(
+            name, result['alloc_bytes_per_op'], expected['alloc_bytes_per_op']))
+    return regressions
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Benchmarks of the games hot paths.')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--filter', default='', help='only run the benchmarks containing this')
+    options = parser.parse_args(args)
+
+    blackjack.set_frontend(NullFrontend())
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+    print('{0:<34} {1:>16} {2:>16} {3:>10}'.format('Benchmark', 'ops/sec', 'bytes/op', 'vs base'))
+    for benchmark in BENCHMARKS:
+        if options.filter not in benchmark.name:
+            continue
+        result = benchmark.run()
+        results[benchmark.name] = result
+        change = ''
+        if benchmark.name in baseline:
+            change = '{0:+.1%}'.format(result['ops_per_sec'] / baseline[benchmark.name]['ops_per_sec'] - 1)
+        print('{0:<34} {1:>16,.0f} {2:>16,.0f} {3:>10}'.format(benchmark.name,
+            result['ops_per_sec'], result['alloc_bytes_per_op'], change))
+        regressions += check_regressions(benchmark.name, result, baseline)
+
+    if options.save:
+        baseline.update(results)
+        save_baseline(baseline)
+        print('Baseline saved to {0}'.format(BASELINE_FILE))
+        return 0
+    if regressions:
+        print('\nREGRESSIONS FOUND:')
+        for regression in regressions:
+            print('  ' + regression)
+        return 1
+    return 0
+
+# Script call to main function
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -5,11 +5,21 @@ All rights reserved.
 
 # Imports
 
-from os import system
+import hashlib
+import re
 from enum import Enum
-from copy import deepcopy
-from random import shuffle
-from random import randint
+from array import array
+from fractions import Fraction
+from itertools import repeat
+from math import lcm
+from sys import argv
+from terminal import AnsiFrontend, NullFrontend
+from randomStreams import RandomStream, PermutationBatch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 # Global variables
@@ -36,18 +46,60 @@ VALUES = {
     'Ace': 11
 }
 
+# Values of the cards when the Aces are counted as 1 point (the 'hard' value)
+HARD_VALUES = {rank: value for (rank, value) in VALUES.items()}
+HARD_VALUES['Ace'] = 1
+# Extra points that an Ace adds to the hand when it is counted as 11
+SOFT_ACE_BONUS = VALUES['Ace'] - HARD_VALUES['Ace']
+
 BLACKJACK = 21
 
-# 'testMode' variable is for testing different game situations.
-# It only works with 1 player!!
-# 0 -> testing mode disabled. Normal game
-# 1 -> split pairs
-# 2 -> double down
-# 3 -> player natural
-# 4 -> player and dealer naturals
-# 5 -> split and double down
-# 6 -> player natural (not dealer natural)
-testMode = 0
+# Maximum number of hands that a player can have in a round by splitting (and re-splitting) pairs
+MAX_SPLIT_HANDS = 4
+
+# Fraction of the six-pack decks that is always dealt before they are shuffled. The 'plastic
+# mark' is placed at random between this point and the end of the decks.
+PENETRATION = 0.8
+
+# Insurance bets are paid 2:1 (see 'Rules')
+INSURANCE_PAYOUT = 2
+
+# Number of hands from which a 'Settlement' is computed with NumPy (when it's installed)
+VECTORIZED_SETTLEMENT = 64
+# Size of the tables of results of a 'Settlement': hard totals go up to 30 (20 + a 10)
+MAX_HAND_VALUE = 31
+# Tables of results of the 'Settlement' by the value of the dealer hand (None for a natural)
+RESULT_TABLES = {}
+# Fields of a hand packed in one number for the vectorized 'Settlement': the value takes the 5
+# lower bits, then the natural and surrendered flags and the bet in the rest
+NATURAL_BIT = 5
+SURRENDERED_BIT = 6
+BET_SHIFT = 7
+# Tables of the vectorized 'Settlement', indexed by the lower bits of the packed hands: the
+# codes of the results (the values of 'HandResult') by the value of the dealer hand, and the
+# payouts per 'denominator' chips bet (numerators, denominator) by the value of the dealer hand
+# and the natural payout
+RESULT_CODE_TABLES = {}
+PAYOUT_TABLES = {}
+
+# Messages shown to the players when their hands are paid (by the name of the 'HandResult')
+RESULT_MESSAGES = {
+    'PLAYER_SURRENDERS': 'Surrendered.',
+    'DEALER_WINS': 'You lose.',
+    'DRAW': 'Draw',
+    'PLAYER_WINS': 'You win!',
+    'PLAYER_NATURAL': 'BLACKJACK!'
+}
+
+# Each card of the standard deck is encoded as a number between 0 and 51 in the shoes:
+# code = suit index * 13 + rank index. 'CARD_CODES' does the opposite translation.
+CARD_CODES = tuple((suit, rank) for suit in SUITS for rank in RANKS)
+
+# 'frontend' shows the game on the screen and reads the input of the players (see 'terminal.py').
+# Use 'set_frontend' to replace it, for example with a 'NullFrontend' to run the game without
+# any human interaction. All the decisions are then taken by the strategy of each player
+# (see the 'Strategy' classes).
+frontend = AnsiFrontend()
 
 # Script classes
 
@@ -55,47 +107,77 @@ class Card():
     '''
     Class to represent cards. Each card has a string representation to be printed on the
     screen when playing the game. It also has a value in points.
+    The value of an Ace is 11, whether it counts as 1 or 11 in a hand is decided by the hand.
+    There are only 52 cards (see 'CARDS'), one for each suit and rank, which are shared by all
+    the decks and hands: 'Card(suit, rank)' returns the existing card and the cards can't be
+    modified. Everything the game needs to know about a card is computed when it's created:
+    its 'code' (see 'CARD_CODES'), the 'ordinal' of its rank and its points ('points' counts
+    the Aces as 11 and 'hard_points' as 1).
     '''
-    def __init__(self, suit, rank, hand=None):
-        self.suit = suit
-        self.rank = rank
-        self.hand = hand
-        
+    __slots__ = ('suit', 'rank', 'code', 'ordinal', 'points', 'hard_points')
+
+    def __new__(cls, suit, rank):
+        try:
+            return CARDS_BY_NAME[suit, rank]
+        except KeyError:
+            raise ValueError('There is no {0} of {1} in the deck.'.format(rank, suit))
+
+    @classmethod
+    def __create_all__(cls):
+        '''
+        Creates the 52 cards, ordered by their code.
+        '''
+        cards = []
+        for code, (suit, rank) in enumerate(CARD_CODES):
+            card = object.__new__(cls)
+            for name, value in (('suit', suit), ('rank', rank), ('code', code),
+                    ('ordinal', RANKS.index(rank)), ('points', VALUES[rank]),
+                    ('hard_points', HARD_VALUES[rank])):
+                object.__setattr__(card, name, value)
+            cards.append(card)
+        return tuple(cards)
+
     def value(self):
-        if self.rank == 'Ace':
-            return self.__get_ace_value__()
-        return VALUES[self.rank]
+        return self.points
 
-    def set_hand(self, hand):
-        self.hand = hand
+    def hard_value(self):
+        return self.hard_points
 
-    def __get_ace_value__(self):
-        if self.hand.dirtyTotal:
-            return self.__one_or_eleven__(self.hand.totalValue)
-        else:
-            handValue = 0
-            for card in self.hand.get_cards():
-                if card is not self:
-                    if card.rank != 'Ace':
-                        handValue += card.value()
-                    else:
-                        handValue += self.__one_or_eleven__(handValue)
-            # now we have the value of all the cards in handValue except for this 'self' card
-            return self.hand.totalValue - handValue
-
-    def __one_or_eleven__(self, handValue):
-        if handValue + 11 > BLACKJACK:
-            return 1
-        return 11
+    def __setattr__(self, name, value):
+        raise AttributeError('Cards can\'t be modified.')
+
+    def __delattr__(self, name):
+        raise AttributeError('Cards can\'t be modified.')
+
+    def __reduce__(self):
+        # copies and unpickled cards are the same shared card
+        return (Card, (self.suit, self.rank))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return self.rank + " " + self.suit
+
+    def __repr__(self):
+        return 'Card({0!r}, {1!r})'.format(self.suit, self.rank)
     
     def __eq__(self, other):
         if not isinstance(other, Card):
             # don't attempt to compare against unrelated types
             return NotImplemented
-        return self.suit == other.suit and self.rank == other.rank
+        # there is a single card of each suit and rank
+        return self is other
+
+    def __hash__(self):
+        return self.code
+
+# All the cards, indexed by their code, and by (suit, rank)
+CARDS = Card.__create_all__()
+CARDS_BY_NAME = {(card.suit, card.rank): card for card in CARDS}
 
 class Deck():
     '''
@@ -105,44 +187,77 @@ class Deck():
     needs to be done (when the current hand has finished the deck is shuffled).
     There are to different types of decks depending on the type of game that the players want
     to play. See the classes that inherit from this one to know the differences in each of them.
+    The counters added to the deck are told about every card dealt ('card_dealt(code)') and
+    every shuffle ('shuffled(deck)'), see 'blackjackCounting.py'.
+    The deck is shuffled with its own random stream ('rng', see 'randomStreams.py'), so the
+    same stream always deals the same cards.
+    In 'lazy' mode the deck is not shuffled: the discarded cards are just put back and every
+    card dealt is picked at random from the rest (a step of the Fisher-Yates shuffle), so a
+    round costs as much as the cards dealt instead of the whole deck. The decks that are
+    shuffled before every hand use it by default ('LAZY').
     '''
     CARDS_IN_DECK = 52
+    LAZY = False
     
-    def __init__(self):
+    def __init__(self, rng=None, lazy=None):
         self.cards = []
         self.discarded = []
+        self.counters = []
+        self.rng = rng if rng is not None else RandomStream()
+        self.lazy = self.LAZY if lazy is None else lazy
+        # number of cards on top of the deck that are dealt in order (see 'stack')
+        self.stacked = 0
 
     def __init_standard_deck__(self):
-        standard_deck = []
-        for suit in SUITS:
-            for rank in RANKS:
-                card = Card(suit, rank)
-                standard_deck.append(card)
-        return standard_deck
+        return list(CARDS)
 
     def get_card(self):
         if not self.cards:
-            print('Deck empty. Reshuffling...')
+            show('Deck empty. Reshuffling...')
             self.shuffle_deck()
-            print('Deck ready.')
-        nextCard = self.cards.pop(0)
+            show('Deck ready.')
+        if self.lazy and self.stacked == 0:
+            # the last card is swapped with a random one, so that it can be dealt in O(1)
+            index = self.rng.randrange(len(self.cards))
+            self.cards[index], self.cards[-1] = self.cards[-1], self.cards[index]
+            nextCard = self.cards.pop()
+        else:
+            nextCard = self.cards.pop(0)
+            self.stacked = max(self.stacked - 1, 0)
         self.discarded.append(nextCard)
+        if self.counters:
+            code = nextCard.code
+            for counter in self.counters:
+                counter.card_dealt(code)
         return nextCard
 
+    def add_counter(self, counter):
+        self.counters.append(counter)
+        counter.shuffled(self)
+
+    def cards_remaining(self):
+        return len(self.cards)
+
     def needs_shuffle(self):
         raise NotImplementedError("Abstract method. Subclasses must define it")
 
     def shuffle_deck(self):
         self.cards += self.discarded
         self.discarded = []
-        shuffle(self.cards)
+        if not self.lazy:
+            self.rng.shuffle(self.cards)
+        self.stacked = 0
+        for counter in self.counters:
+            counter.shuffled(self)
     
-    def test_hand(self):
+    def stack(self, cards):
+        '''
+        Shuffles the deck and puts the cards on top of it, so they are the next ones dealt (in
+        the same order). The rest of the deck is dealt at random as usual.
+        '''
         self.shuffle_deck()
-        # set the first cards in the same order as in 'testCards'
-        for i, card in enumerate(testCards[testMode]):
-            cardIndex = self.cards.index(card)
-            self.cards[i], self.cards[cardIndex] = self.cards[cardIndex], self.cards[i]
+        stack_cards(self.cards, cards)
+        self.stacked = len(cards)
 
 class StandardDeck(Deck):
     '''
@@ -151,9 +266,11 @@ class StandardDeck(Deck):
     hand is going to be played.
     '''
     TOTAL_CARDS = Deck.CARDS_IN_DECK
+    LAZY = True
     
-    def __init__(self):
-        Deck.__init__(self)
+    def __init__(self, rng=None, lazy=None):
+        Deck.__init__(self, rng, lazy)
+        self.num_decks = 1
         self.cards = Deck.__init_standard_deck__(self)
 
     def needs_shuffle(self):
@@ -163,14 +280,18 @@ class SixPackDeck(Deck):
     '''
     This class represents the game that is played in the casinos. Six card decks are shuffled
     together and the 'plastic mark' is placed randomly between the last 60 - 80 cards.
+    The number of decks and the penetration (see 'PENETRATION') can be changed.
     '''
     NUM_DECKS = 6
     TOTAL_CARDS = Deck.CARDS_IN_DECK * NUM_DECKS
     
-    def __init__(self):
-        Deck.__init__(self)
+    def __init__(self, rng=None, lazy=None, num_decks=None, penetration=None):
+        Deck.__init__(self, rng, lazy)
+        self.num_decks = num_decks if num_decks is not None else self.NUM_DECKS
+        self.total_cards = Deck.CARDS_IN_DECK * self.num_decks
+        self.penetration = penetration if penetration is not None else PENETRATION
         self.plastic_mark = 0
-        for _ in range(0, 6):
+        for _ in range(0, self.num_decks):
             self.cards += Deck.__init_standard_deck__(self)
         self.shuffle_deck()
     
@@ -183,50 +304,196 @@ class SixPackDeck(Deck):
 
     def shuffle_deck(self):
         Deck.shuffle_deck(self)
-        self.plastic_mark = randint(int(SixPackDeck.TOTAL_CARDS * 0.8), SixPackDeck.TOTAL_CARDS)
+        self.plastic_mark = self.rng.randint(int(self.total_cards * self.penetration), self.total_cards)
+
+class ContinuousSixPackDeck(SixPackDeck):
+    '''
+    Six decks in a continuous shuffling machine: the cards of every hand go back to the
+    machine, so the deck is shuffled before every hand (lazily by default, see 'Deck').
+    '''
+    LAZY = True
+
+    def needs_shuffle(self):
+        return True
+
+    def shuffle_deck(self):
+        Deck.shuffle_deck(self)
+        self.plastic_mark = 0
+
+class Shoe(Deck):
+    '''
+    Compact version of the deck that stores the cards as codes (see 'CARD_CODES') in an array
+    of bytes. The cards are never removed from the array: a cursor points to the next card to
+    be dealt and all the cards before it are the discarded ones. This way dealing a card is
+    O(1), and a shuffled order is copied into the same array.
+    The shuffled orders of the codes are taken from a batch of permutations generated with the
+    random stream of the shoe ('batch_size' at a time, see 'PermutationBatch'). This only pays
+    off with NumPy: without it every shuffle is a 'sample' of the codes (a new list and a copy
+    of it), which is not faster than shuffling the cards of a 'SixPackDeck'. In 'lazy'
+    mode the shoe is never shuffled: every card dealt is swapped with a random card between
+    the cursor and the end of the shoe (see 'Deck').
+    It can be used instead of the decks that inherit from 'Deck'.
+    '''
+    NUM_DECKS = 1
+
+    def __init__(self, num_decks=None, rng=None, batch_size=None, lazy=None):
+        Deck.__init__(self, rng, lazy)
+        if num_decks is None:
+            num_decks = self.NUM_DECKS
+        self.num_decks = num_decks
+        self.total_cards = Deck.CARDS_IN_DECK * num_decks
+        self.codes = array('B', range(0, Deck.CARDS_IN_DECK)) * num_decks
+        self.permutations = PermutationBatch(self.codes, self.rng, batch_size)
+        # view used to copy the permutations into the codes without building new arrays
+        self.view = memoryview(self.codes)
+        self.cursor = 0
+        # position of the card after which the shoe needs to be shuffled
+        self.cut_card = self.total_cards
+
+    def get_card(self):
+        if self.cursor >= self.total_cards:
+            show('Deck empty. Reshuffling...')
+            self.shuffle_deck()
+            show('Deck ready.')
+        cursor = self.cursor
+        if self.lazy and cursor >= self.stacked:
+            index = self.rng.randrange(cursor, self.total_cards)
+            codes = self.codes
+            codes[cursor], codes[index] = codes[index], codes[cursor]
+        code = self.codes[cursor]
+        self.cursor = cursor + 1
+        for counter in self.counters:
+            counter.card_dealt(code)
+        return CARDS[code]
+
+    def needs_shuffle(self):
+        return self.cursor >= self.cut_card
+
+    def shuffle_deck(self):
+        # the shuffled codes are copied back into the same buffer (a sample of the codes is a bit
+        # faster than shuffling the array in place without NumPy)
+        if not self.lazy:
+            self.view[:] = self.permutations.next_permutation()
+        self.cursor = 0
+        self.stacked = 0
+        for counter in self.counters:
+            counter.shuffled(self)
+
+    def cards_remaining(self):
+        return self.total_cards - self.cursor
+
+    def penetration(self):
+        '''
+        Returns the fraction of the cards of the shoe that have already been dealt.
+        '''
+        return self.cursor / self.total_cards
+
+    def stack(self, cards):
+        self.shuffle_deck()
+        stack_cards(self.codes, [card.code for card in cards])
+        self.stacked = len(cards)
+
+class StandardShoe(Shoe):
+    '''
+    Shoe with the 52 cards of a standard deck that is shuffled before every hand, like the
+    'StandardDeck'.
+    '''
+    TOTAL_CARDS = Deck.CARDS_IN_DECK
+    LAZY = True
+
+    def needs_shuffle(self):
+        return True
+
+class SixPackShoe(Shoe):
+    '''
+    Shoe with six decks where the 'plastic mark' is placed randomly between the last 60 - 80
+    cards, like the 'SixPackDeck'.
+    '''
+    NUM_DECKS = SixPackDeck.NUM_DECKS
+    TOTAL_CARDS = SixPackDeck.TOTAL_CARDS
+
+    def __init__(self, rng=None, batch_size=None, lazy=None, num_decks=None, penetration=None):
+        Shoe.__init__(self, num_decks, rng, batch_size, lazy)
+        self.penetration = penetration if penetration is not None else PENETRATION
+        self.shuffle_deck()
+
+    @property
+    def plastic_mark(self):
+        '''
+        Number of cards that can still be dealt before the shoe needs to be shuffled.
+        '''
+        return self.cut_card - self.cursor
+
+    def shuffle_deck(self):
+        Shoe.shuffle_deck(self)
+        self.cut_card = self.rng.randint(int(self.total_cards * self.penetration), self.total_cards)
+
+class ContinuousShoe(SixPackShoe):
+    '''
+    Shoe with six decks in a continuous shuffling machine, like the 'ContinuousSixPackDeck'.
+    '''
+    LAZY = True
+
+    @property
+    def plastic_mark(self):
+        return 0
+
+    def needs_shuffle(self):
+        return True
+
+    def shuffle_deck(self):
+        Shoe.shuffle_deck(self)
 
 class Hand():
     '''
     This class represents a hand of cards. It is initialized with 2 cards every round that is
     played. The two cards are drawn from the deck.
+    The hand keeps the running 'hard' total (Aces counted as 1) and the number of Aces, which
+    are updated every time a card is added. As at most one Ace can be counted as 11 without
+    busting, the value of the hand is always known without looking at the cards again.
     '''
     def __init__(self, name = 'Hand'):
         self.__cards = []
         self.name = name
-        self.totalValue = 0
-        self.dirtyTotal = False
-    
-    def get_hand_value(self):
-        if self.totalValue == 0 or self.dirtyTotal:
-            valueWithoutAces = self.__get_hand_value_excluding_aces__()
-            self.totalValue = valueWithoutAces + self.__get_aces_value__()
-            self.dirtyTotal = False
-        return self.totalValue
-    
-    def __get_aces_value__(self):
-        aces = [card for card in self.__cards if card.rank == 'Ace']
-        if self.totalValue == 0:
-            if len(aces) == 0:
-                return 0
-            elif len(aces) == 1:
-                return 11
-            else:
-                return 11 + len(aces) - 1
-        else:
-            acesValues = [ace.value() for ace in aces]
-            return sum(acesValues)
+        self.hardTotal = 0
+        self.numAces = 0
+        self.natural = False
 
-    def __get_hand_value_excluding_aces__(self):
-        cardValues = [card.value() for card in self.__cards if card.rank != 'Ace']
-        return sum(cardValues)
+    def hard_total(self):
+        return self.hardTotal
+
+    def is_soft(self):
+        '''
+        Returns True if one of the Aces of the hand is being counted as 11 points.
+        '''
+        return self.numAces > 0 and self.hardTotal + SOFT_ACE_BONUS <= BLACKJACK
+
+    def value(self):
+        if self.numAces > 0 and self.hardTotal + SOFT_ACE_BONUS <= BLACKJACK:
+            return self.hardTotal + SOFT_ACE_BONUS
+        return self.hardTotal
+
+    def get_hand_value(self):
+        return self.value()
 
     def add_card(self, deckOrCard):
         card = deckOrCard
         if isinstance(deckOrCard, Deck):
             card = deckOrCard.get_card()
-        card.set_hand(self)
         self.__cards.append(card)
-        self.dirtyTotal = True
+        self.hardTotal += card.hard_points
+        if card.rank == 'Ace':
+            self.numAces += 1
+        # a natural can only be made with the first two cards
+        if len(self.__cards) == 2:
+            self.natural = self.value() == BLACKJACK
+
+    def __remove_card__(self, index):
+        card = self.__cards.pop(index)
+        self.hardTotal -= card.hard_points
+        if card.rank == 'Ace':
+            self.numAces -= 1
+        self.natural = False
     
     def get_cards(self):
         return self.__cards
@@ -234,25 +501,27 @@ class Hand():
     def can_split_pair(self):
         return len(self.__cards) == 2 and self.__cards[0].rank == self.__cards[1].rank
     
-    def can_double_down(self):
-        return len(self.__cards) == 2 and self.get_hand_value() >= 9 and self.get_hand_value() <= 11
+    def can_double_down(self, rules=None):
+        '''
+        Returns True if the hand can be doubled down with the given rules (the default ones if
+        they are not given, see 'Rules').
+        '''
+        return (rules if rules is not None else DEFAULT_RULES).can_double(self)
 
-    def split_hand(self, copiedObj = None):
-        splitHand = copiedObj
+    def split_hand(self, splitHand = None):
+        '''
+        Moves the second card of the pair to 'splitHand' (a new hand if it's not given) and
+        returns it. Nothing is done if the hand is not a pair.
+        '''
         if self.can_split_pair():
-            # if the copy is not done we do it here
             if splitHand is None:
-                splitHand = deepcopy(self)
-                splitHand.name = 'Split Hand'
-            # delete the proper cards from each hand to make the split
-            del splitHand.__cards[1]
-            del self.__cards[0]
+                splitHand = Hand('Split Hand')
+            splitHand.add_card(self.__cards[1])
+            self.__remove_card__(1)
         return splitHand
     
     def is_natural(self):
-        if len(self.__cards) >= 2:
-            return self.__cards[0].value() + self.__cards[1].value() == BLACKJACK
-        return False
+        return self.natural
     
     def get_starting_hand(self, deck):
         self.add_card(deck)
@@ -276,8 +545,8 @@ class DealerHand(Hand):
         Hand.__init__(self)
     
     def show_full_hand(self):
-        print('Hand:')
-        print(super().get_full_hand_string())
+        show('Hand:')
+        show(super().get_full_hand_string())
 
     def __str__(self):
         resultString = super().__str__()
@@ -291,46 +560,239 @@ class PlayerHand(Hand):
     '''
     This class adds a bet value to the hand.
     '''
-    def __init__(self):
-        Hand.__init__(self)
+    def __init__(self, name = 'Hand'):
+        Hand.__init__(self, name)
         self.bet = 0
         self.playable = True
+        self.surrendered = False
     
     def __str__(self):
         resultString = super().__str__()
         resultString = 'Bet placed: {0}\n'.format(self.bet)
         return resultString + super().get_full_hand_string()
 
-    def split_hand(self):
-        splitHand = deepcopy(self)
-        splitHand.name = 'Split Hand'
+    def split_hand(self, name = 'Split Hand'):
+        '''
+        Splits the pair into a new hand with the same bet as this one.
+        '''
+        splitHand = PlayerHand(name)
+        splitHand.bet = self.bet
         return super().split_hand(splitHand)
 
 class HandResult(Enum):
+    PLAYER_SURRENDERS = -2
     DEALER_WINS = -1
     DRAW = 0
     PLAYER_WINS = 1
     PLAYER_NATURAL = 2
 
+class Rules():
+    '''
+    Class that represents the rules of the game played at a table:
+        hit_soft_17         the dealer hits a soft 17 (H17) instead of standing on all 17s (S17)
+        double_totals       lowest and highest values of the two card hands that can be doubled
+                            down ((0, BLACKJACK) allows doubling down any two cards)
+        double_after_split  the hands that come from a split can be doubled down (DAS)
+        surrender           late surrender: the player can give up the starting hand and get
+                            half of the bet back, unless the dealer has a natural
+        insurance           the players can insure their hands when the upcard is an Ace. The
+                            insurance costs half the bet and pays 2:1 if the dealer has a natural
+        num_decks           decks of the shoe (None for the decks of the deck type of the table)
+        penetration         fraction of the shoe that is always dealt before it's shuffled
+        blackjack_payout    payment of the naturals, like '3:2' or '6:5' (or a number)
+        max_split_hands     hands that a player can have after splitting pairs
+    The defaults are the rules that the game has always had. The rules can't be changed once
+    created ('replace' returns a copy with some of them changed). Every set of rules has a
+    'key' that names it, like 'S17-D9T11-DAS-NOLS-NOINS-6D-PEN80-SP4-BJ3:2', and its SHA-256
+    ('digest') is used to cache the results computed for it (see 'blackjackStrategy.py').
+    '''
+    __slots__ = ('hit_soft_17', 'double_totals', 'double_after_split', 'surrender', 'insurance',
+        'num_decks', 'penetration', 'blackjack_payout', 'max_split_hands')
+
+    KEY_PATTERN = re.compile(r'^(?:(?P<dealer>[SH]17)|D(?P<low>\d+)T(?P<high>\d+)|(?P<das>(?:NO)?DAS)'
+        r'|(?P<surrender>(?:NO)?LS)|(?P<insurance>(?:NO)?INS)|(?P<decks>\d+)D|PEN(?P<penetration>[\d.]+)'
+        r'|SP(?P<split>\d+)|BJ(?P<payout>\d+:\d+))$')
+
+    def __init__(self, hit_soft_17=False, double_totals=(9, 11), double_after_split=True,
+            surrender=False, insurance=False, num_decks=None, penetration=PENETRATION,
+            blackjack_payout='3:2', max_split_hands=MAX_SPLIT_HANDS):
+        if isinstance(blackjack_payout, str):
+            blackjack_payout = Fraction(blackjack_payout.replace(':', '/'))
+        blackjack_payout = Fraction(blackjack_payout).limit_denominator(1000)
+        double_totals = tuple(double_totals)
+        if len(double_totals) != 2 or double_totals[0] > double_totals[1]:
+            raise ValueError('The double down totals must be the lowest and the highest ones.')
+        if num_decks is not None and num_decks < 1:
+            raise ValueError('There must be at least one deck.')
+        if not 0 < penetration <= 1:
+            raise ValueError('The penetration must be a fraction of the shoe.')
+        if blackjack_payout <= 0 or max_split_hands < 1:
+            raise ValueError('Invalid natural payout or number of split hands.')
+        values = (bool(hit_soft_17), double_totals, bool(double_after_split), bool(surrender),
+            bool(insurance), num_decks, penetration, blackjack_payout, max_split_hands)
+        for name, value in zip(Rules.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_key(cls, key):
+        '''
+        Returns the rules named by the key (see 'key'). The rules that are not in the key keep
+        their default values, so 'H17-BJ6:5' is a valid key.
+        '''
+        values = {}
+        for token in key.upper().split('-') if key else ():
+            match = Rules.KEY_PATTERN.match(token)
+            if match is None:
+                raise ValueError('Unknown rule: {0}'.format(token))
+            if match.group('dealer'):
+                values['hit_soft_17'] = match.group('dealer') == 'H17'
+            elif match.group('low'):
+                values['double_totals'] = (int(match.group('low')), int(match.group('high')))
+            elif match.group('das'):
+                values['double_after_split'] = match.group('das') == 'DAS'
+            elif match.group('surrender'):
+                values['surrender'] = match.group('surrender') == 'LS'
+            elif match.group('insurance'):
+                values['insurance'] = match.group('insurance') == 'INS'
+            elif match.group('decks'):
+                values['num_decks'] = int(match.group('decks'))
+            elif match.group('penetration'):
+                values['penetration'] = float(match.group('penetration')) / 100
+            elif match.group('split'):
+                values['max_split_hands'] = int(match.group('split'))
+            else:
+                values['blackjack_payout'] = match.group('payout')
+        return cls(**values)
+
+    def replace(self, **changes):
+        '''
+        Returns a copy of the rules with the given rules changed.
+        '''
+        values = {name: getattr(self, name) for name in Rules.__slots__}
+        values.update(changes)
+        return Rules(**values)
+
+    def key(self):
+        tokens = [
+            'H17' if self.hit_soft_17 else 'S17',
+            'D{0}T{1}'.format(*self.double_totals),
+            'DAS' if self.double_after_split else 'NODAS',
+            'LS' if self.surrender else 'NOLS',
+            'INS' if self.insurance else 'NOINS'
+        ]
+        if self.num_decks is not None:
+            tokens.append('{0}D'.format(self.num_decks))
+        tokens.append('PEN{0:g}'.format(round(self.penetration * 100, 4)))
+        tokens.append('SP{0}'.format(self.max_split_hands))
+        tokens.append('BJ{0}:{1}'.format(self.blackjack_payout.numerator,
+            self.blackjack_payout.denominator))
+        return '-'.join(tokens)
+
+    def digest(self):
+        '''
+        Returns the SHA-256 of the key of the rules (in hexadecimal).
+        '''
+        return hashlib.sha256(self.key().encode('ascii')).hexdigest()
+
+    def dealer_hits(self, hand):
+        '''
+        Returns True if the dealer must draw another card with the given hand.
+        '''
+        value = hand.value()
+        return value < 17 or (value == 17 and self.hit_soft_17 and hand.is_soft())
+
+    def allows_double(self, value, split=False):
+        '''
+        Returns True if a two card hand with the given value can be doubled down ('split' is
+        True for the hands that come from a split).
+        '''
+        return (self.double_totals[0] <= value <= self.double_totals[1]
+            and (self.double_after_split or not split))
+
+    def can_double(self, hand, split=False):
+        return len(hand.get_cards()) == 2 and self.allows_double(hand.value(), split)
+
+    def payout(self, result, bet):
+        '''
+        Returns the chips given back to the player for a hand with the given result (the bet
+        was taken when it was placed).
+        '''
+        if result is HandResult.DRAW:
+            return bet
+        if result is HandResult.PLAYER_WINS:
+            return bet * 2
+        if result is HandResult.PLAYER_NATURAL:
+            return bet + int(bet * self.blackjack_payout)
+        if result is HandResult.PLAYER_SURRENDERS:
+            return bet // 2
+        return 0
+
+    def insurance_payout(self, insurance, dealer_hand):
+        '''
+        Returns the chips given back to the player for an insurance bet.
+        '''
+        if dealer_hand.is_natural():
+            return insurance * (INSURANCE_PAYOUT + 1)
+        return 0
+
+    def __values__(self):
+        return tuple(getattr(self, name) for name in Rules.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Rules can\'t be changed, use replace().')
+
+    def __delattr__(self, name):
+        raise AttributeError('Rules can\'t be changed, use replace().')
+
+    def __reduce__(self):
+        return (Rules, self.__values__())
+
+    def __eq__(self, other):
+        if not isinstance(other, Rules):
+            return NotImplemented
+        return self.__values__() == other.__values__()
+
+    def __hash__(self):
+        return hash(self.__values__())
+
+    def __str__(self):
+        return self.key()
+
+    def __repr__(self):
+        return 'Rules.from_key({0!r})'.format(self.key())
+
+DEFAULT_RULES = Rules()
+
 class Player():
     '''
     Class that represents a player of the game. It contains the amount of chips that the player
-    has and the current hand in each of the rounds. 
+    has and the current hand(s) in each of the rounds. The first hand is the one dealt at the
+    beginning of the round and the rest come from splitting pairs (up to 'max_hands' hands).
     It contains the methods used to play the game like bet(), split()...
+    The player follows the rules of the table where the last hand was dealt ('rules').
     '''
-    def __init__(self, number, chips):
+    def __init__(self, number, chips, strategy=None, max_hands=MAX_SPLIT_HANDS):
         self.name = "Player {0}".format(number)
         self.chips = chips
-        self.hand = None
-        self.splitHand = None
+        self.hands = []
+        self.initial_bet = 0
+        self.insurance = 0
+        self.max_hands = max_hands
+        self.rules = DEFAULT_RULES
+        # the strategy takes all the decisions of the player (a human by default)
+        self.strategy = strategy if strategy is not None else InteractiveStrategy()
+
+    @property
+    def hand(self):
+        '''
+        The hand dealt to the player at the beginning of the round.
+        '''
+        return self.hands[0] if self.hands else None
     
     def __str__(self):
         resultString = self.name + '\n'
         resultString += 'Chips remaining: {0}\n'.format(self.chips)
-        if self.hand is not None:
-            resultString += str(self.hand)
-        if self.splitHand is not None:
-            resultString = resultString + '\n' + str(self.splitHand)
+        resultString += '\n'.join(str(hand) for hand in self.hands)
         return resultString
     
     def __bet__(self, amount, handToBet):
@@ -339,59 +801,132 @@ class Player():
         self.chips -= amount
         handToBet.bet = amount
 
-    def split_pair(self, deck):
+    def can_split(self, hand):
+        '''
+        Returns True if the player can be asked to split the pair of the hand.
+        '''
+        return (hand.can_split_pair()
+            and len(self.hands) < min(self.max_hands, self.rules.max_split_hands))
+
+    def can_double(self, hand):
+        '''
+        Returns True if the player can be asked to double down the hand.
+        '''
+        return self.rules.can_double(hand, len(self.hands) > 1)
+
+    def split(self, handToSplit, deck):
+        '''
+        Splits the pair of the hand in two hands with the same bet and adds a card to each of
+        them. Returns the new hand, or None if the player doesn't have enough chips.
+        '''
+        if self.chips < handToSplit.bet:
+            return None
+        # create new hand
+        splitHand = handToSplit.split_hand('Split Hand {0}'.format(len(self.hands)))
+        self.hands.append(splitHand)
+        # update chips
+        self.chips -= handToSplit.bet
+        # add card to each hand
+        handToSplit.add_card(deck)
+        splitHand.add_card(deck)
+        return splitHand
+
+    def double(self, handToDouble, deck):
+        '''
+        Doubles the bet of the hand and adds its last card. Returns the card added, or None if
+        the player doesn't have enough chips.
+        '''
+        if self.chips < handToDouble.bet:
+            return None
+        self.chips -= handToDouble.bet
+        handToDouble.bet += handToDouble.bet
+        cardToAdd = deck.get_card()
+        handToDouble.add_card(cardToAdd)
+        handToDouble.playable = False
+        return cardToAdd
+
+    def surrender(self, hand):
+        '''
+        Gives up the hand: it's not played and half of its bet is given back when it's paid.
+        '''
+        hand.surrendered = True
+        hand.playable = False
+
+    def offer_insurance(self, upcard):
+        '''
+        Let's the player choose if he/she wants to insure the hand against a dealer natural.
+        The insurance costs half of the bet.
+        '''
+        amount = self.hand.bet // 2
+        if amount > 0 and self.chips >= amount and self.strategy.insurance(self.hand, upcard):
+            self.chips -= amount
+            self.insurance = amount
+            show('{0} takes insurance ({1} chips).'.format(self.name, amount))
+
+    def hit(self, hand, deck):
+        '''
+        Adds a card to the hand, which can't be played anymore once it reaches 21 points.
+        Returns the card added.
+        '''
+        cardToAdd = deck.get_card()
+        hand.add_card(cardToAdd)
+        if hand.value() >= BLACKJACK:
+            hand.playable = False
+        return cardToAdd
+
+    def split_pair(self, handToSplit, deck, upcard=None):
         '''
-        Let's the player choose if he/she wants to split pair.
+        Let's the player choose if he/she wants to split pair. Returns True if the hand was split.
         '''
-        if self.hand is not None and self.hand.can_split_pair():
+        split = False
+        if self.can_split(handToSplit):
             # ask player if he/she wants to split pairs
-            split = get_int("Split pairs? Yes(1) or No(0): ", filter_zero_one)
-            if split and self.chips >= self.hand.bet:
-                # create new hand
-                self.splitHand = self.hand.split_hand()
-                # update chips
-                self.chips -= self.hand.bet
-                # add card to each hand
-                self.hand.add_card(deck)
-                self.splitHand.add_card(deck)
-                print(self.hand)
-                print('')
-                print(self.splitHand)
-            print('')
+            if self.strategy.split_pair(handToSplit, upcard):
+                splitHand = self.split(handToSplit, deck)
+                if splitHand is not None:
+                    split = True
+                    show(handToSplit)
+                    show('')
+                    show(splitHand)
+            show('')
+        return split
+
+    def split_pairs(self, deck, upcard=None):
+        '''
+        Let's the player split the pairs of all his/her hands, including the ones that are formed
+        again after splitting (re-splitting), until the limit of hands is reached.
+        '''
+        index = 0
+        while index < len(self.hands):
+            # the same hand is checked again after a split, as it may be a pair again
+            if not self.split_pair(self.hands[index], deck, upcard):
+                index += 1
     
-    def double_down(self, handToDouble, deck):
+    def double_down(self, handToDouble, deck, upcard=None):
         '''
         Let's the player choose if he/she wants to double down the bet.
         '''
-        if handToDouble is not None and handToDouble.can_double_down():
+        if self.can_double(handToDouble):
             # ask player if he/she wants to double down the hand
-            print(handToDouble)
-            double = get_int("Double down {0}? Yes(1) or No(0): " \
-                .format(handToDouble.name), filter_zero_one)
-            if double:
-                if self.chips >= handToDouble.bet:
-                    self.chips -= handToDouble.bet
-                    handToDouble.bet += handToDouble.bet
-                    cardToAdd = deck.get_card()
-                    handToDouble.add_card(cardToAdd)
-                    print(cardToAdd)
-                    handToDouble.playable = False
+            show(handToDouble)
+            if self.strategy.double_down(handToDouble, upcard):
+                cardAdded = self.double(handToDouble, deck)
+                if cardAdded is not None:
+                    show(cardAdded)
                 else:
-                    print('You don\'t have enough chips to double down.')
-            print('')
+                    show('You don\'t have enough chips to double down.')
+            show('')
 
-    def hit_or_stay(self, hand, deck):
+    def hit_or_stay(self, hand, deck, upcard=None):
         '''
         This method allows the player to choose if he/she wants another card or prefers to stay.
         '''
-        option = get_int('Hit(1) or Stay(0)? ', filter_zero_one)
+        option = self.strategy.hit(hand, upcard)
         while option and hand.playable:
-            hand.add_card(deck)
-            print(hand)
-            if hand.get_hand_value() < 21:
-                option = get_int('Hit(1) or Stay(0)? ', filter_zero_one)
-            else:
-                hand.playable = False
+            self.hit(hand, deck)
+            show(hand)
+            if hand.playable:
+                option = self.strategy.hit(hand, upcard)
 
     def compare_hands(self, dealer_hand, player_hand):
         '''
@@ -404,9 +939,11 @@ class Player():
                 return HandResult.DRAW
             else:
                 return HandResult.DEALER_WINS
+        elif getattr(player_hand, 'surrendered', False):
+            return HandResult.PLAYER_SURRENDERS
         else:
-            dealerVal = dealer_hand.get_hand_value()
-            playerVal = player_hand.get_hand_value()
+            dealerVal = dealer_hand.value()
+            playerVal = player_hand.value()
             # player hand natural and dealer not
             if player_hand.is_natural():
                 return HandResult.PLAYER_NATURAL
@@ -423,56 +960,48 @@ class Player():
 
     def payment(self, dealer_hand):
         '''
-        This method checks the value bet by the player and adds the same value to the player's chips,
-        but multiplied by result_multiplier.
-        The result_multiplier parameter is the value returned by compare_hands. If the dealer won
-        it will be -1, and the value will be substracted from the player chips. If the player won it will
-        be 1 and the value will be added. Finally, if the match is a tie the result_multiplier will be
-        0 and no addition or substraction will happen.
+        This method compares every hand of the player with the dealer hand and gives back the
+        chips won (see 'Rules.payout'): nothing if the dealer won, as the bet was taken when it
+        was placed, the bet for a draw, twice the bet if the player won and the bet plus the
+        natural payout (3:2 by default) for a natural. Surrendered hands get half the bet back.
+        The insurance is paid 2:1 if the dealer has a natural.
+        The tables settle all their players at once with a 'Settlement'.
         '''
-        # start play on hand(s)
-        for hand in (self.hand, self.splitHand):
-            if hand is not None:
-                print(hand.name + ' -> Total: {0}'.format(hand.get_hand_value()))
-                compareResult = self.compare_hands(dealer_hand, hand)
-                if compareResult is HandResult.DEALER_WINS:
-                    # player loses, nothing to do as we substract the chips when making the bet
-                    print('You lose.')
-                elif compareResult is HandResult.DRAW:
-                    # draw, give back the chips
-                    print('Draw')
-                    self.chips += self.hand.bet
-                    pass
-                elif compareResult is HandResult.PLAYER_WINS:
-                    # player wins, give back the bet x 2
-                    print('You win!')
-                    self.chips += self.hand.bet * 2
-                    pass
-                elif compareResult is HandResult.PLAYER_NATURAL:
-                    # player natural, payment = bet x 2.5
-                    print('BLACKJACK!')
-                    self.chips += int(self.hand.bet * 2.5)
-                    pass
+        settlement = Settlement(dealer_hand, [self], self.rules)
+        settlement.show()
+        settlement.pay()
 
-    def play(self, deck):
+    def play(self, deck, upcard=None):
+        '''
+        Plays the hand(s) of the player. The 'upcard' is the visible card of the dealer, which is
+        given to the strategy of the player to take its decisions.
+        '''
         # if player has a Blackjack return
         if self.hand.is_natural(): return
+        # check if the player can and wants to surrender
+        if self.rules.surrender and self.strategy.surrender(self.hand, upcard):
+            self.surrender(self.hand)
+            show('{0} surrenders.'.format(self.name))
+            return
         # check if the player can and want to split pairs
-        self.split_pair(deck)
-        # check if the player can and want to double down on his hand
-        self.double_down(self.hand, deck)
-        # check if the player can and want to double down on his split hand
-        self.double_down(self.splitHand, deck)
+        self.split_pairs(deck, upcard)
+        # check if the player can and want to double down on each of his hands
+        for hand in self.hands:
+            self.double_down(hand, deck, upcard)
 
         # start play on hand(s)
-        for hand in (self.hand, self.splitHand):
-            if hand is not None and hand.playable:
-                print(hand.name + ':')
-                self.hit_or_stay(hand, deck)
+        for hand in self.hands:
+            if hand.playable:
+                show(hand.name + ':')
+                self.hit_or_stay(hand, deck, upcard)
+
+    def new_hand(self, deck, min_bet, max_bet, rules=None):
+        show('Starting new hand')
+        show(self.name + ':')
 
-    def new_hand(self, deck, min_bet, max_bet):
-        print('Starting new hand')
-        print(self.name + ':')
+        if rules is not None:
+            self.rules = rules
+        self.insurance = 0
 
         if self.chips < min_bet:
             raise PlayerError()
@@ -480,14 +1009,11 @@ class Player():
         def bet_check(val):
             return val > 0 and val <= self.chips and val >= min_bet and val <= max_bet
 
-        self.hand = PlayerHand()
-        bet_to_place = get_int('How many chips do you want to bet? ', filter_positive_int)
-        while not bet_check(bet_to_place):
-            if bet_to_place > self.chips:
-                print('You don\'t have that many chips.')
-            else:
-                print('Bet must be between {0} and {1} chips.'.format(min_bet, max_bet))
-            bet_to_place = get_int('How many chips do you want to bet? ', filter_positive_int)
+        self.hands = [PlayerHand()]
+        bet_to_place = self.strategy.bet(self, min_bet, max_bet, bet_check)
+        if not bet_check(bet_to_place):
+            raise PlayerError()
+        self.initial_bet = bet_to_place
 
         self.__bet__(bet_to_place, self.hand)
         self.hand.get_starting_hand(deck)
@@ -497,18 +1023,20 @@ class Dealer():
     Class to represent the dealer of the game. It contains the logic for the Dealer to play
     against the players. This is the same logic used in the casinos.
     '''
-    def __init__(self):
+    def __init__(self, rules=None):
         self.hand = None
+        self.rules = rules if rules is not None else DEFAULT_RULES
     
     def play(self, deck):
         '''
         Dealer plays with the same rules always. If the card total is 16 points or lower,
-        the dealer will always draw another card from the deck.
+        the dealer will always draw another card from the deck. A soft 17 is hit only if the
+        rules of the table say so.
         '''
-        while self.hand.get_hand_value() < 17 and not self.hand.get_hand_value() > BLACKJACK:
+        while self.rules.dealer_hits(self.hand):
             newCard = deck.get_card()
             self.hand.add_card(newCard)
-            print(newCard)
+            show(newCard)
     
     def new_hand(self, deck):
         '''
@@ -517,11 +1045,17 @@ class Dealer():
         self.hand = DealerHand()
         self.hand.get_starting_hand(deck)
     
+    def get_upcard(self):
+        '''
+        Returns the card of the dealer that the players can see (the first one is hidden).
+        '''
+        return self.hand.get_cards()[1]
+
     def reveal_hand(self):
         '''
         Prints the hand of the dealer, including the hidden card.
         '''
-        print('Dealer\n')
+        show('Dealer\n')
         self.hand.show_full_hand()
 
     def __str__(self):
@@ -529,59 +1063,287 @@ class Dealer():
         resultString += str(self.hand)
         return resultString
 
+class Settlement():
+    '''
+    Class that settles the bets of all the hands of a round against the final hand of the
+    dealer, including the hands that come from splits and the doubled ones. The results and
+    the chips given back ('Rules.payout') are computed for all the hands in a single pass: the
+    result of a hand only depends on its value once the dealer hand is known, so it's looked
+    up in a table of results for that dealer hand. With many hands (see
+    'VECTORIZED_SETTLEMENT') and NumPy installed the pass is a few vectorized operations: the
+    hands are read once, with their fields packed in one number, and the results (as their
+    codes) and the payouts are kept in arrays until they are read.
+    'hands' has the hands of all the players (in the order of the seats), and 'results' and
+    'payouts' the result and the chips given back for each of them. 'player_payouts' has the
+    chips given back to each player, including the insurance.
+    '''
+    __slots__ = ('rules', 'players', 'hands', 'dealer_hand', 'dealer_value', 'dealer_natural',
+        'result_array', 'payout_array', 'hand_results', 'hand_payouts', 'player_payouts')
+
+    def __init__(self, dealer_hand, players, rules=None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.players = list(players)
+        self.hands = [hand for player in self.players for hand in player.hands]
+        self.dealer_hand = dealer_hand
+        self.dealer_value = dealer_hand.value()
+        self.dealer_natural = dealer_hand.is_natural()
+        if numpy is not None and len(self.hands) >= VECTORIZED_SETTLEMENT:
+            self.__settle_vectorized__()
+        else:
+            self.__settle__()
+        for index, player in enumerate(self.players):
+            if player.insurance:
+                self.player_payouts[index] += self.rules.insurance_payout(player.insurance,
+                    dealer_hand)
+
+    @property
+    def results(self):
+        if self.hand_results is None:
+            self.hand_results = [HandResult(code) for code in self.result_array.tolist()]
+        return self.hand_results
+
+    @property
+    def payouts(self):
+        if self.hand_payouts is None:
+            self.hand_payouts = self.payout_array.tolist()
+        return self.hand_payouts
+
+    def pay(self):
+        '''
+        Gives the chips won to the players.
+        '''
+        for player, payout in zip(self.players, self.player_payouts):
+            player.chips += payout
+
+    def show(self, player=None):
+        '''
+        Shows the result of every hand (and the insurance) of the player, or of all the players
+        if it's None.
+        '''
+        if is_headless():
+            return
+        index = 0
+        for seatPlayer in self.players:
+            numHands = len(seatPlayer.hands)
+            if player is None or seatPlayer is player:
+                if seatPlayer.insurance:
+                    show('Insurance pays {0} chips.'.format(self.rules.insurance_payout(
+                        seatPlayer.insurance, self.dealer_hand)))
+                for hand, result in zip(self.hands[index:index + numHands],
+                        self.results[index:index + numHands]):
+                    show(hand.name + ' -> Total: {0}'.format(hand.get_hand_value()))
+                    show(RESULT_MESSAGES[result.name])
+            index += numHands
+
+    def __result_table__(self):
+        key = None if self.dealer_natural else self.dealer_value
+        table = RESULT_TABLES.get(key)
+        if table is None:
+            # the natural and surrendered hands of the players are settled apart
+            table = []
+            for value in range(0, MAX_HAND_VALUE + 1):
+                if self.dealer_natural or value > BLACKJACK:
+                    table.append(HandResult.DEALER_WINS)
+                elif self.dealer_value > BLACKJACK:
+                    table.append(HandResult.PLAYER_WINS)
+                else:
+                    table.append(HandResult((value > self.dealer_value) - (value < self.dealer_value)))
+            RESULT_TABLES[key] = table
+        return table
+
+    def __settle__(self):
+        table = self.__result_table__()
+        payout = self.rules.payout
+        dealerNatural = self.dealer_natural
+        self.hand_results = results = []
+        self.hand_payouts = payouts = []
+        self.player_payouts = []
+        for player in self.players:
+            total = 0
+            for hand in player.hands:
+                if hand.natural:
+                    result = HandResult.DRAW if dealerNatural else HandResult.PLAYER_NATURAL
+                elif hand.surrendered and not dealerNatural:
+                    result = HandResult.PLAYER_SURRENDERS
+                else:
+                    result = table[hand.value()]
+                chips = payout(result, hand.bet)
+                results.append(result)
+                payouts.append(chips)
+                total += chips
+            self.player_payouts.append(total)
+
+    def __vectorized_tables__(self):
+        key = None if self.dealer_natural else self.dealer_value
+        naturalPayout = self.rules.blackjack_payout
+        codeTable = RESULT_CODE_TABLES.get(key)
+        payoutTable = PAYOUT_TABLES.get((key, naturalPayout))
+        if codeTable is None or payoutTable is None:
+            # the results of the hands are the ones of '__settle__', for every packed value and
+            # flags (with a denominator that makes the payouts exact, see 'Rules.payout')
+            table = self.__result_table__()
+            denominator = lcm(2, naturalPayout.denominator)
+            results = []
+            for fields in range(0, 1 << BET_SHIFT):
+                if fields >> NATURAL_BIT & 1:
+                    result = HandResult.DRAW if self.dealer_natural else HandResult.PLAYER_NATURAL
+                elif fields >> SURRENDERED_BIT & 1 and not self.dealer_natural:
+                    result = HandResult.PLAYER_SURRENDERS
+                else:
+                    result = table[fields & (1 << NATURAL_BIT) - 1]
+                results.append(result)
+            codeTable = numpy.array([result.value for result in results], dtype=numpy.int8)
+            payoutTable = (numpy.array([self.rules.payout(result, denominator)
+                for result in results]), denominator)
+            RESULT_CODE_TABLES[key] = codeTable
+            PAYOUT_TABLES[(key, naturalPayout)] = payoutTable
+        return codeTable, payoutTable
+
+    def __settle_vectorized__(self):
+        codeTable, (numerators, denominator) = self.__vectorized_tables__()
+        # a single pass over the hands, the rest are operations over the arrays (in place, as
+        # the allocations of the arrays cost as much as the operations)
+        fields = numpy.fromiter((hand.value() | hand.natural << NATURAL_BIT
+            | hand.surrendered << SURRENDERED_BIT | hand.bet << BET_SHIFT
+            for hand in self.hands), numpy.int64, len(self.hands))
+        indexes = numpy.bitwise_and(fields, (1 << BET_SHIFT) - 1)
+        codes = codeTable[indexes]
+        # every element of the output only depends on its own index, so they can be the same
+        # array ('clip' takes the elements without a buffer)
+        numerators = numpy.take(numerators, indexes, out=indexes, mode='clip')
+        payouts = numpy.right_shift(fields, BET_SHIFT, out=fields)
+        payouts *= numerators
+        payouts //= denominator
+        numerators = indexes = None
+        # the payouts of every player are added up from its first hand (the players without
+        # hands, if any, are settled one by one)
+        starts = numpy.fromiter((len(player.hands) for player in self.players), numpy.intp,
+            len(self.players))
+        if not starts.all():
+            return self.__settle__()
+        starts[1:] = numpy.cumsum(starts[:-1])
+        starts[0] = 0
+        self.player_payouts = numpy.add.reduceat(payouts, starts).tolist()
+        self.result_array = codes
+        self.payout_array = payouts
+        self.hand_results = None
+        self.hand_payouts = None
+
 class Table():
     '''
     This is the class that represents the game. It has the dealer and players objects, the
     deck with the cards and the logic to run the game.
+    The options of the table that are not passed as parameters are asked to the user.
+    The recorders added to the table are told when every round starts ('round_started(table)',
+    before the bets) and when it finishes ('round_finished(table)', after the payments), see
+    'blackjackHistory.py'.
+    The deck is shuffled with the random stream 'rng' (a new one is created if it's None).
+    The rounds can be scripted with 'Scenario' objects (see 'set_scenarios' and 'play_round'):
+    the cards of the scenario are stacked on top of the shuffled deck before the round.
+    The game follows the 'rules' given ('Rules'), the default ones if they are None. When the
+    rules don't say the number of decks, the usual ones of the deck type are used.
+    A new deck of the deck type is created unless one is given ('deck'), like the restored
+    shoes of 'blackjackSnapshot.py'.
     '''
-    def __init__(self):
+    def __init__(self, min_bet=None, max_bet=None, deck_type=None, players=None, rng=None,
+            rules=None, deck=None):
         # define variables
-        self.deck = None
+        self.rng = rng if rng is not None else RandomStream()
+        self.deck = deck
         self.players = []
-        self.dealer = Dealer()
+        self.recorders = []
+        self.scenarios = None
+        # settlement of the last round (see 'Settlement')
+        self.settlement = None
         # get options for table
-        self.min_bet = get_int("Minimum bet: ", filter_positive_int)
-        self.max_bet = get_int("Maximum bet: ", lambda num, min_bet = self.min_bet: num >= min_bet)
-        self.deck_type = get_int("Deck type. Standard(0) or SixPack(1): ", filter_zero_one)
-        self.num_players = get_int("Number of players: ", filter_positive_int)
+        self.min_bet = min_bet
+        if self.min_bet is None:
+            self.min_bet = get_int("Minimum bet: ", filter_positive_int)
+        self.max_bet = max_bet
+        if self.max_bet is None:
+            self.max_bet = get_int("Maximum bet: ", lambda num, min_bet = self.min_bet: num >= min_bet)
+        self.deck_type = deck_type
+        if self.deck_type is None:
+            self.deck_type = get_int("Deck type. Standard(0), SixPack(1) or Continuous SixPack(2): ",
+                filter_deck_type)
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        if self.rules.num_decks is None:
+            self.rules = self.rules.replace(num_decks=deck_type_decks(self.deck_type))
+        self.dealer = Dealer(self.rules)
         # init variables
-        self.__init_deck__()
-        self.__init_players__()
+        if self.deck is None:
+            self.__init_deck__()
+        if players is None:
+            self.num_players = get_int("Number of players: ", filter_positive_int)
+            self.__init_players__()
+        else:
+            self.players = list(players)
+            self.num_players = len(self.players)
 
     def __init_deck__(self):
+        numDecks = self.rules.num_decks
         if self.deck_type == 0:
-            self.deck = StandardDeck()
+            self.deck = StandardShoe(numDecks, self.rng)
         elif self.deck_type == 1:
-            self.deck = SixPackDeck()
+            self.deck = SixPackShoe(self.rng, num_decks=numDecks, penetration=self.rules.penetration)
+        elif self.deck_type == 2:
+            self.deck = ContinuousShoe(self.rng, num_decks=numDecks)
 
     def __init_players__(self):
         for index in range(0, self.num_players):
-            print("Player {0}:".format(index))
+            show("Player {0}:".format(index))
             player_chips = get_int("How many chips do you want to buy? ", filter_positive_int)
             self.players.append(Player(index, player_chips))
 
+    def add_recorder(self, recorder):
+        self.recorders.append(recorder)
+
+    def set_scenarios(self, scenarios):
+        '''
+        Scripts the next rounds: every round takes the next scenario of 'scenarios' (a list or
+        a generator of 'Scenario' objects or card sequences, which can be endless). The rounds
+        are played at random again when there are no scenarios left. None removes them.
+        '''
+        self.scenarios = iter(scenarios) if scenarios is not None else None
+
+    def __next_scenario__(self):
+        if self.scenarios is None:
+            return None
+        scenario = next(self.scenarios, None)
+        if scenario is None:
+            self.scenarios = None
+        elif not isinstance(scenario, Scenario):
+            scenario = Scenario(scenario)
+        return scenario
+
     def __bets_payment__(self):
+        # all the hands are settled at once, the results are only shown to the human players
+        settlement = Settlement(self.dealer.hand, self.players, self.rules)
+        settlement.pay()
+        self.settlement = settlement
+        if is_headless():
+            return
         for player in self.players:
             # clean screen
-            system('clear')
-            print('Dealer -> Total: {0}'.format(self.dealer.hand.get_hand_value()))
-            print(player.name)
-            player.payment(self.dealer.hand)
-            input('\nPress any key to continue...')
+            clear_screen()
+            show('Dealer -> Total: {0}'.format(self.dealer.hand.get_hand_value()))
+            show(player.name)
+            settlement.show(player)
+            wait_for_key()
 
     def __play_again__(self):
         # clean screen
-        system('clear')
+        clear_screen()
         current_players = {}
         for player in self.players:
             play = False
-            print(player.name + ':')
-            print('You have {0} chips remaining.'.format(player.chips))
+            show(player.name + ':')
+            show('You have {0} chips remaining.'.format(player.chips))
             if player.chips < self.min_bet:
-                print('You don\'t have enough chips to play.')
-                input('\nPress any key to continue...')
+                show('You don\'t have enough chips to play.')
+                wait_for_key()
             else:
-                play = get_int("Another hand? Yes(1) or No(0): ", filter_zero_one)
+                play = player.strategy.play_again(player)
             current_players[player] = play
         for (player, play) in current_players.items():
             if not play:
@@ -589,73 +1351,396 @@ class Table():
 
     def __play_player_hand__(self, player):
         # clean screen
-        system('clear')
+        clear_screen()
         # show dealer hand
-        print(self.dealer)
-        print('')
+        show(self.dealer)
+        show('')
         # show player hand
-        print(player)
-        print('')
+        show(player)
+        show('')
         try:
-            player.play(self.deck)
+            player.play(self.deck, self.dealer.get_upcard())
         except PlayerError:
             self.players.remove(player)
-            print('Something went wrong. {0} kicked from game.'.format(player.name))
-        input('\nPress any key to continue...')
+            show('Something went wrong. {0} kicked from game.'.format(player.name))
+        wait_for_key()
     
     def __play_dealer_hand__(self):
         # clean screen
-        system('clear')
+        clear_screen()
         # show dealer hand
         self.dealer.reveal_hand()
         self.dealer.play(self.deck)
-        input('\nPress any key to continue...')
-    
+        wait_for_key()
+
+    def play_round(self, scenario=None):
+        '''
+        Plays a single round of the game with the players that are sitting at the table: the bets
+        are placed, the cards are dealt, every player plays his/her hand(s), then the dealer plays
+        and finally the bets are paid.
+        If a 'Scenario' is given (or there are scenarios left, see 'set_scenarios') its cards are
+        the first ones dealt in the round.
+        '''
+        if scenario is None:
+            scenario = self.__next_scenario__()
+        # reshuffle the deck if needed
+        if scenario is not None:
+            self.deck.stack(scenario.cards)
+        elif self.deck.needs_shuffle():
+            self.deck.shuffle_deck()
+        for recorder in self.recorders:
+            recorder.round_started(self)
+        # the hands of the last round are released with their settlement
+        self.settlement = None
+        # init the hands of everyone in the table
+        playersToRemove = []
+        for player in self.players:
+            try:
+                player.new_hand(self.deck, self.min_bet, self.max_bet, self.rules)
+            except PlayerError:
+                show('Something went wrong. {0} kicked from game.'.format(player.name))
+                wait_for_key()
+                playersToRemove.append(player)
+        # take care of players that may have been kicked
+        for player in playersToRemove:
+            self.players.remove(player)
+        # if there are still players left, init the dealer hand and start the game
+        if len(self.players) > 0:
+            self.dealer.new_hand(self.deck)
+            # insurance is offered when the upcard is an Ace
+            if self.rules.insurance and self.dealer.get_upcard().rank == 'Ace':
+                for player in self.players:
+                    player.offer_insurance(self.dealer.get_upcard())
+            # begin game (iterate over a copy as players can be kicked while playing)
+            for player in list(self.players):
+                self.__play_player_hand__(player)
+            self.__play_dealer_hand__()
+            # end game
+            self.__bets_payment__()
+        for recorder in self.recorders:
+            recorder.round_finished(self)
+
     def play(self):
         while len(self.players) > 0:
-            system('clear')
-            # reshuffle the deck if needed
-            if self.deck.needs_shuffle() or testMode != 0:
-                if testMode == 0:
-                    self.deck.shuffle_deck()
-                else:
-                    self.deck.test_hand()
-            # init the hands of everyone in the table
-            playersToRemove = []
-            for player in self.players:
-                try:
-                    player.new_hand(self.deck, self.min_bet, self.max_bet)
-                except PlayerError:
-                    print('Something went wrong. {0} kicked from game.'.format(player.name))
-                    input('\nPress any key to continue...')
-                    playersToRemove.append(player)
-            # take care of players that may have been kicked
-            for player in playersToRemove:
-                self.players.remove(player)
-            # if there are still players left, init the dealer hand and start the game
-            if len(self.players) > 0:
-                self.dealer.new_hand(self.deck)
-                # begin game
-                for player in self.players:
-                    self.__play_player_hand__(player)
-                self.__play_dealer_hand__()
-                # end game
-                self.__bets_payment__()
-                self.__play_again__()
+            clear_screen()
+            self.play_round()
+            self.__play_again__()
         # no more players in table, so exit
 
+class Scenario():
+    '''
+    Class that represents a scripted round: the cards that are dealt first in the round, in the
+    order in which they are dealt (the rest of the cards are dealt at random). The cards can be
+    'Card' objects or their names ('8 Hearts', 'Ace Spades'). 'deal' builds the sequence from
+    the hands of the players and the dealer.
+    '''
+    def __init__(self, cards, name='Scenario'):
+        self.name = name
+        self.cards = [card if isinstance(card, Card) else parse_card(card) for card in cards]
+
+    @classmethod
+    def deal(cls, player_hands, dealer_hand=(), draws=(), name='Scenario'):
+        '''
+        Builds the scenario from the starting hands of the players (two cards each, in the order
+        of the seats), the hand of the dealer (the hidden card first, then the upcard) and the
+        cards drawn after the deal, in the order in which they are drawn. The players that are
+        not scripted must sit after the scripted ones, and the draws need the dealer hand.
+        '''
+        cards = []
+        for hand in player_hands:
+            if len(hand) != 2:
+                raise ValueError('The starting hands must have two cards: {0}'.format(hand))
+            cards += hand
+        if dealer_hand or draws:
+            if len(dealer_hand) != 2:
+                raise ValueError('The hand of the dealer must have two cards: {0}'.format(dealer_hand))
+            cards += dealer_hand
+        cards += draws
+        return cls(cards, name)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.name, ', '.join(str(card) for card in self.cards))
+
 class PlayerError(Exception):
     pass
 
+class Strategy():
+    '''
+    Abstract class for the strategies that take the decisions of a player during the game.
+    The 'upcard' parameter is the visible card of the dealer (it can be None if it's unknown).
+    See the classes that inherit from this one for the available strategies.
+    '''
+    def bet(self, player, min_bet, max_bet, bet_check):
+        '''
+        Returns the amount of chips to bet for the next hand. The 'bet_check' function tells if
+        an amount is a valid bet for the player.
+        '''
+        return min_bet
+
+    def split_pair(self, hand, upcard):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def double_down(self, hand, upcard):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def hit(self, hand, upcard):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def surrender(self, hand, upcard):
+        '''
+        Returns True to give up the starting hand (only asked if the rules allow surrender).
+        '''
+        return False
+
+    def insurance(self, hand, upcard):
+        '''
+        Returns True to insure the hand (only asked if the rules allow insurance).
+        '''
+        return False
+
+    def play_again(self, player):
+        return True
+
+class InteractiveStrategy(Strategy):
+    '''
+    Strategy where the decisions are taken by a human, who is asked through the terminal.
+    '''
+    def bet(self, player, min_bet, max_bet, bet_check):
+        bet_to_place = get_int('How many chips do you want to bet? ', filter_positive_int)
+        while not bet_check(bet_to_place):
+            if bet_to_place > player.chips:
+                show('You don\'t have that many chips.')
+            else:
+                show('Bet must be between {0} and {1} chips.'.format(min_bet, max_bet))
+            bet_to_place = get_int('How many chips do you want to bet? ', filter_positive_int)
+        return bet_to_place
+
+    def split_pair(self, hand, upcard):
+        return get_int("Split pairs? Yes(1) or No(0): ", filter_zero_one)
+
+    def double_down(self, hand, upcard):
+        return get_int("Double down {0}? Yes(1) or No(0): ".format(hand.name), filter_zero_one)
+
+    def hit(self, hand, upcard):
+        return get_int('Hit(1) or Stay(0)? ', filter_zero_one)
+
+    def surrender(self, hand, upcard):
+        return get_int("Surrender? Yes(1) or No(0): ", filter_zero_one)
+
+    def insurance(self, hand, upcard):
+        return get_int("Insurance? Yes(1) or No(0): ", filter_zero_one)
+
+    def play_again(self, player):
+        return get_int("Another hand? Yes(1) or No(0): ", filter_zero_one)
+
+class AlwaysStandStrategy(Strategy):
+    '''
+    Strategy that never takes any risk: it never splits, never doubles down and always stays.
+    '''
+    def split_pair(self, hand, upcard):
+        return False
+
+    def double_down(self, hand, upcard):
+        return False
+
+    def hit(self, hand, upcard):
+        return False
+
+class DealerStrategy(Strategy):
+    '''
+    Strategy that mimics the dealer: it hits until reaching 17 points and never splits or doubles.
+    '''
+    def split_pair(self, hand, upcard):
+        return False
+
+    def double_down(self, hand, upcard):
+        return False
+
+    def hit(self, hand, upcard):
+        return hand.value() < 17
+
+class BasicStrategy(Strategy):
+    '''
+    The basic strategy for a multi deck game where the dealer stands on all 17s. It only
+    depends on the player hand and the dealer upcard. The tables below are indexed by the
+    value of the dealer upcard (2 to 11, where 11 is an Ace).
+    '''
+    # dealer upcards for which the player pairs must be split
+    SPLIT_PAIRS = {
+        'Ace': range(2, 12),
+        '8': range(2, 12),
+        '9': (2, 3, 4, 5, 6, 8, 9),
+        '7': range(2, 8),
+        '6': range(2, 7),
+        '4': (5, 6),
+        '3': range(2, 8),
+        '2': range(2, 8)
+    }
+    # dealer upcards for which the player hard totals must be doubled down
+    DOUBLE_DOWN = {
+        11: range(2, 11),
+        10: range(2, 10),
+        9: range(3, 7)
+    }
+
+    def split_pair(self, hand, upcard):
+        return upcard_value(upcard) in BasicStrategy.SPLIT_PAIRS.get(hand.get_cards()[0].rank, ())
+
+    def double_down(self, hand, upcard):
+        if hand.is_soft():
+            return False
+        return upcard_value(upcard) in BasicStrategy.DOUBLE_DOWN.get(hand.value(), ())
+
+    def hit(self, hand, upcard):
+        total = hand.value()
+        dealerValue = upcard_value(upcard)
+        if hand.is_soft():
+            return total <= 17 or (total == 18 and dealerValue >= 9)
+        if total <= 11:
+            return True
+        if total == 12:
+            return dealerValue < 4 or dealerValue > 6
+        if total <= 16:
+            return dealerValue > 6
+        return False
+
+class CallableStrategy(Strategy):
+    '''
+    Strategy that delegates its decisions to a function given by the user. The function is
+    called as 'function(decision, hand, upcard)', where 'decision' is one of 'split', 'double'
+    or 'hit' ('surrender' and 'insurance' too if the rules allow them), and it must return True
+    if the player wants to do the action.
+    '''
+    def __init__(self, function, bet_amount=None):
+        self.function = function
+        self.bet_amount = bet_amount
+
+    def bet(self, player, min_bet, max_bet, bet_check):
+        if self.bet_amount is None:
+            return min_bet
+        return self.bet_amount
+
+    def split_pair(self, hand, upcard):
+        return self.function('split', hand, upcard)
+
+    def double_down(self, hand, upcard):
+        return self.function('double', hand, upcard)
+
+    def hit(self, hand, upcard):
+        return self.function('hit', hand, upcard)
+
+    def surrender(self, hand, upcard):
+        return self.function('surrender', hand, upcard)
+
+    def insurance(self, hand, upcard):
+        return self.function('insurance', hand, upcard)
+
 
 # Global functions
 
 def filter_zero_one(value):
     return value == 0 or value == 1
 
+def filter_deck_type(value):
+    return 0 <= value <= 2
+
 def filter_positive_int(value):
     return 0 < value
 
+def deck_type_decks(deck_type):
+    '''
+    Returns the usual number of decks of the deck type: one for the standard deck and six for
+    the six-pack decks.
+    '''
+    return StandardShoe.NUM_DECKS if deck_type == 0 else SixPackShoe.NUM_DECKS
+
+def upcard_value(card):
+    '''
+    Returns the points of the dealer upcard, counting the Aces as 11.
+    '''
+    if card is None:
+        return 0
+    return card.points
+
+def card_code(card):
+    '''
+    Returns the code of the card used in the shoes (see 'CARD_CODES').
+    '''
+    return card.code
+
+def stack_cards(items, wanted):
+    '''
+    Moves the 'wanted' cards (or codes) to the top of the deck 'items', in the same order, by
+    swapping them with the cards that were there. The positions of the wanted cards are indexed
+    in a single pass, so every card is placed in O(1) without searching the deck.
+    '''
+    positions = {item: set() for item in wanted}
+    for index, item in enumerate(items):
+        if item in positions:
+            positions[item].add(index)
+    # the sets only keep the positions of the cards that haven't been stacked
+    for i, item in enumerate(wanted):
+        if not positions[item]:
+            card = CARDS[item] if isinstance(item, int) else item
+            raise ValueError('There are not enough {0} in the deck.'.format(card))
+        index = positions[item].pop()
+        if index != i:
+            other = items[i]
+            if other in positions:
+                positions[other].discard(i)
+                positions[other].add(index)
+            items[i], items[index] = item, other
+
+def parse_card(name):
+    '''
+    Returns the card with the given name: the rank and the suit, like '8 Hearts' or 'Ace Spades'.
+    '''
+    try:
+        rank, suit = name.split()
+    except ValueError:
+        raise ValueError('Unknown card: {0}'.format(name))
+    return Card(suit, rank)
+
+def play_scenarios(table, scenarios):
+    '''
+    Generator that plays a round at the table for every scenario (a list or a generator of
+    'Scenario' objects or card sequences) and yields the scenario and the table after the round,
+    so that the hands and the chips of the players can be checked.
+    '''
+    for scenario in scenarios:
+        if not isinstance(scenario, Scenario):
+            scenario = Scenario(scenario)
+        table.play_round(scenario)
+        yield scenario, table
+
+def set_frontend(newFrontend):
+    '''
+    Replaces the frontend used by the game and returns the previous one.
+    '''
+    global frontend
+    previousFrontend = frontend
+    frontend = newFrontend
+    return previousFrontend
+
+def is_headless():
+    return isinstance(frontend, NullFrontend)
+
+def show(*args):
+    '''
+    Shows the arguments on the screen (like 'print').
+    '''
+    frontend.write(*args)
+
+def clear_screen():
+    frontend.clear()
+
+def wait_for_key():
+    if not is_headless():
+        frontend.read('\nPress any key to continue...')
+
 def get_int(message, filter_func=(lambda num: True), errMsg='Please, enter a valid value.'):
     '''
     This method gets and int, ensuring the value entered by the user is correct.
@@ -663,66 +1748,51 @@ def get_int(message, filter_func=(lambda num: True), errMsg='Please, enter a val
     value = -1
     filter_passed = False
     while(not filter_passed):
-        value_str = input(message)
+        value_str = frontend.read(message)
         try:
             value = int(value_str)
             filter_passed = filter_func(value)
         except ValueError:
-            print(errMsg)
+            show(errMsg)
 
     return value
 
-def start_game():
+def start_game(scenario=None):
     '''
     This function initializes everything needed to play a game and starts it.
-    It doesn't need any parameters and doesn't return anything.
+    If the name of a scenario is given (see 'TEST_SCENARIOS') every round is dealt with it.
+    It doesn't return anything.
     It is run if this script is run as '__main__'.
     '''
-    system('clear')
-    print('Welcome to Terminal Blackjack!')
+    if scenario is not None and scenario not in TEST_SCENARIOS:
+        show('Unknown scenario. Choose one of: {0}'.format(', '.join(TEST_SCENARIOS)))
+        frontend.flush()
+        return
+    clear_screen()
+    show('Welcome to Terminal Blackjack!')
     table = Table()
+    if scenario is not None:
+        table.set_scenarios(repeat(TEST_SCENARIOS[scenario]))
     table.play()
-    print("See you soon!")
-    # TODO: test all testModes
-
-
-testCards = {
-    1: [
-        Card('Hearts', '8'),
-        Card('Diamonds', '8')
-    ],
-    2: [
-        Card('Hearts', '6'),
-        Card('Diamonds', '4')
-    ],
-    3: [
-        Card('Hearts', 'Ace'),
-        Card('Diamonds', 'King')
-    ],
-    4: [
-        Card('Hearts', 'Ace'),
-        Card('Diamonds', 'King'),
-        Card('Spades', 'Ace'),
-        Card('Clubs', 'Queen')
-    ],
-    5: [
-        Card('Hearts', '8'),
-        Card('Diamonds', '8'),
-        Card('Spades', '6'),
-        Card('Clubs', '7'),
-        Card('Spades', '2'),
-        Card('Clubs', '3')
-    ],
-    6: [
-        Card('Hearts', 'Ace'),
-        Card('Diamonds', 'King'),
-        Card('Spades', '6'),
-        Card('Clubs', 'Queen'),
-        Card('Hearts', '5')
-    ]
+    show("See you soon!")
+    frontend.flush()
+
+
+# Scenarios to try the different situations of the game with one player
+# (python blackjack.py <scenario>)
+TEST_SCENARIOS = {
+    'split': Scenario(['8 Hearts', '8 Diamonds'], 'Split pairs'),
+    'double': Scenario(['6 Hearts', '4 Diamonds'], 'Double down'),
+    'natural': Scenario(['Ace Hearts', 'King Diamonds'], 'Player natural'),
+    'naturals': Scenario.deal([['Ace Hearts', 'King Diamonds']], ['Ace Spades', 'Queen Clubs'],
+        name='Player and dealer naturals'),
+    'split-double': Scenario.deal([['8 Hearts', '8 Diamonds']], ['6 Spades', '7 Clubs'],
+        ['2 Spades', '3 Clubs'], name='Split and double down'),
+    'natural-only': Scenario.deal([['Ace Hearts', 'King Diamonds']], ['6 Spades', 'Queen Clubs'],
+        ['5 Hearts'], name='Player natural (not dealer natural)')
 }
 
 # Script call to main function
 
 if __name__ == '__main__':
-    start_game()
+    start_game(argv[1] if len(argv) > 1 else None)
@@ -0,0 +1,283 @@
+'''
+This is a script file that simulates the bankroll of a player of the BlackJack game in
+'blackjack.py' over whole sessions. Instead of playing the hands, the net result of every
+hand is drawn from a distribution of outcomes, so thousands of sessions are simulated in
+lockstep: one step plays one hand of every session that hasn't finished.
+The outcomes are the chips won or lost in a hand in units of its initial bet, with its doubles
+and splits, the surrenders and the natural payout of the rules (a doubled hand lost is -2, a
+natural paid 6:5 is +1.2 and a surrender is -0.5), so the expected value of the distribution is
+the one of the game. They are measured by playing the game with the strategy tables of the
+rules, or taken from a hand history.
+A session finishes when the player can't bet the minimum (ruin), when the chips reach the goal
+or after the maximum number of hands. The report has the risk of ruin, the median session
+length and the percentiles of the final chips.
+    python blackjackBankroll.py --chips 1000 --min-bet 10 --max-bet 100 --bet 20
+    python blackjackBankroll.py --rules H17-BJ6:5  -> outcomes measured by playing the rules
+    python blackjackBankroll.py --history FILE     -> outcomes measured in a hand history
+NumPy is optional: with it every step is a few vectorized operations over all the sessions,
+without it the sessions are stepped with the standard library (much slower).
+All rights reserved.
+'''
+
+# Imports
+
+import argparse
+from fractions import Fraction
+from math import lcm
+from sys import argv
+
+from blackjack import Rules
+from blackjackHistory import read_history
+from randomStreams import RandomStream
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Global variables
+
+# Net results (in units of the initial bet) of 6,000,000 hands played with the basic strategy
+# tables in the six-pack game with the default rules, with their doubles and splits (measured
+# with 'OutcomeDistribution.from_simulation'). Their expected value is -0.12% per hand.
+DEFAULT_OUTCOMES = {
+    -8: 1, -7: 5, -6: 56, -5: 419, -4: 2214, -3: 10681, -2: 170270, -1.5: 45, -1: 2680826,
+    -0.5: 413, 0: 523390, 0.5: 5150, 1: 2052792, 1.5: 274536, 2: 250319, 2.5: 6384, 3: 16640,
+    3.5: 650, 4: 3987, 4.5: 248, 5: 775, 5.5: 29, 6: 156, 7: 14
+}
+
+# Hands played to measure the outcomes of other rules
+SIMULATED_HANDS = 200000
+# Largest denominator of the outcomes (the natural payouts are limited the same way by 'Rules')
+MAX_DENOMINATOR = 1000
+
+PERCENTILES = (5, 25, 50, 75, 95)
+TRAJECTORIES = 10000
+MAX_HANDS = 1000
+
+
+# Script classes
+
+class OutcomeDistribution():
+    '''
+    Class that represents the probabilities of the net results of a hand ('outcomes'), in units
+    of its initial bet. The outcomes are exact fractions with a common 'denominator': 'units'
+    has the chips won by every outcome for every 'denominator' chips bet, so the chips won
+    with a bet are rounded down like the payouts of the game. The probabilities are
+    normalized, so counts of hands can be given too.
+    '''
+    def __init__(self, outcomes):
+        weights = {}
+        for outcome, weight in outcomes.items():
+            outcome = Fraction(outcome).limit_denominator(MAX_DENOMINATOR)
+            weights[outcome] = weights.get(outcome, 0) + weight
+        if not weights or min(weights.values()) < 0 or sum(weights.values()) <= 0:
+            raise ValueError('The outcome probabilities must be positive.')
+        total = sum(weights.values())
+        self.outcomes = tuple(sorted(weights))
+        self.probabilities = tuple(weights[outcome] / total for outcome in self.outcomes)
+        self.denominator = lcm(*(outcome.denominator for outcome in self.outcomes))
+        self.units = tuple(int(outcome * self.denominator) for outcome in self.outcomes)
+        # the last cumulative probability is exactly 1 so that every draw has an outcome
+        cumulative = []
+        accumulated = 0.0
+        for probability in self.probabilities:
+            accumulated += probability
+            cumulative.append(accumulated)
+        cumulative[-1] = 1.0
+        self.cumulative = tuple(cumulative)
+
+    @classmethod
+    def from_history(cls, path):
+        '''
+        Distribution of the net results of the players in the rounds recorded in a hand
+        history: the chips after the round minus the chips before, so the payouts are the ones
+        of the rules of the history.
+        '''
+        outcomes = {}
+        for roundRecord in read_history(path):
+            for seatRecord in roundRecord.seats:
+                if seatRecord.initial_bet > 0:
+                    outcome = Fraction(seatRecord.chips_after - seatRecord.chips_before,
+                        seatRecord.initial_bet)
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        return cls(outcomes)
+
+    @classmethod
+    def from_simulation(cls, rules=None, hands=SIMULATED_HANDS, seed=None):
+        '''
+        Distribution of the net results of hands played with the basic strategy tables of the
+        rules (see 'blackjackSimulator.py').
+        '''
+        # imported here as the simulator loads (or computes) the strategy tables
+        from blackjackSimulator import simulate
+        return cls(simulate(rounds=hands, seed=seed, rules=rules).outcomes)
+
+    def expected_value(self):
+        '''
+        Chips won per chip bet in every hand.
+        '''
+        return sum(p * float(outcome) for p, outcome in zip(self.probabilities, self.outcomes))
+
+    def __str__(self):
+        # the outcomes that are too unlikely to matter are left out
+        return ', '.join('{0:+g} {1:.2%}'.format(float(outcome), probability)
+            for outcome, probability in zip(self.outcomes, self.probabilities)
+            if probability >= 0.0005)
+
+class BankrollResult():
+    '''
+    Class that contains the final chips and the length (in hands) of every session.
+    '''
+    def __init__(self, chips, lengths, min_bet, starting_chips):
+        self.chips = sorted(chips)
+        self.lengths = sorted(lengths)
+        self.min_bet = min_bet
+        self.starting_chips = starting_chips
+
+    def risk_of_ruin(self):
+        '''
+        Fraction of the sessions that finished without chips to bet the minimum.
+        '''
+        return sum(1 for chips in self.chips if chips < self.min_bet) / len(self.chips)
+
+    def median_length(self):
+        return percentile(self.lengths, 50)
+
+    def chip_percentiles(self, percentiles=PERCENTILES):
+        return [(p, percentile(self.chips, p)) for p in percentiles]
+
+    def __str__(self):
+        resultString = 'Sessions: {0}\n'.format(len(self.chips))
+        resultString += 'Risk of ruin: {0:.2%}\n'.format(self.risk_of_ruin())
+        resultString += 'Median session length: {0:.0f} hands\n'.format(self.median_length())
+        resultString += 'Mean final chips: {0:.1f} (started with {1})\n'.format(
+            sum(self.chips) / len(self.chips), self.starting_chips)
+        resultString += '\n'.join('Chips percentile {0:>2}: {1:.0f}'.format(p, chips)
+            for p, chips in self.chip_percentiles())
+        return resultString
+
+class BankrollSimulator():
+    '''
+    Simulates 'trajectories' sessions that start with 'chips' and bet 'bet' chips in every hand
+    (limited to the table limits and to the chips left). A hand can lose more than its bet
+    (doubles and splits), but never more than the chips left, as the player can't double or
+    split without them. A 'goal' of 0 means that the sessions only finish by ruin or after
+    'max_hands' hands.
+    '''
+    def __init__(self, distribution=None, chips=1000, min_bet=10, max_bet=500, bet=None,
+            max_hands=MAX_HANDS, goal=0, rng=None):
+        if distribution is None:
+            distribution = OutcomeDistribution(DEFAULT_OUTCOMES)
+        self.distribution = distribution
+        self.chips = chips
+        self.min_bet = min_bet
+        self.max_bet = max_bet
+        self.bet = min(max(bet if bet is not None else min_bet, min_bet), max_bet)
+        self.max_hands = max_hands
+        self.goal = goal
+        self.rng = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+
+    def run(self, trajectories=TRAJECTORIES):
+        if numpy is not None:
+            chips, lengths = self.__run_numpy__(trajectories)
+        else:
+            chips, lengths = self.__run_lockstep__(trajectories)
+        return BankrollResult(chips, lengths, self.min_bet, self.chips)
+
+    def __run_numpy__(self, trajectories):
+        generator = self.rng.numpy_generator()
+        cumulative = numpy.array(self.distribution.cumulative)
+        units = numpy.array(self.distribution.units, dtype=numpy.int64)
+        denominator = self.distribution.denominator
+        chips = numpy.full(trajectories, self.chips, dtype=numpy.int64)
+        lengths = numpy.full(trajectories, self.max_hands, dtype=numpy.int64)
+        active = numpy.flatnonzero(chips >= self.min_bet)
+        lengths[chips < self.min_bet] = 0
+        for hand in range(0, self.max_hands):
+            if active.size == 0:
+                break
+            bets = numpy.minimum(chips[active], self.bet)
+            outcomes = numpy.searchsorted(cumulative, generator.random(active.size), side='right')
+            chips[active] = numpy.maximum(chips[active] + bets * units[outcomes] // denominator, 0)
+            finished = chips[active] < self.min_bet
+            if self.goal > 0:
+                finished |= chips[active] >= self.goal
+            lengths[active[finished]] = hand + 1
+            active = active[~finished]
+        return chips.tolist(), lengths.tolist()
+
+    def __run_lockstep__(self, trajectories):
+        cumulative = self.distribution.cumulative
+        outcomeIndexes = range(0, len(self.distribution.outcomes))
+        units = self.distribution.units
+        denominator = self.distribution.denominator
+        chips = [self.chips] * trajectories
+        lengths = [self.max_hands] * trajectories
+        active = [index for index in range(0, trajectories) if chips[index] >= self.min_bet]
+        for index in range(0, trajectories):
+            if chips[index] < self.min_bet:
+                lengths[index] = 0
+        for hand in range(0, self.max_hands):
+            if not active:
+                break
+            outcomes = self.rng.choices(outcomeIndexes, cum_weights=cumulative, k=len(active))
+            stillActive = []
+            for index, outcome in zip(active, outcomes):
+                bet = min(chips[index], self.bet)
+                chips[index] = max(chips[index] + bet * units[outcome] // denominator, 0)
+                if chips[index] < self.min_bet or (self.goal > 0 and chips[index] >= self.goal):
+                    lengths[index] = hand + 1
+                else:
+                    stillActive.append(index)
+            active = stillActive
+        return chips, lengths
+
+
+# Global functions
+
+def percentile(sortedValues, p):
+    '''
+    Percentile of the sorted values, interpolating linearly between the closest ranks (like
+    the default method of 'numpy.percentile').
+    '''
+    position = (len(sortedValues) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sortedValues) - 1)
+    return sortedValues[lower] + (sortedValues[upper] - sortedValues[lower]) * (position - lower)
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Bankroll and risk of ruin of BlackJack sessions.')
+    parser.add_argument('--chips', type=int, default=1000, help='starting chips')
+    parser.add_argument('--min-bet', type=int, default=10)
+    parser.add_argument('--max-bet', type=int, default=500)
+    parser.add_argument('--bet', type=int, default=None, help='bet of every hand (the minimum by default)')
+    parser.add_argument('--hands', type=int, default=MAX_HANDS, help='maximum hands per session')
+    parser.add_argument('--goal', type=int, default=0, help='stop the sessions that reach these chips')
+    parser.add_argument('--trajectories', type=int, default=TRAJECTORIES, help='sessions simulated')
+    parser.add_argument('--history', default=None, help='take the outcomes from a hand history')
+    parser.add_argument('--rules', type=Rules.from_key, default=None,
+        help='measure the outcomes by playing these rules, like H17-BJ6:5 (see Rules.from_key)')
+    parser.add_argument('--simulated-hands', type=int, default=SIMULATED_HANDS,
+        help='hands played to measure the outcomes of the rules')
+    parser.add_argument('--seed', type=int, default=None)
+    options = parser.parse_args(args)
+
+    if options.history is not None:
+        distribution = OutcomeDistribution.from_history(options.history)
+    elif options.rules is not None:
+        distribution = OutcomeDistribution.from_simulation(options.rules,
+            options.simulated_hands, options.seed)
+    else:
+        distribution = OutcomeDistribution(DEFAULT_OUTCOMES)
+    simulator = BankrollSimulator(distribution, options.chips, options.min_bet, options.max_bet,
+        options.bet, options.hands, options.goal, options.seed)
+    print('Outcomes: {0} (EV {1:+.2%} per hand)'.format(distribution, distribution.expected_value()))
+    print('Bet: {0} chips per hand'.format(simulator.bet))
+    print(simulator.run(options.trajectories))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
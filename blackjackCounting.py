@@ -0,0 +1,149 @@
+'''
+This is a script file with the card counting systems for the BlackJack game in 'blackjack.py'.
+A counter is added to the deck of the table and its running count is updated every time a
+card is dealt, so the true count can be used to decide the bets of the players.
+All rights reserved.
+'''
+
+# Imports
+
+from blackjack import CARD_CODES, RANKS, Deck, Strategy
+
+
+# Script classes
+
+class CountingSystem():
+    '''
+    Class that represents a card counting system: the tag (points added to the running count)
+    of each rank and the initial running count per deck, which is 0 for balanced systems.
+    '''
+    def __init__(self, name, tags, initial_count_per_deck=0):
+        missingRanks = [rank for rank in RANKS if rank not in tags]
+        if missingRanks:
+            raise ValueError('Missing tags for the ranks: {0}'.format(', '.join(missingRanks)))
+        self.name = name
+        self.tags = dict(tags)
+        self.initial_count_per_deck = initial_count_per_deck
+
+    def is_balanced(self):
+        return sum(self.tags.values()) == 0
+
+    def __str__(self):
+        return self.name
+
+class CardCounter():
+    '''
+    Class that keeps the running count of a deck with a counting system. The tags are stored
+    by card code (see 'CARD_CODES') so that every card dealt is counted with a single lookup.
+    '''
+    def __init__(self, system):
+        self.system = system
+        self.tags = tuple(system.tags[rank] for (_, rank) in CARD_CODES)
+        self.deck = None
+        self.running_count = 0
+
+    def shuffled(self, deck):
+        '''
+        Called by the deck when it's shuffled: the count starts again.
+        '''
+        self.deck = deck
+        self.running_count = self.system.initial_count_per_deck * deck.num_decks
+
+    def card_dealt(self, code):
+        self.running_count += self.tags[code]
+
+    def decks_remaining(self):
+        return self.deck.cards_remaining() / Deck.CARDS_IN_DECK
+
+    def true_count(self):
+        '''
+        Running count divided by the number of decks that remain to be dealt.
+        '''
+        decksRemaining = self.decks_remaining()
+        if decksRemaining <= 0:
+            return float(self.running_count)
+        return self.running_count / decksRemaining
+
+    def cards_until_shuffle(self):
+        '''
+        Number of cards that will be dealt before the deck is shuffled again, given by the
+        'plastic mark' of the six-pack decks. Other decks are shuffled before every hand.
+        '''
+        return max(getattr(self.deck, 'plastic_mark', 0), 0)
+
+    def __str__(self):
+        return '{0}: running count {1}, true count {2:.2f}'.format(self.system,
+            self.running_count, self.true_count())
+
+class CountingStrategy(Strategy):
+    '''
+    Strategy that bets depending on the true count of a counter and takes the rest of the
+    decisions with another strategy. The bet is the minimum bet multiplied by the units
+    returned by 'bet_ramp(true_count)', and it's limited by the maximum bet of the table.
+    '''
+    def __init__(self, strategy, counter, bet_ramp=None):
+        self.strategy = strategy
+        self.counter = counter
+        self.bet_ramp = bet_ramp if bet_ramp is not None else default_bet_ramp
+
+    def bet(self, player, min_bet, max_bet, bet_check):
+        amount = min(min_bet * self.bet_ramp(self.counter.true_count()), max_bet)
+        if not bet_check(amount):
+            return min_bet
+        return amount
+
+    def split_pair(self, hand, upcard):
+        return self.strategy.split_pair(hand, upcard)
+
+    def double_down(self, hand, upcard):
+        return self.strategy.double_down(hand, upcard)
+
+    def hit(self, hand, upcard):
+        return self.strategy.hit(hand, upcard)
+
+    def surrender(self, hand, upcard):
+        return self.strategy.surrender(hand, upcard)
+
+    def insurance(self, hand, upcard):
+        return self.strategy.insurance(hand, upcard)
+
+    def play_again(self, player):
+        return self.strategy.play_again(player)
+
+
+# Global variables
+
+HI_LO = CountingSystem('Hi-Lo', {
+    '2': 1, '3': 1, '4': 1, '5': 1, '6': 1,
+    '7': 0, '8': 0, '9': 0,
+    '10': -1, 'Jack': -1, 'Queen': -1, 'King': -1, 'Ace': -1
+})
+
+# KO is unbalanced (it has one more positive tag than Hi-Lo), so the count starts below zero
+KO = CountingSystem('KO', {
+    '2': 1, '3': 1, '4': 1, '5': 1, '6': 1, '7': 1,
+    '8': 0, '9': 0,
+    '10': -1, 'Jack': -1, 'Queen': -1, 'King': -1, 'Ace': -1
+}, -4)
+
+OMEGA_II = CountingSystem('Omega II', {
+    '2': 1, '3': 1, '4': 2, '5': 2, '6': 2, '7': 1,
+    '8': 0, '9': -1,
+    '10': -2, 'Jack': -2, 'Queen': -2, 'King': -2, 'Ace': 0
+})
+
+# Counting systems that can be chosen by name
+SYSTEMS = {
+    'hilo': HI_LO,
+    'ko': KO,
+    'omega2': OMEGA_II
+}
+
+
+# Global functions
+
+def default_bet_ramp(true_count):
+    '''
+    Bets one unit until the true count reaches 2 and then as many units as the true count.
+    '''
+    return max(1, int(true_count))
@@ -0,0 +1,84 @@
+'''
+This is a script file with the binary encoding shared by the files of the BlackJack game in
+'blackjack.py': the hand histories ('blackjackHistory.py') and the snapshots of the tables
+('blackjackSnapshot.py'). The numbers are varints (7 bits per byte starting by the lowest
+ones, the highest bit of every byte tells if more bytes follow), cards take one byte (their
+code, see 'CARDS') and the texts are UTF-8 prefixed by their length.
+The decoding functions take the buffer and the offset to decode from, and return the value and
+the next offset. They raise IndexError when the buffer ends before the value.
+All rights reserved.
+'''
+
+# Imports
+
+from blackjack import CARDS
+
+
+# Global functions
+
+def write_varint(buffer, value):
+    '''
+    Appends the unsigned integer to the buffer (a bytearray).
+    '''
+    if value < 0:
+        raise ValueError('Negative values can\'t be stored: {0}'.format(value))
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def read_varint(binaryFile):
+    '''
+    Reads a varint from the file. Returns None at the end of the file and raises EOFError if
+    the file ends in the middle of the varint.
+    '''
+    value = 0
+    shift = 0
+    while True:
+        byte = binaryFile.read(1)
+        if not byte:
+            if shift == 0:
+                return None
+            raise EOFError('The file ends in the middle of a varint.')
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+def decode_varint(buffer, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def write_cards(buffer, cards):
+    buffer.append(len(cards))
+    buffer.extend([card.code for card in cards])
+
+def decode_cards(buffer, offset, hand):
+    '''
+    Adds the cards at the offset to the hand. Returns the next offset.
+    '''
+    numCards = buffer[offset]
+    offset += 1
+    if offset + numCards > len(buffer):
+        raise IndexError('The cards are truncated.')
+    for code in buffer[offset:offset + numCards]:
+        hand.add_card(CARDS[code])
+    return offset + numCards
+
+def write_text(buffer, text):
+    encoded = text.encode('utf-8')
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+def decode_text(buffer, offset):
+    length, offset = decode_varint(buffer, offset)
+    if offset + length > len(buffer):
+        raise IndexError('The text is truncated.')
+    return str(buffer[offset:offset + length], 'utf-8'), offset + length
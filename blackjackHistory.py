@@ -0,0 +1,321 @@
+'''
+This is a script file with the hand history of the BlackJack game in 'blackjack.py'. A
+'HistoryWriter' added to a table records every round in an append-only binary file, and
+'read_history' reads the rounds back one by one without loading the file in memory.
+    python blackjackHistory.py record FILE [rounds] [strategy] [rules]  -> simulate rounds into FILE
+    python blackjackHistory.py replay FILE                              -> audit the rounds of FILE
+Every round is a record prefixed by its length (a varint). Cards take one byte (their code)
+and bets and chips are varints (see 'blackjackEncoding.py'), so a round with one player takes
+about 26 bytes. The decisions are not stored one by one as they can be told from the hands: every hand
+after the first one comes from a split, a hand with a bigger bet than the initial bet was
+doubled down and the rest of the cards of the hands were hits.
+The header has the key of the rules of the table (see 'Rules'), which are needed to check the
+payments when the history is replayed.
+Header: magic, version (1 byte), rules key: length (1 byte) + ASCII characters
+Record of a round:
+    dealer cards: count (1 byte) + codes (1 byte each)
+    players:      count (1 byte) + for every player:
+        seat (1 byte), chips before the round, initial bet, insurance, chips after the round
+        (varints)
+        hands: count (1 byte) + for every hand:
+            bet (varint), result settled by the table (1 byte, its code in 'RESULTS' with
+            'SURRENDERED' set if the hand was surrendered), cards: count (1 byte) + codes
+            (1 byte each)
+All rights reserved.
+'''
+
+# Imports
+
+import os
+from sys import argv
+
+from blackjack import DEFAULT_RULES, Rules, DealerHand, PlayerHand, Player, HandResult
+from blackjack import AlwaysStandStrategy
+from blackjackEncoding import write_varint, read_varint, decode_varint, write_cards, decode_cards
+
+
+# Global variables
+
+MAGIC = b'BJHH'
+VERSION = 3
+HEADER = MAGIC + bytes([VERSION])
+
+# Size of the buffers used to write and read the files (in bytes)
+BUFFER_SIZE = 1 << 16
+
+# The results are stored as their position in this tuple
+RESULTS = (HandResult.DEALER_WINS, HandResult.DRAW, HandResult.PLAYER_WINS, HandResult.PLAYER_NATURAL,
+    HandResult.PLAYER_SURRENDERS)
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+# Bit of the result byte set for the surrendered hands (a surrendered hand loses the whole bet
+# when the dealer has a natural, so it can't be told from the result)
+SURRENDERED = 0x80
+
+# Player used to compare the hands when replaying (compare_hands doesn't depend on the player)
+REFEREE = Player(0, 0, AlwaysStandStrategy())
+
+
+# Script classes
+
+class HistoryError(Exception):
+    pass
+
+class HistoryWriter():
+    '''
+    Recorder of the rounds played at a table (see 'Table.add_recorder') with the given rules
+    (the default ones if they are None). The chips of the players are taken when the round
+    starts and the record is written when it finishes, with the results of the settlement of
+    the table (see 'Table.settlement'). The records are appended to the file
+    through a buffer, so the writer must be closed (it can be used in a 'with' statement).
+    The rounds can only be appended to a history recorded with the same rules.
+    '''
+    def __init__(self, path, rules=None, buffer_size=BUFFER_SIZE):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        newFile = not os.path.isfile(path) or os.path.getsize(path) == 0
+        if not newFile:
+            with open(path, 'rb') as historyFile:
+                if __read_header__(historyFile) != self.rules:
+                    raise HistoryError('The history was recorded with other rules.')
+        self.file = open(path, 'ab', buffering=buffer_size)
+        if newFile:
+            key = self.rules.key().encode('ascii')
+            self.file.write(HEADER + bytes([len(key)]) + key)
+        self.seats = {}
+        self.rounds_written = 0
+
+    def round_started(self, table):
+        self.seats = {player: (seat, player.chips) for seat, player in enumerate(table.players)}
+
+    def round_finished(self, table):
+        # the players kicked during the round are not in the settlement (its results are the
+        # ones of the hands of all its players, one after the other)
+        settlement = table.settlement
+        seats = []
+        if settlement is not None:
+            index = 0
+            for player in settlement.players:
+                numHands = len(player.hands)
+                if player in self.seats:
+                    seats.append((self.seats[player], player,
+                        settlement.results[index:index + numHands]))
+                index += numHands
+        if seats:
+            self.write_round(table.dealer.hand, seats)
+        self.seats = {}
+
+    def write_round(self, dealerHand, seats):
+        '''
+        Writes the record of a round. 'seats' is a list of ((seat, chips before), player,
+        results of the hands of the player).
+        '''
+        record = bytearray()
+        write_cards(record, dealerHand.get_cards())
+        record.append(len(seats))
+        for (seat, chipsBefore), player, results in seats:
+            record.append(seat)
+            write_varint(record, chipsBefore)
+            write_varint(record, player.initial_bet)
+            write_varint(record, player.insurance)
+            write_varint(record, player.chips)
+            record.append(len(player.hands))
+            for hand, result in zip(player.hands, results):
+                write_varint(record, hand.bet)
+                record.append(RESULT_CODES[result] | (SURRENDERED if hand.surrendered else 0))
+                write_cards(record, hand.get_cards())
+        prefix = bytearray()
+        write_varint(prefix, len(record))
+        self.file.write(prefix)
+        self.file.write(record)
+        self.rounds_written += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RoundRecord():
+    '''
+    Class that represents a round read from a history: the hand of the dealer, the
+    'SeatRecord' of every player and the rules of the table.
+    '''
+    def __init__(self, dealer_hand, seats, rules=DEFAULT_RULES):
+        self.dealer_hand = dealer_hand
+        self.seats = seats
+        self.rules = rules
+
+class SeatRecord():
+    '''
+    Class that represents a player in a round read from a history: the chips before and after
+    the round, the initial bet, the insurance bet, the hands played (with their bets) and the
+    recorded results.
+    '''
+    def __init__(self, seat, chips_before, initial_bet, chips_after, hands, results, insurance=0):
+        self.seat = seat
+        self.chips_before = chips_before
+        self.initial_bet = initial_bet
+        self.chips_after = chips_after
+        self.hands = hands
+        self.results = results
+        self.insurance = insurance
+
+    def decisions(self):
+        '''
+        Returns the number of splits, double downs, hits, surrenders and insurances of the
+        player in the round.
+        '''
+        doubles = sum(1 for hand in self.hands if hand.bet > self.initial_bet)
+        # every hand has two cards after the deal and after the split, plus the double down
+        hits = sum(len(hand.get_cards()) - 2 for hand in self.hands) - doubles
+        surrenders = sum(1 for hand in self.hands if hand.surrendered)
+        return {'split': len(self.hands) - 1, 'double': doubles, 'hit': hits,
+            'surrender': surrenders, 'insurance': 1 if self.insurance else 0}
+
+
+# Global functions
+
+def read_history(path, buffer_size=BUFFER_SIZE):
+    '''
+    Generator that reads the rounds of a history file one by one ('RoundRecord' objects).
+    '''
+    with open(path, 'rb', buffering=buffer_size) as historyFile:
+        rules = __read_header__(historyFile)
+        while True:
+            try:
+                length = read_varint(historyFile)
+            except EOFError:
+                raise HistoryError('The last record of the history is truncated.')
+            if length is None:
+                return
+            record = historyFile.read(length)
+            if len(record) < length:
+                raise HistoryError('The last record of the history is truncated.')
+            yield __decode_round__(record, rules)
+
+def replay_history(path, buffer_size=BUFFER_SIZE):
+    '''
+    Generator that replays the hands of a history file: for every hand it yields the round,
+    the seat record, the hand, the recorded result and the result given by
+    'Player.compare_hands'.
+    '''
+    for roundRecord in read_history(path, buffer_size):
+        for seatRecord in roundRecord.seats:
+            for hand, result in zip(seatRecord.hands, seatRecord.results):
+                yield (roundRecord, seatRecord, hand, result,
+                    REFEREE.compare_hands(roundRecord.dealer_hand, hand))
+
+def hand_payout(result, bet, rules=DEFAULT_RULES):
+    '''
+    Chips given back to the player for a hand with the given result (see 'Rules.payout').
+    '''
+    return rules.payout(result, bet)
+
+def audit_history(path):
+    '''
+    Replays a history file and checks that the recorded results and the chips of the players
+    are right. Returns a dictionary with the totals and the number of errors found.
+    '''
+    totals = {'rounds': 0, 'hands': 0, 'wagered': 0, 'net': 0, 'result_errors': 0,
+        'chip_errors': 0, 'split': 0, 'double': 0, 'hit': 0, 'surrender': 0, 'insurance': 0}
+    totals.update({result.name: 0 for result in RESULTS})
+    for roundRecord in read_history(path):
+        totals['rounds'] += 1
+        for seatRecord in roundRecord.seats:
+            rules = roundRecord.rules
+            chips = seatRecord.chips_before - seatRecord.insurance
+            chips += rules.insurance_payout(seatRecord.insurance, roundRecord.dealer_hand)
+            for hand, result in zip(seatRecord.hands, seatRecord.results):
+                replayed = REFEREE.compare_hands(roundRecord.dealer_hand, hand)
+                if replayed is not result:
+                    totals['result_errors'] += 1
+                totals[replayed.name] += 1
+                totals['hands'] += 1
+                totals['wagered'] += hand.bet
+                chips += hand_payout(replayed, hand.bet, rules) - hand.bet
+            if chips != seatRecord.chips_after:
+                totals['chip_errors'] += 1
+            totals['net'] += seatRecord.chips_after - seatRecord.chips_before
+            for decision, count in seatRecord.decisions().items():
+                totals[decision] += count
+    return totals
+
+def __read_header__(historyFile):
+    '''
+    Checks the header of the history and returns the rules it was recorded with.
+    '''
+    if historyFile.read(len(HEADER)) != HEADER:
+        raise HistoryError('The file is not a hand history (or it has another version).')
+    length = historyFile.read(1)
+    key = historyFile.read(length[0]) if length else b''
+    if not length or len(key) < length[0]:
+        raise HistoryError('The header of the history is truncated.')
+    try:
+        return Rules.from_key(key.decode('ascii'))
+    except ValueError:
+        raise HistoryError('Unknown rules in the history: {0!r}'.format(key))
+
+def __decode_round__(record, rules=DEFAULT_RULES):
+    try:
+        dealerHand = DealerHand()
+        offset = decode_cards(record, 0, dealerHand)
+        numSeats = record[offset]
+        offset += 1
+        seats = []
+        for _ in range(0, numSeats):
+            seat = record[offset]
+            chipsBefore, offset = decode_varint(record, offset + 1)
+            initialBet, offset = decode_varint(record, offset)
+            insurance, offset = decode_varint(record, offset)
+            chipsAfter, offset = decode_varint(record, offset)
+            numHands = record[offset]
+            offset += 1
+            hands = []
+            results = []
+            for index in range(0, numHands):
+                hand = PlayerHand('Hand' if index == 0 else 'Split Hand {0}'.format(index))
+                hand.bet, offset = decode_varint(record, offset)
+                results.append(RESULTS[record[offset] & ~SURRENDERED])
+                hand.surrendered = bool(record[offset] & SURRENDERED)
+                offset = decode_cards(record, offset + 1, hand)
+                hands.append(hand)
+            seats.append(SeatRecord(seat, chipsBefore, initialBet, chipsAfter, hands, results,
+                insurance))
+    except IndexError:
+        raise HistoryError('A record of the history is corrupted.')
+    return RoundRecord(dealerHand, seats, rules)
+
+def main(args):
+    if len(args) < 2 or args[0] not in ('record', 'replay'):
+        print('Usage: python blackjackHistory.py record FILE [rounds] [strategy] [rules]')
+        print('       python blackjackHistory.py replay FILE')
+        return
+    path = args[1]
+    if args[0] == 'record':
+        # imported here as the simulator loads (or computes) the strategy tables
+        from blackjackSimulator import Simulator, STRATEGIES
+        rounds = int(args[2]) if len(args) > 2 else 100000
+        strategy = STRATEGIES[args[3]]() if len(args) > 3 and args[3] != 'table' else None
+        rules = Rules.from_key(args[4]) if len(args) > 4 else None
+        simulator = Simulator(strategy, rules=rules)
+        with HistoryWriter(path, simulator.table.rules) as writer:
+            simulator.table.add_recorder(writer)
+            simulator.run(rounds)
+        print('{0} rounds recorded in {1} ({2:,} bytes).'.format(writer.rounds_written, path,
+            os.path.getsize(path)))
+    else:
+        totals = audit_history(path)
+        for name, value in totals.items():
+            print('{0:<16} {1:>14,}'.format(name, value))
+        if totals['rounds'] > 0:
+            print('{0:<16} {1:>14.2f}'.format('bytes/round', os.path.getsize(path) / totals['rounds']))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,157 @@
+'''
+This is a script file that computes the exact probabilities of the final hand of the dealer
+of the BlackJack game in 'blackjack.py', given the upcard of the dealer and the cards that
+remain in the shoe. The dealer stands on all 17s or hits soft 17 (see 'Rules').
+All rights reserved.
+'''
+
+# Imports
+
+from functools import lru_cache
+from sys import argv
+
+from blackjack import HARD_VALUES, BLACKJACK, CARD_CODES, RANKS, Shoe, SixPackDeck, Card
+
+
+# Global variables
+
+# Possible results of the dealer hand. The probabilities are always returned in this order.
+DEALER_OUTCOMES = (17, 18, 19, 20, 21, 'bust', 'natural')
+BUST = DEALER_OUTCOMES.index('bust')
+NATURAL = DEALER_OUTCOMES.index('natural')
+
+# The dealer draws cards until the value of the hand is at least this one (see 'Dealer.play'),
+# or until it's a hard 17 if the dealer hits soft 17
+DEALER_STANDS = 17
+
+# A composition is a tuple with the number of cards of each value that remain in the shoe.
+# Position 0 holds the Aces, position 1 the 2s... and position 9 all the cards worth 10 points.
+COMPOSITION_SIZE = 10
+
+# Maximum number of (composition, dealer hand) states kept in memory. The least recently used
+# states are discarded when the limit is reached.
+CACHE_SIZE = 2 ** 18
+
+
+# Global functions
+
+def card_index(rank):
+    '''
+    Returns the position of the cards of the given rank in the compositions.
+    '''
+    return HARD_VALUES[rank] - 1
+
+def full_composition(num_decks=1):
+    '''
+    Returns the composition of a shoe with 'num_decks' full decks.
+    '''
+    composition = [0] * COMPOSITION_SIZE
+    for rank in RANKS:
+        composition[card_index(rank)] += 4 * num_decks
+    return tuple(composition)
+
+def deck_composition(deck):
+    '''
+    Returns the composition of the cards that remain in a deck or shoe from 'blackjack.py'.
+    '''
+    composition = [0] * COMPOSITION_SIZE
+    if isinstance(deck, Shoe):
+        for code in deck.codes[deck.cursor:]:
+            composition[card_index(CARD_CODES[code][1])] += 1
+    else:
+        for card in deck.cards:
+            composition[card_index(card.rank)] += 1
+    return tuple(composition)
+
+def remove_cards(composition, *cards):
+    '''
+    Returns the composition without the given cards. The cards can be 'Card' objects or ranks.
+    '''
+    composition = list(composition)
+    for card in cards:
+        rank = card.rank if isinstance(card, Card) else card
+        index = card_index(rank)
+        if composition[index] <= 0:
+            raise ValueError('There are no {0} cards left in the composition.'.format(rank))
+        composition[index] -= 1
+    return tuple(composition)
+
+def dealer_probabilities(upcard, composition, hit_soft_17=False):
+    '''
+    Returns the probabilities of each of the 'DEALER_OUTCOMES' for the dealer hand, given its
+    upcard and the composition of the shoe (without the upcard). The dealer hole card is drawn
+    from the composition, so a natural is possible. The dealer stands on all 17s unless
+    'hit_soft_17' is True.
+    '''
+    rank = upcard.rank if isinstance(upcard, Card) else upcard
+    index = card_index(rank)
+    return __dealer_outcomes__(tuple(composition), index + 1, index == 0, True, hit_soft_17)
+
+def dealer_probabilities_dict(upcard, composition, hit_soft_17=False):
+    '''
+    Same as 'dealer_probabilities' but the result is a dictionary indexed by the outcome.
+    '''
+    return dict(zip(DEALER_OUTCOMES, dealer_probabilities(upcard, composition, hit_soft_17)))
+
+def cache_info():
+    return __dealer_outcomes__.cache_info()
+
+def clear_cache():
+    __dealer_outcomes__.cache_clear()
+
+@lru_cache(maxsize=CACHE_SIZE)
+def __dealer_outcomes__(composition, hardTotal, hasAce, holeCard, hitSoft17):
+    '''
+    Probabilities of the dealer outcomes when his/her hand has the given hard total (Aces
+    counted as 1) and the cards of the composition remain. 'holeCard' is True while the dealer
+    has only the upcard, which is the only moment when a natural can be made.
+    '''
+    # the dealer stands if the hand is good enough
+    total = hardTotal + 10 if hasAce and hardTotal + 10 <= BLACKJACK else hardTotal
+    if total > BLACKJACK:
+        return __single_outcome__(BUST)
+    if (total >= DEALER_STANDS and not holeCard
+            and not (hitSoft17 and total == DEALER_STANDS and total != hardTotal)):
+        return __single_outcome__(DEALER_OUTCOMES.index(total))
+
+    remaining = sum(composition)
+    if remaining == 0:
+        raise ValueError('The shoe ran out of cards while the dealer was drawing.')
+    probabilities = [0.0] * len(DEALER_OUTCOMES)
+    for index, count in enumerate(composition):
+        if count == 0:
+            continue
+        cardProbability = count / remaining
+        # a natural is an Ace and a 10 points card as the first two cards
+        if holeCard and hardTotal + index + 1 == 11 and (hasAce or index == 0):
+            probabilities[NATURAL] += cardProbability
+            continue
+        nextComposition = composition[:index] + (count - 1,) + composition[index + 1:]
+        outcomes = __dealer_outcomes__(nextComposition, hardTotal + index + 1,
+            hasAce or index == 0, False, hitSoft17)
+        for outcome, probability in enumerate(outcomes):
+            probabilities[outcome] += cardProbability * probability
+    return tuple(probabilities)
+
+def __single_outcome__(outcome):
+    probabilities = [0.0] * len(DEALER_OUTCOMES)
+    probabilities[outcome] = 1.0
+    return tuple(probabilities)
+
+def main(args):
+    '''
+    Prints the dealer probabilities for every upcard with a full shoe:
+        python blackjackOdds.py [num_decks] [S17 | H17]
+    '''
+    numDecks = int(args[0]) if len(args) > 0 else SixPackDeck.NUM_DECKS
+    hitSoft17 = len(args) > 1 and args[1].upper() == 'H17'
+    shoe = full_composition(numDecks)
+    print('Upcard ' + ''.join('{0:>9}'.format(str(outcome)) for outcome in DEALER_OUTCOMES))
+    for rank in ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'Ace'):
+        probabilities = dealer_probabilities(rank, remove_cards(shoe, rank), hitSoft17)
+        print('{0:>6} '.format(rank) + ''.join('{0:>9.4f}'.format(p) for p in probabilities))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
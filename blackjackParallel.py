@@ -0,0 +1,148 @@
+'''
+This is a script file that runs the simulations of 'blackjackSimulator.py' in parallel, in a
+pool of processes (one per core by default). The simulation is split in shards of rounds and
+every shard is played by its own table and shoe, shuffled with its own random stream (see
+'randomStreams.py'). The workers send back a 'SimulationResult' per shard, which are merged
+in the order of the shards, so the same seed always gives the same result whatever the number
+of workers.
+The simulation stops when the confidence interval (95%) of the house edge is narrower than the
+width requested, or when the maximum number of rounds is reached.
+    python blackjackParallel.py --width 0.002             -> house edge +/- 0.1%
+    python blackjackParallel.py --rounds 100000000 --workers 64 --seed 7
+All rights reserved.
+'''
+
+# Imports
+
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from sys import argv
+
+from blackjack import DEFAULT_RULES, Rules, deck_type_decks
+from blackjackSimulator import Simulator, SimulationResult, STRATEGIES
+from blackjackCounting import SYSTEMS
+from blackjackStrategy import load_tables
+from randomStreams import RandomStream
+
+
+# Global variables
+
+# Rounds played by every shard
+SHARD_ROUNDS = 50000
+# Shards waiting in the queue of the pool for every worker
+SHARDS_PER_WORKER = 2
+# Shards merged before the confidence interval is checked
+MIN_SHARDS = 2
+
+
+# Script classes
+
+class ShardedSimulation():
+    '''
+    Class that runs a simulation split in shards in a pool of processes. The options are the
+    ones of 'Simulator', but the strategy and the counting system are given by name, as they
+    are created again in every worker (the 'table' strategy uses the tables of the rules). The
+    result is updated every time a shard is merged, so 'progress' (a function that receives
+    the result) can show how the simulation goes.
+    '''
+    def __init__(self, strategy='table', deck_type=1, num_players=1, counting=None, seed=None,
+            workers=None, shard_rounds=SHARD_ROUNDS, rules=None):
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown strategy: {0}'.format(strategy))
+        if counting is not None and counting not in SYSTEMS:
+            raise ValueError('Unknown counting system: {0}'.format(counting))
+        self.strategy = strategy
+        self.deck_type = deck_type
+        self.num_players = num_players
+        self.counting = counting
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        if self.rules.num_decks is None:
+            self.rules = self.rules.replace(num_decks=deck_type_decks(deck_type))
+        self.rng = RandomStream(seed)
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.shard_rounds = shard_rounds
+        self.shards = 0
+
+    def run(self, max_rounds, width=None, progress=None):
+        '''
+        Plays shards until 'max_rounds' rounds are played or the confidence interval of the
+        house edge is narrower than 'width' (if given). Returns the merged 'SimulationResult'.
+        '''
+        if self.strategy == 'table':
+            # computed once here instead of in every worker at the same time
+            load_tables(self.rules)
+        result = SimulationResult()
+        numShards = -(-max_rounds // self.shard_rounds)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            nextShard = 0
+            while nextShard < numShards or pending:
+                # keep every worker busy
+                while nextShard < numShards and len(pending) < self.workers * SHARDS_PER_WORKER:
+                    rounds = min(self.shard_rounds, max_rounds - nextShard * self.shard_rounds)
+                    pending.append(pool.submit(run_shard, self.__shard_options__(), rounds,
+                        self.rng.split()))
+                    nextShard += 1
+                # shards are merged in order so that the result doesn't depend on the timing
+                result.merge(pending.popleft().result())
+                self.shards += 1
+                if progress is not None:
+                    progress(result)
+                if (width is not None and self.shards >= MIN_SHARDS
+                        and 2 * result.house_edge_error() <= width):
+                    for future in pending:
+                        future.cancel()
+                    break
+        return result
+
+    def __shard_options__(self):
+        return (self.strategy, self.deck_type, self.num_players, self.counting, self.rules)
+
+
+# Global functions
+
+def run_shard(options, rounds, rng):
+    '''
+    Plays a shard of a simulation in a worker process and returns its 'SimulationResult'.
+    '''
+    strategy, deck_type, num_players, counting, rules = options
+    simulator = Simulator(STRATEGIES[strategy]() if strategy != 'table' else None, deck_type,
+        num_players, counting=counting, rng=rng, rules=rules)
+    return simulator.run(rounds)
+
+def show_progress(result):
+    print('{0:>12,} rounds  house edge {1:+.4%} (+/- {2:.4%})'.format(result.rounds,
+        result.house_edge(), result.house_edge_error()), flush=True)
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Parallel simulation of BlackJack strategies.')
+    parser.add_argument('--strategy', default='table', choices=sorted(STRATEGIES))
+    parser.add_argument('--counting', default=None, choices=sorted(SYSTEMS))
+    parser.add_argument('--deck-type', type=int, choices=(0, 1, 2), default=1,
+        help='Standard(0), SixPack(1) or Continuous SixPack(2)')
+    parser.add_argument('--players', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=10 ** 8, help='maximum rounds')
+    parser.add_argument('--width', type=float, default=None,
+        help='stop when the 95%% confidence interval of the house edge is this narrow')
+    parser.add_argument('--workers', type=int, default=None, help='processes (all cores by default)')
+    parser.add_argument('--shard', type=int, default=SHARD_ROUNDS, help='rounds per shard')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--rules', type=Rules.from_key, default=None,
+        help='rules of the game, like H17-NODAS-BJ6:5 (see Rules.from_key)')
+    parser.add_argument('--quiet', action='store_true', help='don\'t show the progress')
+    options = parser.parse_args(args)
+
+    simulation = ShardedSimulation(options.strategy, options.deck_type, options.players,
+        options.counting, options.seed, options.workers, options.shard, options.rules)
+    result = simulation.run(options.rounds, options.width, None if options.quiet else show_progress)
+    print(result)
+    print('Outcomes per round (units bet):')
+    for outcome, count in sorted(result.outcomes.items()):
+        print('{0:>+8g} {1:>10.4%}'.format(outcome, count / result.rounds))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,534 @@
+'''
+This is a script file with a server that runs many tables of the BlackJack game in 'blackjack.py'
+at the same time, all of them in a single asyncio event loop. The players connect over TCP or a
+Unix socket and send their bets and decisions as messages. Every question has a timeout: when
+it expires the safe choice is taken for the player (no bet for the round, no split, no double
+down and stay).
+    python blackjackServer.py                          -> listen on TCP port 7021
+    python blackjackServer.py --port 8000 --timeout 10
+    python blackjackServer.py --unix /tmp/blackjack.sock
+    python blackjackServer.py --checkpoints DIR         -> resume the tables after a restart
+The protocol is line based. Every message of the server is a JSON object in a single line with
+a 'type' ('welcome', 'ask', 'deal', 'card', 'result', 'timeout', 'error' or 'bye'). The first
+line sent by the client can be a JSON object with its 'name', the 'chips' to buy and the
+'table' to sit at (all optional). The answers to the 'ask' messages can be JSON objects
+({"bet": 10}, {"answer": true}) or plain text ('10', 'y', 'n', 'hit', 'stay'...), so the game
+can be played with netcat.
+With a directory of checkpoints every table is saved there after each round (see
+'blackjackSnapshot.py') and restored when it's created again, and the players that come back
+with the same name (sent in their first line) get their chips back.
+All rights reserved.
+'''
+
+# Imports
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from sys import argv
+from urllib.parse import quote
+
+import blackjack
+from blackjack import Table, Player, Strategy, PlayerError, HandResult, Settlement
+from blackjackSnapshot import save_snapshot, load_snapshot, register_strategy
+from randomStreams import RandomStream
+from terminal import NullFrontend
+
+
+# Global variables
+
+# Errors of the tables, which are played by background tasks
+LOGGER = logging.getLogger('blackjackServer')
+
+DEFAULT_PORT = 7021
+# Seconds that a player has to answer each question
+DECISION_TIMEOUT = 30
+# Seconds that a client has to send the first line after connecting
+HELLO_TIMEOUT = 10
+MAX_SEATS = 7
+# Consecutive rounds without betting after which a player is removed from the table
+MAX_ROUNDS_OUT = 3
+MIN_BET = 10
+MAX_BET = 500
+DEFAULT_CHIPS = 1000
+
+YES_ANSWERS = {'y', 'yes', '1', 'true', 'hit', 'split', 'double'}
+NO_ANSWERS = {'n', 'no', '0', 'false', 'stay', 'stand'}
+
+RESULT_NAMES = {
+    HandResult.PLAYER_SURRENDERS: 'surrender',
+    HandResult.DEALER_WINS: 'lose',
+    HandResult.DRAW: 'draw',
+    HandResult.PLAYER_WINS: 'win',
+    HandResult.PLAYER_NATURAL: 'blackjack'
+}
+
+
+# Script classes
+
+class RemoteStrategy(Strategy):
+    '''
+    Strategy of the players connected to the server. The questions are asked by the table over
+    the connection before the player methods are called, so the strategy only places the bet
+    received and never takes a decision by itself.
+    '''
+    def __init__(self):
+        self.next_bet = 0
+
+    def bet(self, player, min_bet, max_bet, bet_check):
+        return self.next_bet
+
+    def split_pair(self, hand, upcard):
+        return False
+
+    def double_down(self, hand, upcard):
+        return False
+
+    def hit(self, hand, upcard):
+        return False
+
+# the players of the tables restored from a checkpoint are remote players again
+register_strategy(RemoteStrategy)
+
+class Seat():
+    '''
+    Class that represents a player connected to the server: the player of the game and the
+    streams of the connection. Only the table where the player is sitting reads from the
+    connection, so the answers can't be mixed up.
+    '''
+    def __init__(self, reader, writer, player):
+        self.reader = reader
+        self.writer = writer
+        self.player = player
+        self.connected = True
+        self.leave_reason = None
+        self.rounds_out = 0
+        self.closed = asyncio.Event()
+
+    async def send(self, message):
+        if not self.connected:
+            return
+        try:
+            self.writer.write((json.dumps(message) + '\n').encode())
+            await self.writer.drain()
+        except OSError:
+            self.connected = False
+
+    async def read_line(self, timeout):
+        '''
+        Returns the next line sent by the client, or None if the timeout expired. The seat is
+        disconnected if the connection is closed or the line is too long.
+        '''
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        except (OSError, ValueError):
+            line = b''
+        if not line:
+            self.connected = False
+            return None
+        return line.decode(errors='replace').strip()
+
+    async def ask(self, message, parse, timeout, default):
+        '''
+        Sends the question and waits for a valid answer, which is converted by 'parse' (it
+        raises ValueError for invalid answers, which are asked again). Returns 'default' if no
+        valid answer arrives before the timeout.
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await self.send(dict(message, type='ask', timeout=timeout))
+        while self.connected:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            line = await self.read_line(remaining)
+            if line is None:
+                break
+            try:
+                return parse(line)
+            except ValueError as error:
+                await self.send({'type': 'error', 'message': str(error)})
+        await self.send({'type': 'timeout', 'decision': message['decision'], 'default': default})
+        return default
+
+    def leave(self, reason):
+        if self.leave_reason is None:
+            self.leave_reason = reason
+
+    async def close(self):
+        await self.send({'type': 'bye', 'reason': self.leave_reason, 'chips': self.player.chips})
+        self.connected = False
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+        self.closed.set()
+
+class ServerTable():
+    '''
+    Wraps a 'Table' of the game so that it can be played by remote players without blocking
+    the event loop. The deck, the dealer and the bet limits are the ones of the table, and the
+    round is played with the same steps as 'Table.play_round', but the decisions are awaited
+    from the connections. The players that sit down during a round join the next one.
+    With a 'checkpoint' file the table is saved there after every round, and it's restored
+    from it if it exists (the options of the snapshot are used then).
+    '''
+    def __init__(self, name, min_bet=MIN_BET, max_bet=MAX_BET, deck_type=1,
+            timeout=DECISION_TIMEOUT, max_seats=MAX_SEATS, rng=None, checkpoint=None):
+        self.name = name
+        self.checkpoint = checkpoint
+        # chips of the players of the snapshot, by name, until they come back
+        self.returning = {}
+        if checkpoint is not None and os.path.isfile(checkpoint):
+            self.table = load_snapshot(checkpoint)
+            self.returning = {player.name: player.chips for player in self.table.players}
+            self.table.players = []
+        else:
+            self.table = Table(min_bet, max_bet, deck_type, [], rng)
+        self.timeout = timeout
+        self.max_seats = max_seats
+        self.seats = []
+        self.waiting = []
+        self.rounds = 0
+        self.has_players = asyncio.Event()
+
+    def is_full(self):
+        return len(self.seats) + len(self.waiting) >= self.max_seats
+
+    def sit(self, seat):
+        self.waiting.append(seat)
+        self.has_players.set()
+
+    def resume_player(self, player):
+        '''
+        Gives back the chips that the player had when the table was saved (the players are
+        recognized by their name, so only the players that sent one can be resumed).
+        '''
+        chips = self.returning.pop(player.name, None)
+        if chips is not None:
+            player.chips = chips
+
+    async def run(self):
+        '''
+        Plays rounds forever while there are players sitting at the table.
+        '''
+        while True:
+            await self.has_players.wait()
+            self.seats += self.waiting
+            self.waiting = []
+            self.table.players = [seat.player for seat in self.seats]
+            await self.play_round()
+            self.rounds += 1
+            if self.checkpoint is not None:
+                # not synced to the disk: the file is only replaced when it's complete, which
+                # is enough to survive a restart of the process without blocking the loop
+                save_snapshot(self.table, self.checkpoint, sync=False)
+            for seat in list(self.seats):
+                if not seat.connected:
+                    seat.leave('disconnected')
+                elif seat.player.chips < self.table.min_bet:
+                    seat.leave('not enough chips')
+                if seat.leave_reason is not None:
+                    self.seats.remove(seat)
+                    await seat.close()
+            if not self.seats and not self.waiting:
+                self.has_players.clear()
+
+    async def close(self, reason):
+        '''
+        Sends away all the players sitting at the table or waiting for the next round.
+        '''
+        seats = self.seats + self.waiting
+        self.seats = []
+        self.waiting = []
+        self.has_players.clear()
+        for seat in seats:
+            seat.leave(reason)
+            await seat.close()
+
+    async def play_round(self):
+        table = self.table
+        # reshuffle the deck if needed
+        if table.deck.needs_shuffle():
+            table.deck.shuffle_deck()
+        # the bets of all the players are asked at the same time
+        bets = await asyncio.gather(*(self.__ask_bet__(seat) for seat in self.seats))
+        playing = []
+        for seat, bet in zip(self.seats, bets):
+            if bet is None:
+                seat.rounds_out += 1
+                if seat.rounds_out >= MAX_ROUNDS_OUT:
+                    seat.leave('no bets')
+                continue
+            seat.rounds_out = 0
+            seat.player.strategy.next_bet = bet
+            try:
+                seat.player.new_hand(table.deck, table.min_bet, table.max_bet, table.rules)
+            except PlayerError:
+                seat.leave('invalid bet')
+                continue
+            playing.append(seat)
+        if not playing:
+            return
+
+        table.dealer.new_hand(table.deck)
+        upcard = table.dealer.get_upcard()
+        for seat in playing:
+            await seat.send({'type': 'deal', 'hand': hand_message(seat.player.hand),
+                'upcard': str(upcard)})
+        for seat in playing:
+            await self.__play_seat__(seat, upcard)
+        table.dealer.play(table.deck)
+
+        dealerHand = table.dealer.hand
+        dealerMessage = {'cards': [str(card) for card in dealerHand.get_cards()],
+            'total': dealerHand.value()}
+        # all the hands are settled at once, like in 'Table.play_round'
+        settlement = Settlement(dealerHand, [seat.player for seat in playing], table.rules)
+        settlement.pay()
+        index = 0
+        for seat, payout in zip(playing, settlement.player_payouts):
+            player = seat.player
+            hands = []
+            for hand in player.hands:
+                handMessage = hand_message(hand)
+                handMessage['result'] = RESULT_NAMES[settlement.results[index]]
+                handMessage['payout'] = settlement.payouts[index]
+                hands.append(handMessage)
+                index += 1
+            await seat.send({'type': 'result', 'dealer': dealerMessage, 'hands': hands,
+                'payout': payout, 'chips': player.chips})
+
+    async def __ask_bet__(self, seat):
+        player = seat.player
+        minBet = self.table.min_bet
+        maxBet = min(self.table.max_bet, player.chips)
+        if maxBet < minBet:
+            return None
+
+        def parse_bet(line):
+            amount = parse_int(json_field(line, 'bet'))
+            if amount < minBet or amount > maxBet:
+                raise ValueError('The bet must be between {0} and {1}.'.format(minBet, maxBet))
+            return amount
+
+        return await seat.ask({'decision': 'bet', 'min': minBet, 'max': maxBet,
+            'chips': player.chips}, parse_bet, self.timeout, None)
+
+    async def __ask_decision__(self, seat, decision, hand, upcard):
+        return await seat.ask({'decision': decision, 'hand': hand_message(hand),
+            'upcard': str(upcard), 'chips': seat.player.chips}, parse_yes_no, self.timeout, False)
+
+    async def __play_seat__(self, seat, upcard):
+        '''
+        Plays the hand(s) of a player in the same order as 'Player.play'.
+        '''
+        player = seat.player
+        deck = self.table.deck
+        if player.hand.is_natural():
+            return
+        # split pairs (the same hand is checked again after a split, as it may be a pair again)
+        index = 0
+        while index < len(player.hands):
+            hand = player.hands[index]
+            if (player.can_split(hand) and player.chips >= hand.bet
+                    and await self.__ask_decision__(seat, 'split', hand, upcard)):
+                player.split(hand, deck)
+            else:
+                index += 1
+        # double down
+        for hand in player.hands:
+            if (player.can_double(hand) and player.chips >= hand.bet
+                    and await self.__ask_decision__(seat, 'double', hand, upcard)):
+                card = player.double(hand, deck)
+                await seat.send({'type': 'card', 'hand': hand.name, 'card': str(card)})
+        # hit or stay
+        for hand in player.hands:
+            while hand.playable and await self.__ask_decision__(seat, 'hit', hand, upcard):
+                card = player.hit(hand, deck)
+                await seat.send({'type': 'card', 'hand': hand.name, 'card': str(card)})
+
+class BlackjackServer():
+    '''
+    Server that accepts the connections of the players and sits each of them at a table. The
+    tables are created when they are needed and every one of them is played by its own task.
+    Every table shuffles with its own stream, split from the stream of the server in the order
+    in which the tables are created.
+    With a directory of 'checkpoints' every table is saved in it (see 'ServerTable').
+    '''
+    def __init__(self, min_bet=MIN_BET, max_bet=MAX_BET, deck_type=1, timeout=DECISION_TIMEOUT,
+            chips=DEFAULT_CHIPS, max_seats=MAX_SEATS, seed=None, checkpoints=None):
+        self.rng = RandomStream(seed)
+        self.checkpoints = checkpoints
+        self.min_bet = min_bet
+        self.max_bet = max_bet
+        self.deck_type = deck_type
+        self.timeout = timeout
+        self.chips = chips
+        self.max_seats = max_seats
+        self.tables = {}
+        self.tasks = {}
+        self.players_joined = 0
+
+    def get_table(self, name=None):
+        '''
+        Returns the table with the given name (which is created if it doesn't exist) or, if
+        there isn't a name, the first table with a free seat. Returns None if the table is full.
+        '''
+        if name is None:
+            for table in self.tables.values():
+                if not table.is_full():
+                    return table
+            name = 'Table {0}'.format(len(self.tables) + 1)
+            while name in self.tables:
+                name += "'"
+        table = self.tables.get(name)
+        if table is None:
+            checkpoint = None
+            if self.checkpoints is not None:
+                checkpoint = os.path.join(self.checkpoints, quote(name, safe='') + '.snap')
+            table = ServerTable(name, self.min_bet, self.max_bet, self.deck_type, self.timeout,
+                self.max_seats, self.rng.split(), checkpoint)
+            self.tables[name] = table
+            self.tasks[name] = asyncio.create_task(self.__run_table__(table))
+        return None if table.is_full() else table
+
+    async def __run_table__(self, table):
+        # if the table fails, the error is logged and its players are sent away (they would
+        # wait for it forever otherwise). The table is removed, so the next players that ask
+        # for it get a new one (restored from its last checkpoint).
+        try:
+            await table.run()
+        except Exception:
+            LOGGER.exception('The table %r stopped because of an error.', table.name)
+            if self.tables.get(table.name) is table:
+                del self.tables[table.name]
+                del self.tasks[table.name]
+            await table.close('table error')
+
+    async def handle_connection(self, reader, writer):
+        self.players_joined += 1
+        player = Player(self.players_joined, self.chips, RemoteStrategy())
+        seat = Seat(reader, writer, player)
+        line = await seat.read_line(HELLO_TIMEOUT)
+        try:
+            hello = json.loads(line) if line else {}
+            if not isinstance(hello, dict):
+                raise ValueError('The first message must be a JSON object.')
+            if 'chips' in hello:
+                player.chips = parse_int(hello['chips'])
+                if player.chips <= 0:
+                    raise ValueError('The chips must be a positive number.')
+            if 'name' in hello:
+                player.name = str(hello['name'])
+            tableName = hello.get('table')
+            table = self.get_table(None if tableName is None else str(tableName))
+        except ValueError as error:
+            await seat.send({'type': 'error', 'message': str(error)})
+            seat.leave('invalid hello')
+            table = None
+        if table is None:
+            seat.leave('table full')
+            await seat.close()
+            return
+        # the default names start again from 'Player 1' after a restart, so they are not
+        # enough to recognize a player that comes back
+        if 'name' in hello:
+            table.resume_player(player)
+        await seat.send({'type': 'welcome', 'table': table.name, 'name': player.name,
+            'chips': player.chips, 'min_bet': table.table.min_bet,
+            'max_bet': table.table.max_bet, 'timeout': table.timeout})
+        table.sit(seat)
+        # the connection is kept open until the table releases the seat
+        await seat.closed.wait()
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+# Global functions
+
+def hand_message(hand):
+    return {'name': hand.name, 'cards': [str(card) for card in hand.get_cards()],
+        'total': hand.value(), 'bet': hand.bet}
+
+def json_field(line, field):
+    '''
+    Returns the field of the answer if it's a JSON object, or the whole line otherwise.
+    '''
+    if line.startswith('{'):
+        try:
+            answer = json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError('The answer is not valid JSON.')
+        if not isinstance(answer, dict) or field not in answer:
+            raise ValueError('The answer must contain "{0}".'.format(field))
+        return answer[field]
+    return line
+
+def parse_int(value):
+    if isinstance(value, bool):
+        raise ValueError('Expected a number.')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Expected a number.')
+
+def parse_yes_no(line):
+    answer = json_field(line, 'answer')
+    if isinstance(answer, bool):
+        return answer
+    answer = str(answer).strip().lower()
+    if answer in YES_ANSWERS:
+        return True
+    if answer in NO_ANSWERS:
+        return False
+    raise ValueError('Expected yes or no.')
+
+async def serve(options):
+    if options.checkpoints is not None:
+        os.makedirs(options.checkpoints, exist_ok=True)
+    server = BlackjackServer(options.min_bet, options.max_bet, options.deck_type,
+        options.timeout, options.chips, seed=options.seed, checkpoints=options.checkpoints)
+    listener = await server.start(options.host, options.port, options.unix)
+    address = options.unix if options.unix else '{0}:{1}'.format(options.host, options.port)
+    print('BlackJack server listening on {0}'.format(address))
+    async with listener:
+        await listener.serve_forever()
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Server for many tables of BlackJack.')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port to listen on')
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--timeout', type=float, default=DECISION_TIMEOUT,
+        help='seconds to answer each question')
+    parser.add_argument('--min-bet', type=int, default=MIN_BET)
+    parser.add_argument('--max-bet', type=int, default=MAX_BET)
+    parser.add_argument('--deck-type', type=int, choices=(0, 1, 2), default=1,
+        help='Standard(0), SixPack(1) or Continuous SixPack(2)')
+    parser.add_argument('--chips', type=int, default=DEFAULT_CHIPS,
+        help='chips of the players that don\'t ask for an amount')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random streams')
+    parser.add_argument('--checkpoints', default=None,
+        help='directory where the tables are saved after every round')
+    options = parser.parse_args(args)
+
+    # the output of the game is sent to the players as messages, not to the terminal
+    blackjack.set_frontend(NullFrontend())
+    try:
+        asyncio.run(serve(options))
+    except KeyboardInterrupt:
+        pass
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
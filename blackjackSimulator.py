@@ -0,0 +1,271 @@
+'''
+This is a script file that runs the BlackJack game of 'blackjack.py' without any human
+interaction, so that the strategies of the players can be evaluated over many rounds.
+All rights reserved.
+'''
+
+# Imports
+
+from math import sqrt
+from sys import argv
+
+import blackjack
+from blackjack import Table, Player, Strategy, CallableStrategy
+from blackjack import AlwaysStandStrategy, BasicStrategy, DealerStrategy, Rules
+from blackjackStrategy import TableStrategy
+from blackjackCounting import SYSTEMS, CountingSystem, CardCounter, CountingStrategy
+from randomStreams import RandomStream
+from terminal import NullFrontend
+
+
+# Global variables
+
+# Names of the strategies that can be simulated from the command line
+STRATEGIES = {
+    'table': TableStrategy,
+    'basic': BasicStrategy,
+    'stand': AlwaysStandStrategy,
+    'dealer': DealerStrategy
+}
+
+# Decisions in which the rounds are classified to compute the expected value of each of them.
+# The decision of a round is the first one taken by the player on his/her starting hand.
+DECISIONS = ('natural', 'stand', 'hit', 'double', 'split')
+
+# Chips given to each player before every round, so that nobody is ever kicked from the table
+BANKROLL = 10 ** 9
+
+# Default bet of the simulations. It must be even so that the 3:2 payment of naturals is exact
+DEFAULT_BET = 10
+
+# Maximum bet (in units of the minimum bet) of the players that count cards
+BET_SPREAD = 12
+
+# Normal quantile of the confidence intervals (95%)
+CONFIDENCE_Z = 1.96
+
+
+# Script classes
+
+class DecisionStats():
+    '''
+    Class that accumulates the results (per unit bet) of the rounds in which a given decision
+    was taken.
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0
+
+    def add(self, result):
+        self.count += 1
+        self.total += result
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+
+    def expected_value(self):
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    def __str__(self):
+        return '{0:<8} {1:>10} rounds  EV: {2:+.4f}'.format(self.name, self.count,
+            self.expected_value())
+
+class SimulationResult():
+    '''
+    Class that holds the results of a simulation. All the values are measured in units of the
+    minimum bet of the table. A positive house edge means that the house wins.
+    The mean and the variance of the results are updated online (Welford's algorithm) and the
+    results are counted in a histogram ('outcomes'), so a result doesn't keep the rounds and
+    the results of simulations run apart (in other processes) can be merged.
+    '''
+    def __init__(self):
+        self.rounds = 0
+        self.wagered = 0
+        self.net = 0
+        # running mean of the results and sum of the squared differences to the mean
+        self.meanResult = 0.0
+        self.squaredDiffs = 0.0
+        self.outcomes = {}
+        self.decisions = {decision: DecisionStats(decision) for decision in DECISIONS}
+
+    def add(self, result, wager, decision):
+        '''
+        Adds the result of a round where 'wager' units were bet at the beginning of the round.
+        '''
+        self.rounds += 1
+        self.wagered += wager
+        self.net += result
+        delta = result - self.meanResult
+        self.meanResult += delta / self.rounds
+        self.squaredDiffs += delta * (result - self.meanResult)
+        self.outcomes[result] = self.outcomes.get(result, 0) + 1
+        self.decisions[decision].add(result / wager)
+
+    def merge(self, other):
+        '''
+        Adds the results of another simulation to this one.
+        '''
+        if other.rounds == 0:
+            return
+        rounds = self.rounds + other.rounds
+        delta = other.meanResult - self.meanResult
+        self.squaredDiffs += other.squaredDiffs + delta * delta * self.rounds * other.rounds / rounds
+        self.meanResult += delta * other.rounds / rounds
+        self.rounds = rounds
+        self.wagered += other.wagered
+        self.net += other.net
+        for result, count in other.outcomes.items():
+            self.outcomes[result] = self.outcomes.get(result, 0) + count
+        for decision, stats in other.decisions.items():
+            self.decisions[decision].merge(stats)
+
+    def mean(self):
+        if self.rounds == 0:
+            return 0.0
+        return self.net / self.rounds
+
+    def house_edge(self):
+        if self.wagered == 0:
+            return 0.0
+        return -self.net / self.wagered
+
+    def variance(self):
+        if self.rounds < 2:
+            return 0.0
+        return self.squaredDiffs / (self.rounds - 1)
+
+    def standard_error(self):
+        if self.rounds == 0:
+            return 0.0
+        return sqrt(self.variance() / self.rounds)
+
+    def house_edge_error(self, z=CONFIDENCE_Z):
+        '''
+        Half width of the confidence interval of the house edge (95% by default).
+        '''
+        if self.wagered == 0:
+            return float('inf')
+        return z * self.standard_error() * self.rounds / self.wagered
+
+    def decision_ev(self):
+        return {name: stats.expected_value() for (name, stats) in self.decisions.items()}
+
+    def __str__(self):
+        resultString = 'Rounds played: {0}\n'.format(self.rounds)
+        resultString += 'House edge: {0:+.4%} (+/- {1:.4%})\n'.format(self.house_edge(),
+            self.house_edge_error())
+        resultString += 'Variance: {0:.4f}\n'.format(self.variance())
+        for decision in DECISIONS:
+            resultString += str(self.decisions[decision]) + '\n'
+        return resultString[:-1]
+
+class Simulator():
+    '''
+    Class that plays rounds of BlackJack in headless mode. It creates a table where all the
+    players follow the strategy passed as parameter, which can be a 'Strategy' object or a
+    function like the ones used by 'CallableStrategy'. By default the players follow the basic
+    strategy tables for the rules of the table (see 'blackjackStrategy.py'), which plays with
+    'rules' (see 'Rules').
+    If a counting system is given (or its name, see 'blackjackCounting.py'), the cards are
+    counted and the players bet according to the true count with 'bet_ramp'.
+    The cards are shuffled with 'rng', a random stream or the seed of a new one (see
+    'randomStreams.py'), so the same seed plays the same rounds.
+    '''
+    def __init__(self, strategy=None, deck_type=1, num_players=1, bet=DEFAULT_BET,
+            max_bet=None, counting=None, bet_ramp=None, rng=None, rules=None):
+        if max_bet is None:
+            max_bet = bet if counting is None else bet * BET_SPREAD
+        self.bet = bet
+        if not isinstance(rng, RandomStream):
+            rng = RandomStream(rng)
+        self.table = Table(bet, max_bet, deck_type, [], rng, rules)
+        if strategy is None:
+            strategy = TableStrategy(rules=self.table.rules)
+        elif not isinstance(strategy, Strategy):
+            strategy = CallableStrategy(strategy, bet)
+        self.counter = None
+        if counting is not None:
+            if not isinstance(counting, CountingSystem):
+                counting = SYSTEMS[counting]
+            self.counter = CardCounter(counting)
+            self.table.deck.add_counter(self.counter)
+            strategy = CountingStrategy(strategy, self.counter, bet_ramp)
+        self.strategy = strategy
+        self.table.players = [Player(index, BANKROLL, strategy) for index in range(0, num_players)]
+
+    def run(self, rounds, result=None):
+        '''
+        Plays the given number of rounds and returns the 'SimulationResult'. If a result is
+        passed as parameter the new rounds are added to it.
+        '''
+        if result is None:
+            result = SimulationResult()
+        previousFrontend = blackjack.set_frontend(NullFrontend())
+        try:
+            for _ in range(0, rounds):
+                self.__play_round__(result)
+        finally:
+            blackjack.set_frontend(previousFrontend)
+        return result
+
+    def __play_round__(self, result):
+        for player in self.table.players:
+            player.chips = BANKROLL
+        self.table.play_round()
+        for player in self.table.players:
+            result.add((player.chips - BANKROLL) / self.bet, player.initial_bet / self.bet,
+                get_decision(player, player.initial_bet))
+
+
+# Global functions
+
+def get_decision(player, initialBet):
+    '''
+    Returns the first decision taken by the player in the last round (see 'DECISIONS').
+    '''
+    if len(player.hands) > 1:
+        return 'split'
+    if player.hand.is_natural():
+        return 'natural'
+    if player.hand.bet > initialBet:
+        return 'double'
+    if len(player.hand.get_cards()) > 2:
+        return 'hit'
+    return 'stand'
+
+def simulate(strategy=None, rounds=100000, deck_type=1, num_players=1, counting=None, seed=None,
+        rules=None):
+    '''
+    Simulates the given number of rounds and returns the 'SimulationResult'.
+    '''
+    return Simulator(strategy, deck_type, num_players, counting=counting, rng=seed,
+        rules=rules).run(rounds)
+
+def main(args):
+    '''
+    Runs a simulation from the command line (see 'Rules.from_key' for the rules):
+        python blackjackSimulator.py [strategy] [rounds] [counting system | none] [seed] [rules]
+    '''
+    strategyName = args[0] if len(args) > 0 else 'table'
+    rounds = int(args[1]) if len(args) > 1 else 100000
+    counting = args[2] if len(args) > 2 and args[2] != 'none' else None
+    seed = int(args[3]) if len(args) > 3 and args[3] != 'none' else None
+    rules = Rules.from_key(args[4]) if len(args) > 4 else None
+    if strategyName not in STRATEGIES:
+        print('Unknown strategy. Choose one of: {0}'.format(', '.join(STRATEGIES)))
+        return
+    if counting is not None and counting not in SYSTEMS:
+        print('Unknown counting system. Choose one of: {0}'.format(', '.join(SYSTEMS)))
+        return
+    # the tables are the ones of the rules of the table
+    strategy = STRATEGIES[strategyName]() if strategyName != 'table' else None
+    print(simulate(strategy, rounds, counting=counting, seed=seed, rules=rules))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,450 @@
+'''
+This is a script file with the snapshots of the tables of the BlackJack game in 'blackjack.py'.
+A snapshot is a compact binary copy of the whole state of a 'Table': the rules and the bet
+limits, the random stream, the order of the cards in the shoe with its cursor (the cards
+before it are the discard pile) and its 'plastic mark', the hand of the dealer and the chips,
+bets and hands of every player. 'restore_table' builds a table from a snapshot that goes on
+exactly as the original one would have (same cards, same shuffles), so a table can be
+checkpointed after every round ('TableCheckpointer') and resumed after a restart.
+    python blackjackSnapshot.py play FILE [rounds]  -> resume the table of FILE (or a new one)
+    python blackjackSnapshot.py show FILE           -> show the table of FILE
+The snapshots are written field by field (no copies of the objects are made) like the rounds of
+'blackjackHistory.py', with the same encoding ('blackjackEncoding.py'): cards take one byte
+(their code) and the numbers are varints. Most of the size is the state of the Mersenne
+Twister of the stream (2.5 KB) and the codes of the shoe.
+The strategies of the players are stored by the name of their class and created again when the
+table is restored (see 'STRATEGIES' and 'register_strategy'). The tables with other strategies
+(like the counting ones, whose counters aren't stored) can't be snapshotted. The counters of
+the deck, the recorders and the scenarios of the table are not part of the snapshot, they have
+to be added to the restored table again.
+The shuffles after the restore are the same as without it if NumPy is installed (or not) both
+when the snapshot is taken and when it's restored.
+Header: magic, version (1 byte), rules key: length (1 byte) + ASCII characters
+Snapshot:
+    table:   min bet, max bet (varints), deck type (1 byte), number of players (varint)
+    streams: stream of the table, shared with the shoe (1 byte), stream of the shoe if it isn't
+        stream: root seed (zigzag varint), path: count + varints, children (varint),
+            Mersenne Twister state (625 x 4 bytes), gaussian: flag (1 byte) + double
+    shoe:    type (1 byte), decks, batch size (varints), lazy (1 byte), penetration (double),
+             cursor, stacked cards, cut card (varints), codes (1 byte each),
+             NumPy batch: flag (1 byte) + generator, state, increment, has_uint32, uinteger,
+             position in the batch
+    dealer:  flag (1 byte) + cards: count (1 byte) + codes (1 byte each)
+    players: count (varint) + for every player:
+        name (length + UTF-8), chips, initial bet, insurance, max hands (varints),
+        strategy (length + ASCII)
+        hands: count (1 byte) + for every hand:
+            name (length + UTF-8), bet (varint), flags (1 byte), cards (count + codes)
+All rights reserved.
+'''
+
+# Imports
+
+import os
+import struct
+import sys
+from array import array
+from sys import argv
+
+import blackjack
+from blackjack import Rules, Table, Player, PlayerHand, DealerHand
+from blackjack import Shoe, StandardShoe, SixPackShoe, ContinuousShoe
+from blackjack import InteractiveStrategy, AlwaysStandStrategy, DealerStrategy, BasicStrategy
+from blackjackEncoding import write_varint, decode_varint, write_cards, decode_cards
+from blackjackEncoding import write_text, decode_text
+from blackjackStrategy import TableStrategy, table_rules
+from randomStreams import RandomStream
+from terminal import NullFrontend
+
+
+# Global variables
+
+MAGIC = b'BJTS'
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION])
+
+# The shoes are stored as their position in this tuple
+SHOES = (StandardShoe, SixPackShoe, ContinuousShoe)
+SHOE_CODES = {shoe: code for code, shoe in enumerate(SHOES)}
+
+# Strategies that can be created again by the name of their class (see 'register_strategy')
+STRATEGIES = {strategy.__name__: strategy for strategy in (InteractiveStrategy,
+    AlwaysStandStrategy, DealerStrategy, BasicStrategy)}
+# Strategies created again with the rules of the table, as their tables depend on them
+RULES_STRATEGIES = {TableStrategy.__name__: lambda rules: TableStrategy(rules=rules)}
+
+# Rules of the snapshots restored, by their key (parsing the key is a third of the restore)
+RESTORED_RULES = {}
+
+# Words of the state of the Mersenne Twister of 'random' (624 + the position)
+MT_STATE_WORDS = 625
+DOUBLE = struct.Struct('<d')
+UINT32 = struct.Struct('<I')
+
+# Flags of the hands of the players
+PLAYABLE = 1
+SURRENDERED = 2
+
+# Options of the tables created by 'play' when there isn't a snapshot yet
+MIN_BET = 10
+MAX_BET = 500
+CHIPS = 1000
+NUM_PLAYERS = 3
+DECK_TYPE = 1
+
+
+# Script classes
+
+class SnapshotError(Exception):
+    pass
+
+class TableCheckpointer():
+    '''
+    Recorder (see 'Table.add_recorder') that saves a snapshot of the table at 'path' every time
+    a round finishes, so the table can be resumed with 'load_snapshot' after a restart. The
+    file is replaced atomically; with 'sync' it's also flushed to the disk before (slower, but
+    it survives the crash of the machine and not only the one of the process).
+    '''
+    def __init__(self, path, sync=True):
+        self.path = path
+        self.sync = sync
+        self.snapshots_written = 0
+
+    def round_started(self, table):
+        pass
+
+    def round_finished(self, table):
+        save_snapshot(table, self.path, self.sync)
+        self.snapshots_written += 1
+
+
+# Global functions
+
+def register_strategy(strategyClass, factory=None):
+    '''
+    Adds a strategy to the ones that can be stored in the snapshots. When the table is restored
+    the strategy is created again by 'factory' (a function without arguments, the class itself
+    by default).
+    '''
+    STRATEGIES[strategyClass.__name__] = factory if factory is not None else strategyClass
+
+def snapshot_table(table):
+    '''
+    Returns the snapshot of the table (bytes). Only the tables with the shoes of 'SHOES' and
+    the strategies that can be created again (see 'register_strategy') can be stored.
+    '''
+    deck = table.deck
+    if type(deck) not in SHOE_CODES:
+        raise SnapshotError('The deck of the table can\'t be stored: {0}'.format(
+            type(deck).__name__))
+    for player in table.players:
+        __check_strategy__(player.strategy, table.rules)
+    key = table.rules.key().encode('ascii')
+    snapshot = bytearray(HEADER)
+    snapshot.append(len(key))
+    snapshot += key
+    write_varint(snapshot, table.min_bet)
+    write_varint(snapshot, table.max_bet)
+    snapshot.append(table.deck_type)
+    write_varint(snapshot, table.num_players)
+    # streams
+    __write_stream__(snapshot, table.rng)
+    snapshot.append(deck.rng is table.rng)
+    if deck.rng is not table.rng:
+        __write_stream__(snapshot, deck.rng)
+    # shoe
+    snapshot.append(SHOE_CODES[type(deck)])
+    write_varint(snapshot, deck.num_decks)
+    write_varint(snapshot, deck.permutations.batch_size)
+    snapshot.append(deck.lazy)
+    snapshot += DOUBLE.pack(deck.penetration if isinstance(deck, SixPackShoe) else 0.0)
+    write_varint(snapshot, deck.cursor)
+    write_varint(snapshot, deck.stacked)
+    write_varint(snapshot, deck.cut_card)
+    snapshot += deck.codes
+    batchState = deck.permutations.get_state()
+    snapshot.append(batchState is not None)
+    if batchState is not None:
+        __write_generator_state__(snapshot, *batchState)
+    # dealer
+    dealerHand = table.dealer.hand
+    snapshot.append(dealerHand is not None)
+    if dealerHand is not None:
+        write_cards(snapshot, dealerHand.get_cards())
+    # players
+    write_varint(snapshot, len(table.players))
+    for player in table.players:
+        write_text(snapshot, player.name)
+        write_varint(snapshot, player.chips)
+        write_varint(snapshot, player.initial_bet)
+        write_varint(snapshot, player.insurance)
+        write_varint(snapshot, player.max_hands)
+        write_text(snapshot, type(player.strategy).__name__)
+        snapshot.append(len(player.hands))
+        for hand in player.hands:
+            write_text(snapshot, hand.name)
+            write_varint(snapshot, hand.bet)
+            snapshot.append((PLAYABLE if hand.playable else 0)
+                | (SURRENDERED if hand.surrendered else 0))
+            write_cards(snapshot, hand.get_cards())
+    return bytes(snapshot)
+
+def restore_table(snapshot, strategies=None):
+    '''
+    Returns a new table with the state of the snapshot. The strategies of the players are
+    created again by the name of their class with the functions of 'STRATEGIES' (or
+    'RULES_STRATEGIES'), or with the ones given in 'strategies' (a dict with functions without
+    arguments that return them). The strategies can also be a function that receives the name
+    and returns the strategy.
+    '''
+    if callable(strategies):
+        factories = strategies
+    else:
+        factories = STRATEGIES if strategies is None else dict(STRATEGIES, **strategies)
+    snapshot = memoryview(snapshot)
+    try:
+        rules, offset = __decode_header__(snapshot)
+        minBet, offset = decode_varint(snapshot, offset)
+        maxBet, offset = decode_varint(snapshot, offset)
+        deckType = snapshot[offset]
+        numPlayers, offset = decode_varint(snapshot, offset + 1)
+        # streams
+        rng, offset = __decode_stream__(snapshot, offset)
+        deckRng = rng
+        offset += 1
+        if not snapshot[offset - 1]:
+            deckRng, offset = __decode_stream__(snapshot, offset)
+        # shoe
+        deck, offset = __decode_shoe__(snapshot, offset, deckRng)
+        # dealer
+        dealerHand = None
+        offset += 1
+        if snapshot[offset - 1]:
+            dealerHand = DealerHand()
+            offset = decode_cards(snapshot, offset, dealerHand)
+        # players
+        numSeats, offset = decode_varint(snapshot, offset)
+        players = []
+        for _ in range(0, numSeats):
+            player, offset = __decode_player__(snapshot, offset, factories, rules)
+            players.append(player)
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise SnapshotError('The snapshot is truncated or corrupted.')
+    if offset != len(snapshot):
+        raise SnapshotError('The snapshot has {0} bytes left over.'.format(len(snapshot) - offset))
+    table = Table(minBet, maxBet, deckType, players, rng, rules, deck)
+    table.num_players = numPlayers
+    table.dealer.hand = dealerHand
+    return table
+
+def save_snapshot(table, path, sync=True):
+    '''
+    Writes the snapshot of the table to a file. The snapshot is written to a temporary file that
+    replaces the old one, so the file always has a whole snapshot even if the process dies
+    while it's written.
+    '''
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'wb') as snapshotFile:
+        snapshotFile.write(snapshot_table(table))
+        if sync:
+            snapshotFile.flush()
+            os.fsync(snapshotFile.fileno())
+    os.replace(temporaryPath, path)
+
+def load_snapshot(path, strategies=None):
+    '''
+    Returns the table restored from the snapshot of the file (see 'restore_table').
+    '''
+    with open(path, 'rb') as snapshotFile:
+        return restore_table(snapshotFile.read(), strategies)
+
+def __check_strategy__(strategy, rules):
+    # the snapshots can't be restored without the strategies, so they fail when they're taken
+    name = type(strategy).__name__
+    if name in RULES_STRATEGIES:
+        if strategy.tables.rules_key != table_rules(rules).key():
+            raise SnapshotError('The strategy tables of a player aren\'t the ones of the rules of '
+                'the table.')
+    elif name not in STRATEGIES:
+        raise SnapshotError('The strategy of a player can\'t be stored: {0} (see '
+            '\'register_strategy\').'.format(name))
+
+def __decode_header__(snapshot):
+    if snapshot[:len(HEADER)] != HEADER:
+        raise SnapshotError('The data is not a table snapshot (or it has another version).')
+    length = snapshot[len(HEADER)]
+    offset = len(HEADER) + 1
+    key = bytes(snapshot[offset:offset + length])
+    if len(key) < length:
+        raise SnapshotError('The header of the snapshot is truncated.')
+    rules = RESTORED_RULES.get(key)
+    if rules is None:
+        try:
+            rules = Rules.from_key(key.decode('ascii'))
+        except ValueError:
+            raise SnapshotError('Unknown rules in the snapshot: {0!r}'.format(key))
+        RESTORED_RULES[key] = rules
+    return rules, offset + length
+
+def __write_stream__(buffer, stream):
+    if not isinstance(stream.root_seed, int):
+        raise SnapshotError('Only the streams with integer seeds can be stored.')
+    seed = stream.root_seed
+    write_varint(buffer, seed << 1 if seed >= 0 else ((-seed) << 1) - 1)
+    write_varint(buffer, len(stream.path))
+    for child in stream.path:
+        write_varint(buffer, child)
+    write_varint(buffer, stream.children)
+    _, words, gaussian = stream.getstate()
+    words = array('I', words)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    buffer += words
+    buffer.append(gaussian is not None)
+    if gaussian is not None:
+        buffer += DOUBLE.pack(gaussian)
+
+def __decode_stream__(snapshot, offset):
+    zigzag, offset = decode_varint(snapshot, offset)
+    seed = zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+    pathLength, offset = decode_varint(snapshot, offset)
+    path = []
+    for _ in range(0, pathLength):
+        child, offset = decode_varint(snapshot, offset)
+        path.append(child)
+    children, offset = decode_varint(snapshot, offset)
+    end = offset + MT_STATE_WORDS * 4
+    if end > len(snapshot):
+        raise IndexError()
+    words = array('I')
+    words.frombytes(snapshot[offset:end])
+    if sys.byteorder == 'big':
+        words.byteswap()
+    gaussian = None
+    offset = end + 1
+    if snapshot[end]:
+        gaussian = DOUBLE.unpack_from(snapshot, offset)[0]
+        offset += DOUBLE.size
+    stream = RandomStream(seed, path)
+    stream.children = children
+    stream.setstate((3, tuple(words), gaussian))
+    return stream, offset
+
+def __decode_shoe__(snapshot, offset, rng):
+    shoeType = SHOES[snapshot[offset]]
+    numDecks, offset = decode_varint(snapshot, offset + 1)
+    batchSize, offset = decode_varint(snapshot, offset)
+    lazy = bool(snapshot[offset])
+    penetration = DOUBLE.unpack_from(snapshot, offset + 1)[0]
+    cursor, offset = decode_varint(snapshot, offset + 1 + DOUBLE.size)
+    stacked, offset = decode_varint(snapshot, offset)
+    cutCard, offset = decode_varint(snapshot, offset)
+    # the shoe is built without shuffling it, its cards are the ones of the snapshot
+    shoe = shoeType.__new__(shoeType)
+    Shoe.__init__(shoe, numDecks, rng, batchSize, lazy)
+    if isinstance(shoe, SixPackShoe):
+        shoe.penetration = penetration
+    end = offset + shoe.total_cards
+    if end > len(snapshot):
+        raise IndexError()
+    shoe.view[:] = snapshot[offset:end]
+    shoe.cursor = cursor
+    shoe.stacked = stacked
+    shoe.cut_card = cutCard
+    offset = end + 1
+    if snapshot[end]:
+        batchState, offset = __decode_generator_state__(snapshot, offset)
+        shoe.permutations.set_state(batchState)
+    return shoe, offset
+
+def __write_generator_state__(buffer, state, index):
+    if state['bit_generator'] != 'PCG64':
+        raise SnapshotError('Unknown NumPy generator: {0}'.format(state['bit_generator']))
+    buffer += state['state']['state'].to_bytes(16, 'little')
+    buffer += state['state']['inc'].to_bytes(16, 'little')
+    buffer.append(state['has_uint32'])
+    buffer += UINT32.pack(state['uinteger'])
+    write_varint(buffer, index)
+
+def __decode_generator_state__(snapshot, offset):
+    end = offset + 37
+    if end > len(snapshot):
+        raise IndexError()
+    state = {'bit_generator': 'PCG64',
+        'state': {'state': int.from_bytes(snapshot[offset:offset + 16], 'little'),
+            'inc': int.from_bytes(snapshot[offset + 16:offset + 32], 'little')},
+        'has_uint32': snapshot[offset + 32],
+        'uinteger': UINT32.unpack_from(snapshot, offset + 33)[0]}
+    index, offset = decode_varint(snapshot, end)
+    return (state, index), offset
+
+def __decode_player__(snapshot, offset, factories, rules):
+    name, offset = decode_text(snapshot, offset)
+    chips, offset = decode_varint(snapshot, offset)
+    initialBet, offset = decode_varint(snapshot, offset)
+    insurance, offset = decode_varint(snapshot, offset)
+    maxHands, offset = decode_varint(snapshot, offset)
+    strategyName, offset = decode_text(snapshot, offset)
+    if callable(factories):
+        strategy = factories(strategyName)
+    elif strategyName in factories:
+        strategy = factories[strategyName]()
+    elif strategyName in RULES_STRATEGIES:
+        strategy = RULES_STRATEGIES[strategyName](rules)
+    else:
+        raise SnapshotError('Unknown strategy in the snapshot: {0}'.format(strategyName))
+    player = Player(0, chips, strategy, maxHands)
+    player.name = name
+    player.initial_bet = initialBet
+    player.insurance = insurance
+    player.rules = rules
+    numHands = snapshot[offset]
+    offset += 1
+    for _ in range(0, numHands):
+        handName, offset = decode_text(snapshot, offset)
+        hand = PlayerHand(handName)
+        hand.bet, offset = decode_varint(snapshot, offset)
+        flags = snapshot[offset]
+        hand.playable = bool(flags & PLAYABLE)
+        hand.surrendered = bool(flags & SURRENDERED)
+        # the hands are built again card by card, which gives them the same totals
+        offset = decode_cards(snapshot, offset + 1, hand)
+        player.hands.append(hand)
+    return player, offset
+
+def show_table(table):
+    print('Rules: {0}, bets {1}-{2}'.format(table.rules.key(), table.min_bet, table.max_bet))
+    print('Shoe: {0}, {1} of {2} cards left, plastic mark in {3}'.format(type(table.deck).__name__,
+        table.deck.cards_remaining(), table.deck.total_cards, table.deck.plastic_mark))
+    for player in table.players:
+        print('{0}: {1} chips'.format(player.name, player.chips))
+
+def main(args):
+    if len(args) < 2 or args[0] not in ('play', 'show'):
+        print('Usage: python blackjackSnapshot.py play FILE [rounds]')
+        print('       python blackjackSnapshot.py show FILE')
+        return
+    blackjack.set_frontend(NullFrontend())
+    path = args[1]
+    if args[0] == 'show':
+        # the players don't play, any strategy will do
+        show_table(load_snapshot(path, lambda name: AlwaysStandStrategy()))
+        return
+    if os.path.isfile(path):
+        table = load_snapshot(path)
+    else:
+        table = Table(MIN_BET, MAX_BET, DECK_TYPE, [Player(index, CHIPS, BasicStrategy())
+            for index in range(0, NUM_PLAYERS)])
+    table.add_recorder(TableCheckpointer(path))
+    rounds = int(args[2]) if len(args) > 2 else 100
+    for _ in range(0, rounds):
+        table.players = [player for player in table.players if player.chips >= table.min_bet]
+        if not table.players:
+            break
+        table.play_round()
+    show_table(table)
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,459 @@
+'''
+This is a script file that computes the basic strategy tables of the BlackJack game in
+'blackjack.py' and stores them in binary files, so that they only need to be computed once.
+The tables are memory-mapped when they are loaded and each decision is a single array index.
+There are tables for every set of rules ('Rules'). The files are named by the hash of the
+rules and they also store the expected value of a round played with the tables, so sweeping
+over variations of the rules only computes the ones that haven't been computed before:
+    python blackjackStrategy.py [num_decks] [rules]         -> tables and expected value
+    python blackjackStrategy.py sweep H17 S17-BJ6:5 NODAS   -> expected value of every rule set
+All rights reserved.
+'''
+
+# Imports
+
+import os
+import struct
+from mmap import mmap, ACCESS_READ
+from sys import argv
+
+from blackjack import BLACKJACK, DEFAULT_RULES, PENETRATION, Rules, SixPackDeck, Strategy
+from blackjackOdds import DEALER_OUTCOMES, BUST, NATURAL, COMPOSITION_SIZE
+from blackjackOdds import card_index, full_composition, remove_cards, dealer_probabilities
+
+
+# Global variables
+
+# Rules that the tables are computed for when no rules are given: the default rules of the
+# six-pack game. The dealer never peeks for naturals, so the doubled and split bets are lost
+# too when the dealer has a natural.
+DEFAULT_TABLE_RULES = DEFAULT_RULES.replace(num_decks=SixPackDeck.NUM_DECKS)
+
+# Tables loaded in this process, by the hash of their rules
+LOADED_TABLES = {}
+
+# Directory where the tables are stored
+TABLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategy_tables')
+
+# Layout of the tables. There is a row for every hard total, every soft total and every pair,
+# and a column for every dealer upcard (in the order of the compositions, Aces first).
+HARD_ROWS = 0
+SOFT_ROWS = HARD_ROWS + BLACKJACK + 1
+PAIR_ROWS = SOFT_ROWS + BLACKJACK + 1
+NUM_ROWS = PAIR_ROWS + COMPOSITION_SIZE
+NUM_COLUMNS = COMPOSITION_SIZE
+NUM_CELLS = NUM_ROWS * NUM_COLUMNS
+
+# Flags stored in the actions table for each cell. A flag is set when the action is better
+# than the alternatives that the player still has at the moment of taking that decision.
+HIT = 1
+DOUBLE = 2
+SPLIT = 4
+SURRENDER = 8
+
+# Expected values stored for each cell, in this order (NaN if the action is not allowed)
+ACTIONS = ('stand', 'hit', 'double', 'split', 'surrender')
+
+# File format: header (with the key of the rules and the expected value of a round), one byte
+# of flags per cell, and then the float32 expected values
+MAGIC = b'BJST'
+VERSION = 2
+RULES_KEY_SIZE = 64
+HEADER = struct.Struct('<4sHHHH{0}sd'.format(RULES_KEY_SIZE))
+
+
+# Script classes
+
+class StrategyTables():
+    '''
+    Class that holds the basic strategy tables for a set of rules. 'actions' has a byte of
+    flags per cell and 'evs' the expected value of each of the 'ACTIONS' per cell. They can be
+    lists or memoryviews of a memory-mapped file. 'expected_value' is the expected value of a
+    round played with the tables (per chip of the initial bet).
+    '''
+    def __init__(self, rules, actions, evs, expected_value):
+        self.rules = rules
+        self.num_decks = rules.num_decks
+        self.actions = actions
+        self.evs = evs
+        self.expected_value = expected_value
+        self.rules_key = rules.key()
+
+    def cell(self, hand, upcard):
+        '''
+        Returns the position in the tables of the given hand against the dealer upcard.
+        When the upcard is unknown a 10 points card is assumed.
+        '''
+        row = (SOFT_ROWS if hand.is_soft() else HARD_ROWS) + hand.value()
+        return row * NUM_COLUMNS + upcard_column(upcard)
+
+    def pair_cell(self, hand, upcard):
+        row = PAIR_ROWS + card_index(hand.get_cards()[0].rank)
+        return row * NUM_COLUMNS + upcard_column(upcard)
+
+    def expected_values(self, cell):
+        '''
+        Returns a dictionary with the expected value of each of the 'ACTIONS' in the cell.
+        '''
+        start = cell * len(ACTIONS)
+        return dict(zip(ACTIONS, self.evs[start:start + len(ACTIONS)]))
+
+    def save(self, path):
+        if len(self.rules_key) > RULES_KEY_SIZE:
+            raise ValueError('The key of the rules is too long: {0}'.format(self.rules_key))
+        # the file is written apart and renamed, so other processes never read half a file
+        temporaryPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temporaryPath, 'wb') as tablesFile:
+            tablesFile.write(HEADER.pack(MAGIC, VERSION, self.num_decks, NUM_ROWS, NUM_COLUMNS,
+                self.rules_key.encode('ascii'), self.expected_value))
+            tablesFile.write(bytes(self.actions))
+            tablesFile.write(b'\0' * (__evs_offset__() - HEADER.size - NUM_CELLS))
+            tablesFile.write(struct.pack('<{0}f'.format(len(self.evs)), *self.evs))
+        os.replace(temporaryPath, path)
+
+class TableStrategy(Strategy):
+    '''
+    Strategy that takes its decisions by looking them up in the basic strategy tables of the
+    rules (the default ones with 'num_decks' decks if they are not given). The tables are
+    loaded from disk (and computed the first time they are needed). Insurance is never taken.
+    '''
+    def __init__(self, num_decks=SixPackDeck.NUM_DECKS, tables=None, rules=None):
+        if tables is None:
+            rules = rules if rules is not None else DEFAULT_RULES
+            if rules.num_decks is None:
+                rules = rules.replace(num_decks=num_decks)
+            tables = load_tables(rules)
+        self.tables = tables
+
+    def split_pair(self, hand, upcard):
+        return self.tables.actions[self.tables.pair_cell(hand, upcard)] & SPLIT != 0
+
+    def double_down(self, hand, upcard):
+        return self.tables.actions[self.tables.cell(hand, upcard)] & DOUBLE != 0
+
+    def hit(self, hand, upcard):
+        return self.tables.actions[self.tables.cell(hand, upcard)] & HIT != 0
+
+    def surrender(self, hand, upcard):
+        if hand.can_split_pair():
+            return self.tables.actions[self.tables.pair_cell(hand, upcard)] & SURRENDER != 0
+        return self.tables.actions[self.tables.cell(hand, upcard)] & SURRENDER != 0
+
+    def get_advice(self, hand, upcard):
+        '''
+        Returns the name of the best action for the hand and the expected value of each action.
+        '''
+        rules = self.tables.rules
+        startingHand = len(hand.get_cards()) == 2
+        pairAdvice = hand.can_split_pair()
+        cell = self.tables.pair_cell(hand, upcard) if pairAdvice else self.tables.cell(hand, upcard)
+        if rules.surrender and startingHand and self.surrender(hand, upcard):
+            action = 'surrender'
+        elif pairAdvice and self.split_pair(hand, upcard):
+            action = 'split'
+        elif hand.can_double_down(rules) and self.double_down(hand, upcard):
+            action = 'double'
+        elif self.hit(hand, upcard):
+            action = 'hit'
+        else:
+            action = 'stand'
+        return action, self.tables.expected_values(cell)
+
+class EVCalculator():
+    '''
+    Class that computes the expected values of the player decisions against a dealer upcard
+    with the given rules. The player hands are represented by their hard total and whether
+    they have an Ace.
+    '''
+    def __init__(self, upcard, composition, rules=DEFAULT_RULES):
+        dealer = dealer_probabilities(upcard, composition, rules.hit_soft_17)
+        self.rules = rules
+        self.payout = float(rules.blackjack_payout)
+        remaining = sum(composition)
+        self.cardProbabilities = [count / remaining for count in composition]
+        self.dealerNatural = dealer[NATURAL]
+        # expected value of standing with each total
+        self.standEVs = []
+        for total in range(0, BLACKJACK + 1):
+            ev = dealer[BUST] - dealer[NATURAL]
+            for outcome in range(0, BUST):
+                ev += dealer[outcome] * ((total > DEALER_OUTCOMES[outcome]) -
+                    (total < DEALER_OUTCOMES[outcome]))
+            self.standEVs.append(ev)
+        self.bestEVs = {}
+
+    def stand_ev(self, hardTotal, hasAce):
+        total = hand_value(hardTotal, hasAce)
+        return self.standEVs[total] if total <= BLACKJACK else -1.0
+
+    def hit_ev(self, hardTotal, hasAce):
+        ev = 0.0
+        for index, probability in enumerate(self.cardProbabilities):
+            ev += probability * self.best_ev(hardTotal + index + 1, hasAce or index == 0)
+        return ev
+
+    def double_ev(self, hardTotal, hasAce):
+        ev = 0.0
+        for index, probability in enumerate(self.cardProbabilities):
+            ev += probability * self.stand_ev(hardTotal + index + 1, hasAce or index == 0)
+        return 2 * ev
+
+    def best_ev(self, hardTotal, hasAce):
+        '''
+        Expected value of a hand that can only hit or stand, playing it in the best way.
+        '''
+        if hand_value(hardTotal, hasAce) > BLACKJACK:
+            return -1.0
+        key = (hardTotal, hasAce)
+        if key not in self.bestEVs:
+            self.bestEVs[key] = max(self.stand_ev(hardTotal, hasAce), self.hit_ev(hardTotal, hasAce))
+        return self.bestEVs[key]
+
+    def two_card_evs(self, hardTotal, hasAce, split=False):
+        values = {
+            'stand': self.stand_ev(hardTotal, hasAce),
+            'hit': self.hit_ev(hardTotal, hasAce)
+        }
+        # same condition as 'Rules.can_double'
+        if self.rules.allows_double(hand_value(hardTotal, hasAce), split):
+            values['double'] = self.double_ev(hardTotal, hasAce)
+        # late surrender: the whole bet is lost if the dealer has a natural
+        if self.rules.surrender and not split:
+            values['surrender'] = -self.dealerNatural - 0.5 * (1 - self.dealerNatural)
+        return values
+
+    def split_ev(self, pairIndex):
+        '''
+        Expected value of splitting a pair (for both hands). Each hand gets a second card and
+        can then double down (if the rules allow it after splitting), hit or stand. A split
+        hand of two cards worth 21 is a natural. Re-splitting is not taken into account, so the
+        value is slightly underestimated.
+        '''
+        ev = 0.0
+        for index, probability in enumerate(self.cardProbabilities):
+            hardTotal = pairIndex + index + 2
+            hasAce = pairIndex == 0 or index == 0
+            if hand_value(hardTotal, hasAce) == BLACKJACK:
+                ev += probability * self.payout * (1 - self.dealerNatural)
+            else:
+                ev += probability * max(self.two_card_evs(hardTotal, hasAce, True).values())
+        return 2 * ev
+
+
+# Global functions
+
+def upcard_column(upcard):
+    return card_index(upcard.rank if upcard is not None else '10')
+
+def table_rules(rules=None):
+    '''
+    Returns the rules that the tables are computed for: the given ones (the default ones if
+    they are None) without the rules that don't change the tables, so that the rule sets that
+    only differ in them share their tables. The tables are computed for the full shoe and
+    insurance is never taken, so the penetration and the insurance are left out.
+    '''
+    rules = rules if rules is not None else DEFAULT_TABLE_RULES
+    if rules.num_decks is None:
+        rules = rules.replace(num_decks=SixPackDeck.NUM_DECKS)
+    return rules.replace(penetration=PENETRATION, insurance=False)
+
+def tables_path(rules):
+    return os.path.join(TABLES_DIR, 'strategy_{0}.bin'.format(rules.digest()[:16]))
+
+def load_tables(rules=None):
+    '''
+    Loads the tables for the rules (see 'table_rules') from disk by memory-mapping the file. If
+    the file doesn't exist (or is not valid) the tables are computed and saved first. The tables
+    loaded are kept by the hash of their rules, so every set of rules is loaded only once.
+    '''
+    rules = table_rules(rules)
+    digest = rules.digest()
+    if digest in LOADED_TABLES:
+        return LOADED_TABLES[digest]
+    path = tables_path(rules)
+    tables = read_tables(path, rules)
+    if tables is None:
+        os.makedirs(TABLES_DIR, exist_ok=True)
+        compute_tables(rules).save(path)
+        tables = read_tables(path, rules)
+    LOADED_TABLES[digest] = tables
+    return tables
+
+def expected_value(rules=None):
+    '''
+    Returns the expected value of a round (per chip of the initial bet) played with the basic
+    strategy tables of the rules. It's computed only once for every set of rules.
+    '''
+    return load_tables(rules).expected_value
+
+def read_tables(path, rules):
+    '''
+    Memory-maps the tables stored in the file. Returns None if the file doesn't exist or it
+    doesn't contain the tables for the given rules.
+    '''
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as tablesFile:
+        if os.fstat(tablesFile.fileno()).st_size != __file_size__():
+            return None
+        # the mapping stays valid after closing the file
+        data = mmap(tablesFile.fileno(), 0, access=ACCESS_READ)
+    header = HEADER.unpack_from(data)
+    expected = (MAGIC, VERSION, rules.num_decks, NUM_ROWS, NUM_COLUMNS,
+        rules.key().encode('ascii').ljust(RULES_KEY_SIZE, b'\0'))
+    if header[:-1] != expected:
+        data.close()
+        return None
+    view = memoryview(data)
+    actions = view[HEADER.size:HEADER.size + NUM_CELLS]
+    evs = view[__evs_offset__():].cast('f')
+    return StrategyTables(rules, actions, evs, header[-1])
+
+def compute_tables(rules=None):
+    '''
+    Computes the basic strategy tables for the rules (see 'table_rules'). The expected values
+    only depend on the dealer upcard and the player hand (total, soft or pair), and the cards
+    are drawn from the full shoe without the dealer upcard.
+    '''
+    rules = table_rules(rules)
+    actions = [0] * NUM_CELLS
+    evs = [float('nan')] * (NUM_CELLS * len(ACTIONS))
+    shoe = full_composition(rules.num_decks)
+    dealerNaturals = []
+    for column in range(0, NUM_COLUMNS):
+        upcard = rank_of_index(column)
+        calculator = EVCalculator(upcard, remove_cards(shoe, upcard), rules)
+        dealerNaturals.append(calculator.dealerNatural)
+        for row in range(HARD_ROWS, PAIR_ROWS):
+            soft = row >= SOFT_ROWS
+            total = row - (SOFT_ROWS if soft else HARD_ROWS)
+            # hard totals start at 4 (2 + 2) and soft totals at 12 (Ace + Ace)
+            if total < (12 if soft else 4):
+                continue
+            hardTotal = total - 10 if soft else total
+            values = calculator.two_card_evs(hardTotal, soft)
+            __set_cell__(actions, evs, row * NUM_COLUMNS + column, values)
+        for pairIndex in range(0, COMPOSITION_SIZE):
+            row = PAIR_ROWS + pairIndex
+            values = calculator.two_card_evs(2 * (pairIndex + 1), pairIndex == 0)
+            if rules.max_split_hands > 1:
+                values['split'] = calculator.split_ev(pairIndex)
+            __set_cell__(actions, evs, row * NUM_COLUMNS + column, values)
+    expectedValue = __expected_value__(evs, shoe, dealerNaturals, float(rules.blackjack_payout))
+    return StrategyTables(rules, actions, evs, expectedValue)
+
+def action_symbol(flags):
+    if flags & SURRENDER:
+        return 'R'
+    if flags & DOUBLE:
+        return 'D'
+    return 'H' if flags & HIT else 'S'
+
+def hand_value(hardTotal, hasAce):
+    if hasAce and hardTotal + 10 <= BLACKJACK:
+        return hardTotal + 10
+    return hardTotal
+
+def rank_of_index(index):
+    return ('Ace', '2', '3', '4', '5', '6', '7', '8', '9', '10')[index]
+
+def __set_cell__(actions, evs, cell, values):
+    flags = 0
+    if values['hit'] > values['stand']:
+        flags |= HIT
+    best = max(values['hit'], values['stand'])
+    if 'double' in values and values['double'] > best:
+        flags |= DOUBLE
+        best = values['double']
+    if 'split' in values and values['split'] > best:
+        flags |= SPLIT
+        best = values['split']
+    if 'surrender' in values and values['surrender'] > best:
+        flags |= SURRENDER
+    actions[cell] = flags
+    for position, action in enumerate(ACTIONS):
+        if action in values:
+            evs[cell * len(ACTIONS) + position] = values[action]
+
+def __expected_value__(evs, shoe, dealerNaturals, payout):
+    '''
+    Expected value of a round played with the tables: the best expected value of every starting
+    hand against every upcard, weighted by the probability of being dealt. A player natural is
+    paid 'payout' unless the dealer has a natural too.
+    '''
+    total = sum(shoe)
+    expectedValue = 0.0
+    for upcard in range(0, COMPOSITION_SIZE):
+        composition = list(remove_cards(shoe, rank_of_index(upcard)))
+        upcardProbability = shoe[upcard] / total
+        for first in range(0, COMPOSITION_SIZE):
+            firstProbability = upcardProbability * composition[first] / (total - 1)
+            if firstProbability == 0:
+                continue
+            composition[first] -= 1
+            for second in range(0, COMPOSITION_SIZE):
+                probability = firstProbability * composition[second] / (total - 2)
+                if probability == 0:
+                    continue
+                hardTotal = first + second + 2
+                hasAce = first == 0 or second == 0
+                value = hand_value(hardTotal, hasAce)
+                if value == BLACKJACK:
+                    expectedValue += probability * payout * (1 - dealerNaturals[upcard])
+                    continue
+                if first == second:
+                    row = PAIR_ROWS + first
+                else:
+                    row = (SOFT_ROWS if value != hardTotal else HARD_ROWS) + value
+                start = (row * NUM_COLUMNS + upcard) * len(ACTIONS)
+                # the actions that are not allowed are NaN, which is never equal to itself
+                expectedValue += probability * max(ev for ev in evs[start:start + len(ACTIONS)]
+                    if ev == ev)
+            composition[first] += 1
+    return expectedValue
+
+def __evs_offset__():
+    # the expected values are aligned to 4 bytes so that they can be cast to floats
+    return (HEADER.size + NUM_CELLS + 3) // 4 * 4
+
+def __file_size__():
+    return __evs_offset__() + NUM_CELLS * len(ACTIONS) * 4
+
+def main(args):
+    '''
+    Computes (if needed) and prints the strategy tables for a number of decks and rules, or the
+    expected value of every set of rules of a sweep (see 'Rules.from_key'):
+        python blackjackStrategy.py [num_decks] [rules]
+        python blackjackStrategy.py sweep RULES...
+    '''
+    if len(args) > 0 and args[0] == 'sweep':
+        for key in args[1:]:
+            rules = table_rules(Rules.from_key(key))
+            print('{0:<50} {1:+.4%}'.format(rules.key(), expected_value(rules)))
+        return
+    numDecks = int(args[0]) if len(args) > 0 else SixPackDeck.NUM_DECKS
+    rules = Rules.from_key(args[1]) if len(args) > 1 else DEFAULT_RULES
+    tables = load_tables(rules.replace(num_decks=numDecks))
+    header = '       ' + ' '.join('{0:>3}'.format(rank_of_index(column)[:3])
+        for column in list(range(1, NUM_COLUMNS)) + [0])
+    for name, first, last in (('Hard', HARD_ROWS + 4, HARD_ROWS + BLACKJACK),
+            ('Soft', SOFT_ROWS + 12, SOFT_ROWS + BLACKJACK), ('Pair', PAIR_ROWS, NUM_ROWS - 1)):
+        print(name + header[len(name):])
+        for row in range(first, last + 1):
+            label = rank_of_index(row - PAIR_ROWS) if name == 'Pair' else row - first + \
+                (4 if name == 'Hard' else 12)
+            cells = []
+            for column in list(range(1, NUM_COLUMNS)) + [0]:
+                flags = tables.actions[row * NUM_COLUMNS + column]
+                if name == 'Pair':
+                    cells.append('P' if flags & SPLIT else '-')
+                else:
+                    cells.append(action_symbol(flags))
+            print('{0:>6} '.format(label) + ' '.join('{0:>3}'.format(cell) for cell in cells))
+    print('Rules: {0}'.format(tables.rules_key))
+    print('Expected value of a round: {0:+.4%}'.format(tables.expected_value))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
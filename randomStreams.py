@@ -0,0 +1,140 @@
+'''
+This is a script file with the random number streams used by the games. A stream is a random
+number generator with a seed that can be split in independent child streams (one for every
+table, deck or worker), so a whole run can be reproduced from a single seed and no two
+streams share their state.
+NumPy is optional: when it's installed the shuffled decks are generated in batches with a
+single call, otherwise they are generated one by one with the standard library. The streams
+are reproducible with the same seed and the same backend.
+All rights reserved.
+'''
+
+# Imports
+
+import hashlib
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Global variables
+
+# Number of permutations generated at once by the batches when NumPy is installed
+BATCH_SIZE = 256
+
+
+# Script classes
+
+class RandomStream(random.Random):
+    '''
+    Random number generator ('random.Random') that can be split in independent streams. The
+    stream is identified by the root seed and its path from the root stream (the position of
+    every child), and its seed is the SHA-256 of both. Splitting a stream doesn't use any of
+    its random numbers, so the numbers of a stream are the same however many times it's split.
+    Without a seed the root seed is taken from the operating system.
+    '''
+    def __init__(self, seed=None, path=()):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(128)
+        self.root_seed = seed
+        self.path = tuple(path)
+        self.children = 0
+        digest = hashlib.sha256(repr((self.root_seed, self.path)).encode()).digest()
+        self.stream_seed = int.from_bytes(digest, 'big')
+        random.Random.__init__(self, self.stream_seed)
+
+    def split(self):
+        '''
+        Returns a new child stream.
+        '''
+        child = RandomStream(self.root_seed, self.path + (self.children,))
+        self.children += 1
+        return child
+
+    def spawn(self, count):
+        '''
+        Returns a list with 'count' new child streams.
+        '''
+        return [self.split() for _ in range(0, count)]
+
+    def numpy_generator(self):
+        '''
+        Returns a NumPy generator seeded with the seed of the stream (None without NumPy).
+        '''
+        if numpy is None:
+            return None
+        return numpy.random.default_rng(self.stream_seed)
+
+    def __reduce__(self):
+        # copies (and streams sent to other processes) go on with the same numbers and children
+        return (RandomStream, (self.root_seed, self.path), (self.getstate(), self.children))
+
+    def __setstate__(self, state):
+        randomState, self.children = state
+        self.setstate(randomState)
+
+    def __str__(self):
+        return 'RandomStream({0!r}, {1})'.format(self.root_seed, self.path)
+
+class PermutationBatch():
+    '''
+    Source of shuffled copies of a sequence of bytes (the card codes of a shoe). With NumPy the
+    copies are generated in batches of 'batch_size', all of them shuffled in a single call with
+    the generator of the stream. Without it every copy is a 'sample' of the sequence (there's
+    nothing to gain by generating them in advance). The permutations are returned as 'bytes',
+    which can be copied into an array without converting every byte.
+    The state of a batch ('get_state') is the state of the generator when the batch was
+    generated and the position in the batch, so a restored batch is generated again (lazily,
+    when the next permutation is needed) instead of being stored.
+    '''
+    def __init__(self, values, stream, batch_size=None):
+        self.values = bytes(values)
+        self.stream = stream
+        self.batch_size = batch_size if batch_size is not None else BATCH_SIZE
+        self.generator = stream.numpy_generator()
+        self.batch = []
+        self.index = 0
+        # state of the generator before the current batch and position to resume a restored one
+        self.batch_state = None
+        self.resume_index = 0
+
+    def next_permutation(self):
+        if self.generator is None:
+            return bytes(self.stream.sample(self.values, len(self.values)))
+        if self.index >= len(self.batch):
+            self.__fill__()
+        permutation = self.batch[self.index]
+        self.index += 1
+        return permutation
+
+    def get_state(self):
+        '''
+        Returns the state needed to go on with the same permutations (None without NumPy, as
+        they only depend on the state of the stream then).
+        '''
+        if self.generator is None:
+            return None
+        if self.index >= len(self.batch):
+            return (self.generator.bit_generator.state, 0)
+        return (self.batch_state, self.index)
+
+    def set_state(self, state):
+        '''
+        Goes on from a state returned by 'get_state'.
+        '''
+        if self.generator is None or state is None:
+            return
+        self.generator.bit_generator.state, self.resume_index = state
+        self.batch = []
+        self.index = 0
+
+    def __fill__(self):
+        self.batch_state = self.generator.bit_generator.state
+        rows = numpy.tile(numpy.frombuffer(self.values, dtype=numpy.uint8), (self.batch_size, 1))
+        rows = self.generator.permuted(rows, axis=1)
+        self.batch = [row.tobytes() for row in rows]
+        self.index = self.resume_index
+        self.resume_index = 0
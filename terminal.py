@@ -0,0 +1,112 @@
+'''
+This is a script file with the frontends used by the terminal games to show text on the
+screen and to read the input of the players. The games don't print or read directly: they
+use a frontend, which can be replaced to play in other ways (or without any human at all).
+All rights reserved.
+'''
+
+# Imports
+
+import sys
+
+
+# Global variables
+
+# ANSI escape codes to move the cursor to the top left corner and clear the screen
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+
+
+# Script classes
+
+class Frontend():
+    '''
+    Abstract class for the frontends of the games. 'write' works like the 'print' function
+    and 'read' like the 'input' function (it raises EOFError when there is no more input).
+    See the classes that inherit from this one for the available frontends.
+    '''
+    def write(self, *args, sep=' ', end='\n'):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def clear(self):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def read(self, prompt=''):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def flush(self):
+        pass
+
+class AnsiFrontend(Frontend):
+    '''
+    Frontend for ANSI terminals. The output is buffered and it's only written to the terminal
+    (in a single write) when the player is asked for input or the frontend is flushed. The
+    screen is cleared with escape codes instead of running the 'clear' command, and clearing
+    drops the buffered output that would be cleared anyway before being seen.
+    '''
+    def __init__(self, output_stream=None, input_stream=None):
+        self.output_stream = output_stream if output_stream is not None else sys.stdout
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.buffer = []
+
+    def write(self, *args, sep=' ', end='\n'):
+        self.buffer.append(sep.join(str(arg) for arg in args) + end)
+
+    def clear(self):
+        self.buffer = [CLEAR_SCREEN]
+
+    def read(self, prompt=''):
+        self.buffer.append(prompt)
+        self.flush()
+        line = self.input_stream.readline()
+        if not line:
+            raise EOFError('No more input available.')
+        return line.rstrip('\n')
+
+    def flush(self):
+        if self.buffer:
+            self.output_stream.write(''.join(self.buffer))
+            self.buffer = []
+        self.output_stream.flush()
+
+class ScriptedFrontend(Frontend):
+    '''
+    Frontend for automation. The answers to the questions of the game are taken from 'inputs'
+    (any iterable of strings) and the output is stored in 'screens', a list with the text
+    written between every two clears of the screen. The answers are also written to the
+    screens, as they would be seen in a terminal.
+    '''
+    def __init__(self, inputs=()):
+        self.inputs = iter(inputs)
+        self.screens = ['']
+
+    def write(self, *args, sep=' ', end='\n'):
+        self.screens[-1] += sep.join(str(arg) for arg in args) + end
+
+    def clear(self):
+        self.screens.append('')
+
+    def read(self, prompt=''):
+        self.screens[-1] += prompt
+        try:
+            answer = str(next(self.inputs))
+        except StopIteration:
+            raise EOFError('The script has no more inputs.')
+        self.screens[-1] += answer + '\n'
+        return answer
+
+    def output(self):
+        return ''.join(self.screens)
+
+class NullFrontend(Frontend):
+    '''
+    Frontend that discards all the output. It's used to run the games without any human
+    interaction, so it can't answer any question.
+    '''
+    def write(self, *args, sep=' ', end='\n'):
+        pass
+
+    def clear(self):
+        pass
+
+    def read(self, prompt=''):
+        raise EOFError('The null frontend has no input.')
@@ -1,123 +1,162 @@
-import os
 import random
+import sys
+
+import ticTacToeBoard
+import ticTacToeTablebase
+from terminal import AnsiFrontend
+
+# 'frontend' shows the game on the screen and reads the input of the players (see 'terminal.py')
+frontend = AnsiFrontend()
+
+# the board is a 'MNKBoard' (see 'ticTacToeBoard.py'): k in a row on a board of any size, the
+# classic game is 3 x 3 with 3 in a row. The positions are the cells + 1, numbered row by row
+# from the bottom left one.
+
+# the boards wider than this are printed as a single grid with the free positions in it
+SCREEN_WIDTH = 80
+
+def set_frontend(newFrontend):
+    global frontend
+    previousFrontend = frontend
+    frontend = newFrontend
+    return previousFrontend
 
 def choose_first():
     return random.randint(0,1)
 
 def choose_side():
-    choice = input("Player 1: Do you want to be 'X' or 'O'? ")
+    choice = frontend.read("Player 1: Do you want to be 'X' or 'O'? ")
     
     while(choice.lower() != 'x' and choice.lower() != 'o'):
-        choice = input("Please, select a valid option ('X' or 'O'): ")
+        choice = frontend.read("Please, select a valid option ('X' or 'O'): ")
 
     if(choice.lower() == 'x'):
         return ('X','O')
     else:
         return ('O','X')
 
-def print_board(board):
+def choose_opponent(board):
+    # the computer plays with the tablebase of the board (see 'ticTacToeTablebase.py') and only
+    # the small boards have one
+    if(board.cells > ticTacToeTablebase.MAX_CELLS):
+        return False
+
+    frontend.write('Do you want to play against the computer? (it will be Player 2)')
+    return yes_or_no()
+
+def new_board(width=3, height=3, k=3):
+    return ticTacToeBoard.MNKBoard(width, height, k)
+
+def cell_symbol(board, players, cell):
+    if(board.masks[0] >> cell & 1):
+        return players[0]
+    elif(board.masks[1] >> cell & 1):
+        return players[1]
+    else:
+        return ' '
+
+def grid_lines(board, cell_text, size):
+    # lines of a grid with the text of every cell, the top row first
+    separator = ' ' + ' '.join(['-' * (size + 2)] * board.width) + ' '
+    lines = [separator]
+    for row in range(board.height - 1, -1, -1):
+        texts = [cell_text(row * board.width + column).rjust(size)
+            for column in range(0, board.width)]
+        lines.append('| ' + ' | '.join(texts) + ' |')
+        lines.append(separator)
+    return lines
+
+def print_board(board, players):
     # clear the screen
-    os.system('clear')
-
-    # print the board
-    print(' --- --- ---            --- --- --- ')
-    print('| {} | {} | {} |          | {} | {} | {} |'.format(7, 8, 9, board[7], board[8], board[9]))
-    print(' --- --- ---            --- --- --- ')
-    print('| {} | {} | {} |    --    | {} | {} | {} |'.format(4, 5, 6, board[4], board[5], board[6]))
-    print(' --- --- ---            --- --- --- ')
-    print('| {} | {} | {} |          | {} | {} | {} |'.format(1, 2, 3, board[1], board[2], board[3]))
-    print(' --- --- ---            --- --- --- ')
+    frontend.clear()
+
+    # print the positions and the board side by side (or only the board with the free
+    # positions if they don't fit)
+    size = len(str(board.cells))
+    symbols = grid_lines(board, lambda cell: cell_symbol(board, players, cell), size)
+    if(2 * len(symbols[0]) + 10 > SCREEN_WIDTH):
+        # the free cells show their position
+        def symbol_or_position(cell):
+            return cell_symbol(board, players, cell).strip() or str(cell + 1)
+
+        for line in grid_lines(board, symbol_or_position, size):
+            frontend.write(line)
+        return
+
+    positions = grid_lines(board, lambda cell: str(cell + 1), size)
+    middle = 2 * (board.height // 2) + 1
+    for index in range(0, len(symbols)):
+        gap = '    --    ' if index == middle else '          '
+        frontend.write(positions[index] + gap + symbols[index])
     
 def player_input(board, turn, players):
     position = -1
-    symbol = ''
 
     if(turn % 2 == 0):           
-        print('Player 1\'s turn.')
-        symbol = players[0]
+        frontend.write('Player 1\'s turn.')
     else:                        
-        print('Player 2\'s turn.')
-        symbol = players[1]
-        
-    while(0 > position or position > 9 or board[position] != ' '):
-        position_str = input('Choose your next move (1-9) or press 0 to exit: ')
+        frontend.write('Player 2\'s turn.')
+
+    while(0 > position or position > board.cells
+            or (position > 0 and not board.is_free(position - 1))):
+        position_str = frontend.read('Choose your next move (1-{}) or press 0 to exit: '.format(
+            board.cells))
         try:
             position = int(position_str)
         except ValueError:
-            print('Please, choose a number from 1 to 9 or press 0 to exit: ')
+            frontend.write('Please, choose a number from 1 to {} or press 0 to exit: '.format(
+                board.cells))
 
-    # add the symbol for current player to the board
-    board[position] = symbol
+    # put the stone of the current player in the board (the win is checked at the same time)
+    if(position == 0):
+        board.resign(turn % 2)
+    else:
+        board.play(position - 1, turn % 2)
     return board
 
-def check_line(players, pos1, pos2, pos3):
-    # at the begining the board list is full of spaces and we don't want to check them
-    if (pos1 != ' ' and pos1 == pos2 and pos2  == pos3):
-        # get the position in players of the 'X' or 'O' that is in the positions
-        # return index + 1 (player[0] is player 1 and player[1] is player 2)
-        return players.index(pos1) + 1
-    else:
-        return 0
+def computer_input(board, turn, players):
+    frontend.write('Player {}\'s turn (computer).'.format(turn % 2 + 1))
 
-def check_game_status(board, players):
-    status = 0
+    tablebase = ticTacToeTablebase.load_tablebase(board.width, board.height, board.k)
+    move = tablebase.best_move(board.masks[turn % 2], board.masks[(turn + 1) % 2])
+    board.play(move, turn % 2)
+    return board
 
-    if(board[0] != ' '):
+def check_game_status(board, players):
+    # the board knows who won when the last stone was placed, so 'players' is not needed anymore
+    if(board.resigned is not None):
         return -1
 
-    possible_lines = []
-    # check rows
-    possible_lines.append(tuple(board[1:4]))
-    possible_lines.append(tuple(board[4:7]))
-    possible_lines.append(tuple(board[7:10]))
-    # check columns
-    possible_lines.append(tuple(board[1:10:3]))
-    possible_lines.append(tuple(board[2:10:3]))
-    possible_lines.append(tuple(board[3:10:3]))
-    # check diagonals
-    possible_lines.append(tuple([board[1], board[5], board[9]]))
-    possible_lines.append(tuple([board[3], board[5], board[7]]))
-    
-    for pos1,pos2,pos3 in possible_lines:
-        status = check_line(players, pos1, pos2, pos3)
-        if (status != 0):
-            break
-
-    return status
+    return board.winner
 
 def play_again():
-    print('Do you want to play again?')
+    frontend.write('Do you want to play again?')
     return yes_or_no()
 
 def check_ready(turn):
-    print('Player {} moves first.'.format(turn + 1))
-    print('Are you ready?')
+    frontend.write('Player {} moves first.'.format(turn + 1))
+    frontend.write('Are you ready?')
     return yes_or_no()
 
 def yes_or_no():
-    response = input('Enter yes or no: ')
+    response = frontend.read('Enter yes or no: ')
     response = response.lower()
     
     while(response != 'yes' and response != 'no' and response != 'y' and response != 'n'):
-        response = input('Please, enter yes(\'y\') or no(\'n\'): ')
+        response = frontend.read('Please, enter yes(\'y\') or no(\'n\'): ')
         response = response.lower()
         
     return response == 'yes' or response == 'y'
 
 def board_full(board):
-    for x in board[1:]:
-        if (x == ' '):
-            return False
-        else:
-            continue
-    else:
-        return True
+    return board.is_full()
 
-def game_loop():
+def game_loop(width=3, height=3, k=3):
     play = True
     while(play):
         players = choose_side()
-        board = [' '] * 10
+        board = new_board(width, height, k)
+        computer = choose_opponent(board)
         turn = choose_first()
 
         # if the player is ready this won't do anything
@@ -131,8 +170,11 @@ def game_loop():
         # the game can start
         game_status = 0
         while(game_status == 0 and not board_full(board)):
-            print_board(board)
-            board = player_input(board, turn, players)
+            print_board(board, players)
+            if (computer and turn % 2 == 1):
+                board = computer_input(board, turn, players)
+            else:
+                board = player_input(board, turn, players)
             game_status = check_game_status(board, players)
             turn += 1
 
@@ -142,19 +184,22 @@ def game_loop():
         else:
             # print result of the game
             # only gets executed if we don't break out of the loop
-            print_board(board)
+            print_board(board, players)
             if (game_status == 0):
-                print('Draw!')
+                frontend.write('Draw!')
             else:
-                print('Player {} wins the game. Congratulations!'.format(game_status))
+                frontend.write('Player {} wins the game. Congratulations!'.format(game_status))
             
         play = play_again()
 
-    print('Until the next time!')
+    frontend.write('Until the next time!')
+    frontend.flush()
 
 ##############################
 ### Start of python script ###
 ##############################
 
-print('Welcome to TicTacToe!\n')
-game_loop()
+# python ticTacToe.py [width height k]   (15 15 5 is gomoku)
+if __name__ == '__main__':
+    frontend.write('Welcome to TicTacToe!\n')
+    game_loop(*[int(arg) for arg in sys.argv[1:4]])
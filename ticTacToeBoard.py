@@ -0,0 +1,151 @@
+'''
+This is a script file with the bitboards of the game in 'ticTacToe.py'. A board is a mask of 9
+bits for every player: the bit of a cell is its position in the game minus one (bit 0 is the
+bottom left cell, position 1, and bit 8 the top right one, position 9). The cells taken are
+the union of both masks.
+As there are only 512 masks, whether a mask has a line ('WINNING') and the free cells of the
+board ('FREE_CELLS') are precomputed for all of them, so checking a win and listing the legal
+moves are a single lookup.
+'MNKBoard' is the board of the m,n,k games: 'k' in a row wins on a board of any size (3,3,3 is
+tic-tac-toe and 15,15,5 is gomoku). Its masks have a bit per cell in the same order (row by
+row from the bottom left cell). Only the lines through the last stone can have been completed
+by a move, so a win is checked by walking at most k - 1 cells in each direction from it.
+All rights reserved.
+'''
+
+# Global variables
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL_BOARD = (1 << CELLS) - 1
+
+# Masks of the 8 lines of the board (rows, columns and diagonals)
+WIN_MASKS = tuple(sum(1 << cell for cell in line) for line in (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6)))
+
+# For every mask of 9 bits, True if it has all the cells of a line
+WINNING = tuple(any(mask & line == line for line in WIN_MASKS) for mask in range(0, 1 << CELLS))
+
+# For every mask of taken cells, the free cells (the legal moves) in order
+FREE_CELLS = tuple(tuple(cell for cell in range(0, CELLS) if not taken >> cell & 1)
+    for taken in range(0, 1 << CELLS))
+
+# Directions of the lines of the m,n,k boards as (rows, columns): row, column and diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+# Script classes
+
+class MNKBoard():
+    '''
+    Class that represents a board of 'width' x 'height' cells where the first player with 'k'
+    stones in a row wins. 'masks' has the stones of every player (Player 1 first). The cells
+    are numbered row by row from the bottom left one, and 'rays' has, for every cell and
+    direction, the next k - 1 cells forward and backward (the only ones that can make a line
+    with it), so the win check of a move doesn't depend on the size of the board.
+    The winner (1 or 2, 0 while there isn't one) is updated by every move. A player can also
+    resign, then 'resigned' is the number of the player.
+    '''
+    def __init__(self, width=SIZE, height=SIZE, k=SIZE):
+        if width <= 0 or height <= 0 or k <= 0 or k > max(width, height):
+            raise ValueError('Invalid board: {0}x{1} with {2} in a row.'.format(width, height, k))
+        self.width = width
+        self.height = height
+        self.k = k
+        self.cells = width * height
+        self.full = (1 << self.cells) - 1
+        self.masks = [0, 0]
+        self.moves = 0
+        self.last_move = None
+        self.winner = 0
+        self.resigned = None
+        self.rays = [tuple((self.__ray__(cell, dRow, dColumn), self.__ray__(cell, -dRow, -dColumn))
+            for dRow, dColumn in DIRECTIONS) for cell in range(0, self.cells)]
+
+    def is_free(self, cell):
+        return not (self.masks[0] | self.masks[1]) >> cell & 1
+
+    def is_full(self):
+        return self.masks[0] | self.masks[1] == self.full
+
+    def legal_moves(self):
+        '''
+        Returns the free cells of the board in order.
+        '''
+        taken = self.masks[0] | self.masks[1]
+        if self.cells == CELLS:
+            return FREE_CELLS[taken]
+        return [cell for cell in range(0, self.cells) if not taken >> cell & 1]
+
+    def play(self, cell, player):
+        '''
+        Puts a stone of the player (0 for Player 1, 1 for Player 2) in the cell. Returns True if
+        the move wins the game.
+        '''
+        self.masks[player] |= 1 << cell
+        self.moves += 1
+        self.last_move = cell
+        if self.is_winning_move(cell, player):
+            self.winner = player + 1
+            return True
+        return False
+
+    def undo(self, cell, player):
+        '''
+        Takes back the last move (the stone of the player in the cell).
+        '''
+        self.masks[player] &= ~(1 << cell)
+        self.moves -= 1
+        self.last_move = None
+        self.winner = 0
+
+    def resign(self, player):
+        self.resigned = player + 1
+
+    def is_winning_move(self, cell, player):
+        '''
+        Returns True if the stone of the player in the cell is part of a line of k stones.
+        '''
+        mask = self.masks[player]
+        k = self.k
+        for forward, backward in self.rays[cell]:
+            count = 1
+            for other in forward:
+                if not mask >> other & 1:
+                    break
+                count += 1
+            for other in backward:
+                if not mask >> other & 1:
+                    break
+                count += 1
+            if count >= k:
+                return True
+        return False
+
+    def __ray__(self, cell, dRow, dColumn):
+        row, column = divmod(cell, self.width)
+        ray = []
+        for _ in range(1, self.k):
+            row += dRow
+            column += dColumn
+            if not (0 <= row < self.height and 0 <= column < self.width):
+                break
+            ray.append(row * self.width + column)
+        return tuple(ray)
+
+
+# Global functions
+
+def is_win(mask):
+    return WINNING[mask]
+
+def is_full(taken):
+    return taken == FULL_BOARD
+
+def legal_moves(taken):
+    '''
+    Returns the free cells (bits) of the board with the cells in 'taken'.
+    '''
+    return FREE_CELLS[taken]
@@ -0,0 +1,309 @@
+'''
+This is a script file that plays the game in 'ticTacToe.py' between computer agents, without
+the frontend of the game, to measure how the agents do against each other. Thousands of games
+are played in lockstep: every step makes a move in every game that hasn't finished, and the
+wins are checked with the lookup table of the bitboards (see 'ticTacToeBoard.py').
+An agent chooses uniformly among a set of moves of every position (all the free cells for the
+random agent, the moves with the best value for the perfect one). As there are only 5478
+positions that can be reached, the sets of an agent are computed once for all of them, as a
+mask of cells indexed by the position ('MOVE_TABLE_SIZE'), so a move is two lookups.
+Every pair of agents plays the same number of games with each of them moving first. The report
+has the wins, draws and losses of every match and the advantage of moving first.
+    python ticTacToeSelfPlay.py --games 1000000
+    python ticTacToeSelfPlay.py --agents perfect heuristic --games 100000 --seed 7
+NumPy is optional: with it every step is a few vectorized operations over all the games,
+without it the games are stepped with the standard library (much slower).
+All rights reserved.
+'''
+
+# Imports
+
+import argparse
+from array import array
+from sys import argv
+
+from randomStreams import RandomStream
+from ticTacToeBoard import CELLS, FULL_BOARD, WINNING, FREE_CELLS
+from ticTacToeTablebase import load_tablebase
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Global variables
+
+# Positions are indexed by the cells of the player to move and the ones of the opponent
+MOVE_TABLE_SIZE = 1 << (2 * CELLS)
+
+CENTER = 1 << 4
+CORNERS = 1 << 0 | 1 << 2 | 1 << 6 | 1 << 8
+
+# Cells of every mask of 9 bits, to pick one of the choices of an agent
+CHOICE_CELLS = tuple(FREE_CELLS[FULL_BOARD ^ mask] for mask in range(0, 1 << CELLS))
+if numpy is not None:
+    CHOICE_CELLS_ARRAY = numpy.array([cells + (0,) * (CELLS - len(cells))
+        for cells in CHOICE_CELLS], dtype=numpy.int64)
+    CHOICE_COUNTS_ARRAY = numpy.array([len(cells) for cells in CHOICE_CELLS], dtype=numpy.int64)
+    # the same tables as arrays, indexed by arrays of masks
+    WINNING_ARRAY = numpy.array(WINNING, dtype=bool)
+
+# Games played in lockstep at once
+BATCH_SIZE = 1 << 16
+GAMES = 100000
+
+
+# Script classes
+
+class Agent():
+    '''
+    Class that represents a player of the game. 'choices' returns the mask of the cells among
+    which the agent chooses (uniformly) the move of a position, given by the cells of the player
+    to move and the ones of the opponent. The choices of every position are computed once (see
+    'move_table').
+    '''
+    name = None
+
+    def __init__(self):
+        self.table = None
+
+    def choices(self, mover, opponent):
+        raise NotImplementedError("Abstract method. Subclasses must define it")
+
+    def move_table(self):
+        '''
+        Returns the choices of every position that can be reached, indexed by
+        'mover << CELLS | opponent' (0 for the rest of the positions).
+        '''
+        if self.table is None:
+            self.table = array('H', bytes(2 * MOVE_TABLE_SIZE))
+            for mover, opponent in reachable_positions():
+                self.table[mover << CELLS | opponent] = self.choices(mover, opponent)
+        return self.table
+
+class RandomAgent(Agent):
+    '''
+    Agent that plays any free cell.
+    '''
+    name = 'random'
+
+    def choices(self, mover, opponent):
+        return FULL_BOARD ^ (mover | opponent)
+
+class PerfectAgent(Agent):
+    '''
+    Agent that plays the best moves of the tablebase (see 'ticTacToeTablebase.py'), so it
+    never loses and it wins as soon as it can.
+    '''
+    name = 'perfect'
+
+    def choices(self, mover, opponent):
+        return load_tablebase().best_moves(mover, opponent)
+
+class HeuristicAgent(Agent):
+    '''
+    Agent that plays the rules of thumb: win if it can, otherwise block the line of the
+    opponent, otherwise take the center, a corner or any cell, in this order.
+    '''
+    name = 'heuristic'
+
+    def choices(self, mover, opponent):
+        free = FREE_CELLS[mover | opponent]
+        for player in (mover, opponent):
+            lines = sum(1 << cell for cell in free if WINNING[player | 1 << cell])
+            if lines:
+                return lines
+        freeMask = FULL_BOARD ^ (mover | opponent)
+        for preferred in (CENTER, CORNERS):
+            if freeMask & preferred:
+                return freeMask & preferred
+        return freeMask
+
+AGENTS = {agent.name: agent for agent in (RandomAgent, PerfectAgent, HeuristicAgent)}
+
+class MatchResult():
+    '''
+    Class that contains the results of the games between two agents with the same one moving
+    first. 'moves' is the total number of moves of the games.
+    '''
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+        self.games = 0
+        self.first_wins = 0
+        self.second_wins = 0
+        self.draws = 0
+        self.moves = 0
+
+    def merge(self, other):
+        self.games += other.games
+        self.first_wins += other.first_wins
+        self.second_wins += other.second_wins
+        self.draws += other.draws
+        self.moves += other.moves
+
+    def first_move_advantage(self):
+        '''
+        Wins of the first player minus wins of the second one, per game.
+        '''
+        return (self.first_wins - self.second_wins) / self.games if self.games else 0.0
+
+    def __str__(self):
+        games = max(self.games, 1)
+        return ('{0:>9} vs {1:<9} {2:>10,} {3:>8.2%} {4:>8.2%} {5:>8.2%} {6:>+9.2%} '
+            '{7:>6.2f}').format(self.first, self.second, self.games, self.first_wins / games,
+            self.draws / games, self.second_wins / games, self.first_move_advantage(),
+            self.moves / games)
+
+class SelfPlay():
+    '''
+    Plays games between two agents (the first one moves first) in batches of 'batch_size'
+    games played in lockstep.
+    '''
+    def __init__(self, first, second, rng=None, batch_size=BATCH_SIZE):
+        self.first = first
+        self.second = second
+        self.rng = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+        self.batch_size = batch_size
+
+    def run(self, games, result=None):
+        '''
+        Plays 'games' games and returns their 'MatchResult' (added to 'result' if given).
+        '''
+        if result is None:
+            result = MatchResult(self.first.name, self.second.name)
+        tables = (self.first.move_table(), self.second.move_table())
+        if numpy is not None:
+            # one generator for all the batches, so that every batch plays other games
+            generator = self.rng.numpy_generator()
+            tables = [numpy.frombuffer(table, dtype=numpy.uint16) for table in tables]
+        played = 0
+        while played < games:
+            batch = min(self.batch_size, games - played)
+            if numpy is not None:
+                result.merge(self.__play_numpy__(tables, batch, generator))
+            else:
+                result.merge(self.__play_lockstep__(tables, batch))
+            played += batch
+        return result
+
+    def __play_numpy__(self, tables, games, generator):
+        result = MatchResult(self.first.name, self.second.name)
+        mover = numpy.zeros(games, dtype=numpy.int64)
+        opponent = numpy.zeros(games, dtype=numpy.int64)
+        for move in range(0, CELLS):
+            result.moves += mover.size
+            choices = tables[move % 2][mover << CELLS | opponent]
+            picks = generator.random(mover.size) * CHOICE_COUNTS_ARRAY[choices]
+            picks = picks.astype(numpy.int64)
+            mover |= 1 << CHOICE_CELLS_ARRAY[choices, picks]
+            won = WINNING_ARRAY[mover]
+            wins = int(numpy.count_nonzero(won))
+            if move % 2 == 0:
+                result.first_wins += wins
+            else:
+                result.second_wins += wins
+            playing = ~won
+            mover, opponent = opponent[playing], mover[playing]
+        result.draws = mover.size
+        result.games = games
+        return result
+
+    def __play_lockstep__(self, tables, games):
+        random = self.rng.random
+        result = MatchResult(self.first.name, self.second.name)
+        boards = [(0, 0)] * games
+        for move in range(0, CELLS):
+            result.moves += len(boards)
+            table = tables[move % 2]
+            playing = []
+            for mover, opponent in boards:
+                cells = CHOICE_CELLS[table[mover << CELLS | opponent]]
+                mover |= 1 << cells[int(random() * len(cells))]
+                if not WINNING[mover]:
+                    playing.append((opponent, mover))
+            wins = len(boards) - len(playing)
+            if move % 2 == 0:
+                result.first_wins += wins
+            else:
+                result.second_wins += wins
+            boards = playing
+        result.draws = len(boards)
+        result.games = games
+        return result
+
+
+# Global functions
+
+def reachable_positions():
+    '''
+    Returns the positions that can be reached from the empty board and aren't finished, as
+    (cells of the player to move, cells of the opponent).
+    '''
+    positions = set()
+    pending = [(0, 0)]
+    while pending:
+        position = pending.pop()
+        mover, opponent = position
+        if position in positions or WINNING[opponent] or mover | opponent == FULL_BOARD:
+            continue
+        positions.add(position)
+        for cell in FREE_CELLS[mover | opponent]:
+            pending.append((opponent, mover | 1 << cell))
+    return positions
+
+def play_matches(agentNames, games=GAMES, seed=None, batch_size=BATCH_SIZE):
+    '''
+    Plays 'games' games between every pair of agents (and every agent against itself) with
+    each of them moving first. Returns the 'MatchResult' of every match, in the order played.
+    '''
+    agents = [AGENTS[name]() for name in agentNames]
+    rng = RandomStream(seed)
+    results = []
+    for index, agent in enumerate(agents):
+        for other in agents[index:]:
+            pairs = ((agent, other),) if agent is other else ((agent, other), (other, agent))
+            for first, second in pairs:
+                results.append(SelfPlay(first, second, rng.split(), batch_size).run(games))
+    return results
+
+def show_pairs(results):
+    '''
+    Shows the wins, draws and losses of the first agent of every pair whatever the order, and
+    the advantage of moving first (mean of both orders).
+    '''
+    byPair = {(result.first, result.second): result for result in results}
+    for result in results:
+        reverse = byPair.get((result.second, result.first))
+        # every pair is shown once, with the agent that moved first in its first match
+        if (result.first == result.second or reverse is None
+                or results.index(reverse) < results.index(result)):
+            continue
+        games = result.games + reverse.games
+        wins = result.first_wins + reverse.second_wins
+        losses = result.second_wins + reverse.first_wins
+        print('{0:>9} vs {1:<9} won {2:>7.2%} drew {3:>7.2%} lost {4:>7.2%}  first-move '
+            'advantage {5:>+7.2%}'.format(result.first, result.second, wins / games,
+            (games - wins - losses) / games, losses / games,
+            (result.first_move_advantage() + reverse.first_move_advantage()) / 2))
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Self-play of Tic-Tac-Toe agents.')
+    parser.add_argument('--agents', nargs='+', default=list(AGENTS), choices=sorted(AGENTS))
+    parser.add_argument('--games', type=int, default=GAMES, help='games of every match')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='games played in lockstep')
+    parser.add_argument('--seed', type=int, default=None)
+    options = parser.parse_args(args)
+
+    results = play_matches(options.agents, options.games, options.seed, options.batch)
+    print('    first vs second         games    first    draws   second  advantage  moves')
+    for result in results:
+        print(result)
+    print()
+    show_pairs(results)
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,231 @@
+'''
+This is a script file with a perfect player for the game in 'ticTacToe.py'. The positions are
+searched with negamax and alpha-beta pruning, and every position searched is stored in a
+transposition table. The positions are stored in their canonical form (the smallest of the 8
+rotations and reflections of the board), so the table needs 627 entries at most and the whole
+game is solved in a few milliseconds the first time a move is asked. After that every move is
+a lookup in the table.
+    python ticTacToeSolver.py           -> solve the game and show the value of the openings
+The positions are given as two bitboards (see 'ticTacToeBoard.py'), one with the cells of the
+player to move and the other with the cells of the opponent.
+The values are seen from the player to move: a win is worth the empty cells left after it plus
+one (so that the fastest wins are preferred, and the slowest losses), a draw is worth 0 and a
+loss is the opposite of the win of the opponent.
+All rights reserved.
+'''
+
+# Imports
+
+import time
+from sys import argv
+
+from ticTacToeBoard import SIZE, CELLS, FULL_BOARD, WINNING
+
+
+# Global variables
+
+# Cells of the board where every symmetry moves every cell (rotations and reflections of the
+# coordinates, the first one is the identity)
+SYMMETRIES = tuple(tuple(row * SIZE + column for row, column in (transform(cell // SIZE,
+    cell % SIZE) for cell in range(0, CELLS))) for transform in (
+        lambda row, column: (row, column),
+        lambda row, column: (column, SIZE - 1 - row),
+        lambda row, column: (SIZE - 1 - row, SIZE - 1 - column),
+        lambda row, column: (SIZE - 1 - column, row),
+        lambda row, column: (row, SIZE - 1 - column),
+        lambda row, column: (SIZE - 1 - row, column),
+        lambda row, column: (column, row),
+        lambda row, column: (SIZE - 1 - column, SIZE - 1 - row)))
+# Cells that every symmetry moves to every cell (to undo the symmetries)
+INVERSE_SYMMETRIES = tuple(tuple(symmetry.index(cell) for cell in range(0, CELLS))
+    for symmetry in SYMMETRIES)
+# Every mask of 9 bits moved by every symmetry, so a board is transformed with two lookups
+SYMMETRY_MASKS = tuple(tuple(sum(1 << symmetry[cell] for cell in range(0, CELLS)
+    if mask >> cell & 1) for mask in range(0, 1 << CELLS)) for symmetry in SYMMETRIES)
+
+# Order in which the moves are searched: center, corners and edges (the best moves are
+# usually found first, which prunes more)
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+# For every mask of taken cells, the free cells in the order of 'MOVE_ORDER'
+ORDERED_MOVES = tuple(tuple(move for move in MOVE_ORDER if not taken >> move & 1)
+    for taken in range(0, 1 << CELLS))
+
+# Types of the values stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+INFINITY = CELLS + 2
+
+
+# Script classes
+
+class Solver():
+    '''
+    Class that plays the game perfectly. The transposition table ('table') has an entry for
+    every canonical position searched: (value, type of value, best move). The best move is
+    stored in the canonical orientation and it's only meaningful for exact values.
+    The solver can be shared by many games: once a position is solved its entry never changes.
+    '''
+    def __init__(self):
+        self.table = {}
+        self.nodes = 0
+
+    def best_move(self, mover, opponent):
+        '''
+        Returns the cell (bit) of the best move for the player to move. Among the moves with
+        the same value the first one of the canonical board is taken.
+        '''
+        key, symmetry = canonical(mover, opponent)
+        entry = self.table.get(key)
+        if entry is None or entry[1] != EXACT:
+            self.__search_root__(SYMMETRY_MASKS[symmetry][mover],
+                SYMMETRY_MASKS[symmetry][opponent], key)
+            entry = self.table[key]
+        return INVERSE_SYMMETRIES[symmetry][entry[2]]
+
+    def value(self, mover, opponent):
+        '''
+        Returns the value of the position for the player to move (see the module docstring).
+        '''
+        if is_win(opponent):
+            return -win_value(mover | opponent)
+        if mover | opponent == FULL_BOARD:
+            return 0
+        key, symmetry = canonical(mover, opponent)
+        entry = self.table.get(key)
+        if entry is None or entry[1] != EXACT:
+            self.__search_root__(SYMMETRY_MASKS[symmetry][mover],
+                SYMMETRY_MASKS[symmetry][opponent], key)
+            entry = self.table[key]
+        return entry[0]
+
+    def solve(self):
+        '''
+        Solves every position that can be reached from the empty board, so that all the moves
+        are lookups afterwards. Returns the number of canonical positions in the table.
+        '''
+        seen = set()
+        pending = [(0, 0)]
+        while pending:
+            mover, opponent = pending.pop()
+            key = canonical(mover, opponent)[0]
+            if key in seen or is_win(opponent) or mover | opponent == FULL_BOARD:
+                continue
+            seen.add(key)
+            self.best_move(mover, opponent)
+            for move in legal_moves(mover, opponent):
+                pending.append((opponent, mover | 1 << move))
+        return len(seen)
+
+    def __search_root__(self, mover, opponent, key):
+        # the root is searched with the whole window so that its value is exact, whatever
+        # bound of it is in the table
+        bestValue = -INFINITY
+        bestMove = None
+        alpha = -INFINITY
+        for move in legal_moves(mover, opponent):
+            value = -self.__negamax__(opponent, mover | 1 << move, -INFINITY, -alpha)
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+                alpha = max(alpha, value)
+        self.table[key] = (bestValue, EXACT, bestMove)
+
+    def __negamax__(self, mover, opponent, alpha, beta):
+        self.nodes += 1
+        if is_win(opponent):
+            return -win_value(mover | opponent)
+        if mover | opponent == FULL_BOARD:
+            return 0
+        key, symmetry = canonical(mover, opponent)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, valueType, _ = entry
+            if valueType == EXACT:
+                return value
+            if valueType == LOWER_BOUND:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+        originalAlpha = alpha
+        bestValue = -INFINITY
+        bestMove = None
+        for move in legal_moves(mover, opponent):
+            value = -self.__negamax__(opponent, mover | 1 << move, -beta, -alpha)
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        if bestValue <= originalAlpha:
+            valueType = UPPER_BOUND
+        elif bestValue >= beta:
+            valueType = LOWER_BOUND
+        else:
+            valueType = EXACT
+        # a bound never replaces an exact value
+        if entry is None or entry[1] != EXACT:
+            self.table[key] = (bestValue, valueType, SYMMETRIES[symmetry][bestMove])
+        return bestValue
+
+# Solver shared by all the games (see 'best_move')
+SOLVER = Solver()
+
+
+# Global functions
+
+def canonical(mover, opponent):
+    '''
+    Returns the key of the canonical form of the position (the smallest key of its 8
+    symmetries) and the symmetry that gives it.
+    '''
+    bestKey = mover << CELLS | opponent
+    bestSymmetry = 0
+    for symmetry in range(1, len(SYMMETRIES)):
+        masks = SYMMETRY_MASKS[symmetry]
+        key = masks[mover] << CELLS | masks[opponent]
+        if key < bestKey:
+            bestKey = key
+            bestSymmetry = symmetry
+    return bestKey, bestSymmetry
+
+def is_win(mask):
+    return WINNING[mask]
+
+def win_value(occupied):
+    '''
+    Value of a win for the player that made it when the cells in 'occupied' are taken.
+    '''
+    return CELLS - bin(occupied).count('1') + 1
+
+def legal_moves(mover, opponent):
+    return ORDERED_MOVES[mover | opponent]
+
+def best_move(mover, opponent):
+    '''
+    Best move of the shared solver ('SOLVER').
+    '''
+    return SOLVER.best_move(mover, opponent)
+
+def main(args):
+    solver = Solver()
+    start = time.perf_counter()
+    positions = solver.solve()
+    elapsed = time.perf_counter() - start
+    print('Solved {0} canonical positions in {1:.1f} ms ({2} nodes searched)'.format(positions,
+        elapsed * 1000, solver.nodes))
+    print('Value of the game: {0}'.format(solver.value(0, 0)))
+    print('Openings (value for the first player):')
+    for move in (4, 0, 1):
+        print('    cell {0}: {1}'.format(move + 1, -solver.value(0, 1 << move)))
+    print('Best opening: cell {0}'.format(solver.best_move(0, 0) + 1))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,264 @@
+'''
+This is a script file that computes the tablebases of the m,n,k games of 'ticTacToe.py' (see
+'MNKBoard' in 'ticTacToeBoard.py') and stores them in binary files, so that every board is
+solved only once. A tablebase has the result (win, loss or draw for the player to move) and
+the moves left until the end of the game with perfect play of every position that can be
+reached. It's computed by retrograde analysis: the positions are grouped by the stones on the
+board and solved from the full boards back to the empty one, so the positions after every move
+of a position are always solved before it.
+Every cell of a position is empty, a stone of the player to move or one of the opponent, so
+the cells read as a number in base 3 are a perfect hash of the position: the tablebase is a
+flat array of 3 ^ cells entries of one byte. The files are memory-mapped when they are loaded
+(nothing is parsed), so all the processes that play the same board share one copy of them and
+every lookup is a single index.
+    python ticTacToeTablebase.py              -> tablebase of the classic 3 x 3 game
+    python ticTacToeTablebase.py 4 3 3        -> tablebase of the 4 x 3 board with 3 in a row
+All rights reserved.
+'''
+
+# Imports
+
+import os
+import struct
+import time
+from mmap import mmap, ACCESS_READ
+from sys import argv
+
+from ticTacToeBoard import SIZE, MNKBoard
+
+
+# Global variables
+
+# Tablebases loaded in this process, by their board (width, height, k)
+LOADED_TABLEBASES = {}
+
+# Directory where the tablebases are stored
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+# Largest board that a tablebase is computed for (the file has 3 ^ cells bytes)
+MAX_CELLS = 12
+
+# Results of the positions for the player to move, in the 2 lower bits of every entry. The
+# positions that can't be reached are UNKNOWN.
+UNKNOWN = 0
+WIN = 1
+LOSS = 2
+DRAW = 3
+RESULTS = {UNKNOWN: 'unknown', WIN: 'win', LOSS: 'loss', DRAW: 'draw'}
+# The moves left until the end of the game are in the rest of the bits
+DISTANCE_SHIFT = 2
+MAX_DISTANCE = 1 << (8 - DISTANCE_SHIFT)
+
+# File format: header (with the board) and one byte per entry
+MAGIC = b'TTTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBB')
+
+
+# Script classes
+
+class Tablebase():
+    '''
+    Class that holds the tablebase of a board. 'entries' has a byte per position (see
+    'index'), it can be a bytearray or a memoryview of a memory-mapped file. The positions are
+    given as two masks of cells (see 'MNKBoard'): the stones of the player to move and the
+    ones of the opponent.
+    '''
+    def __init__(self, width, height, k, entries):
+        self.width = width
+        self.height = height
+        self.k = k
+        self.cells = width * height
+        self.full = (1 << self.cells) - 1
+        self.entries = entries
+        self.powers = [3 ** cell for cell in range(0, self.cells)]
+        # number in base 3 with a 1 in the digit of every cell of every mask
+        self.ternary = [0] * (1 << self.cells)
+        for mask in range(1, 1 << self.cells):
+            lowest = mask & -mask
+            self.ternary[mask] = self.ternary[mask ^ lowest] + 3 ** (lowest.bit_length() - 1)
+
+    def index(self, mover, opponent):
+        return self.ternary[mover] + 2 * self.ternary[opponent]
+
+    def result(self, mover, opponent):
+        return self.entries[self.index(mover, opponent)] & (1 << DISTANCE_SHIFT) - 1
+
+    def distance(self, mover, opponent):
+        '''
+        Moves left until the end of the game when both players play perfectly.
+        '''
+        return self.entries[self.index(mover, opponent)] >> DISTANCE_SHIFT
+
+    def best_moves(self, mover, opponent):
+        '''
+        Returns the mask of the cells of the best moves for the player to move: the fastest
+        wins, otherwise the draws, otherwise the slowest losses.
+        '''
+        entries = self.entries
+        # the position after a move is the one of the opponent with a stone of the player to
+        # move in the cell (a 2 in its digit)
+        base = self.index(opponent, mover)
+        bestMoves = 0
+        bestRank = -1
+        free = self.full ^ (mover | opponent)
+        for cell in range(0, self.cells):
+            if not free >> cell & 1:
+                continue
+            rank = MOVE_RANKS[entries[base + 2 * self.powers[cell]]]
+            if rank > bestRank:
+                bestMoves = 1 << cell
+                bestRank = rank
+            elif rank == bestRank:
+                bestMoves |= 1 << cell
+        return bestMoves
+
+    def best_move(self, mover, opponent):
+        '''
+        Returns the cell of the best move for the player to move (the first one of the best
+        moves). The position can't be finished.
+        '''
+        bestMoves = self.best_moves(mover, opponent)
+        return (bestMoves & -bestMoves).bit_length() - 1
+
+    def save(self, path):
+        # the file is written apart and renamed, so other processes never read half a file
+        temporaryPath = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temporaryPath, 'wb') as tablebaseFile:
+            tablebaseFile.write(HEADER.pack(MAGIC, VERSION, self.width, self.height, self.k))
+            tablebaseFile.write(self.entries)
+        os.replace(temporaryPath, path)
+
+    def __str__(self):
+        counts = {result: 0 for result in RESULTS}
+        for entry in self.entries:
+            counts[entry & (1 << DISTANCE_SHIFT) - 1] += 1
+        return '{0}x{1} board with {2} in a row: {3} positions ({4})'.format(self.width,
+            self.height, self.k, len(self.entries) - counts[UNKNOWN], ', '.join('{0} {1}'.format(
+            counts[result], name) for result, name in RESULTS.items() if result != UNKNOWN))
+
+
+# Global functions
+
+def __move_rank__(entry):
+    # the entry is the one of the opponent after the move: its losses are the wins of the
+    # move (the fastest ones first) and its wins are the losses (the slowest ones first)
+    result = entry & (1 << DISTANCE_SHIFT) - 1
+    distance = entry >> DISTANCE_SHIFT
+    if result == LOSS:
+        return 3 * MAX_DISTANCE - distance
+    if result == DRAW:
+        return MAX_DISTANCE
+    return distance
+
+def tablebase_path(width, height, k):
+    return os.path.join(TABLEBASE_DIR, 'tablebase_{0}x{1}_{2}.bin'.format(width, height, k))
+
+def load_tablebase(width=SIZE, height=SIZE, k=SIZE):
+    '''
+    Loads the tablebase of the board from disk by memory-mapping the file. If the file doesn't
+    exist (or is not valid) the tablebase is computed and saved first. The tablebases loaded
+    are kept by their board, so every board is loaded only once.
+    '''
+    board = (width, height, k)
+    if board in LOADED_TABLEBASES:
+        return LOADED_TABLEBASES[board]
+    path = tablebase_path(width, height, k)
+    tablebase = read_tablebase(path, width, height, k)
+    if tablebase is None:
+        os.makedirs(TABLEBASE_DIR, exist_ok=True)
+        compute_tablebase(width, height, k).save(path)
+        tablebase = read_tablebase(path, width, height, k)
+    LOADED_TABLEBASES[board] = tablebase
+    return tablebase
+
+def read_tablebase(path, width, height, k):
+    '''
+    Memory-maps the tablebase stored in the file. Returns None if the file doesn't exist or it
+    doesn't contain the tablebase of the board.
+    '''
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as tablebaseFile:
+        if os.fstat(tablebaseFile.fileno()).st_size != HEADER.size + 3 ** (width * height):
+            return None
+        # the mapping stays valid after closing the file
+        data = mmap(tablebaseFile.fileno(), 0, access=ACCESS_READ)
+    if HEADER.unpack_from(data) != (MAGIC, VERSION, width, height, k):
+        data.close()
+        return None
+    return Tablebase(width, height, k, memoryview(data)[HEADER.size:])
+
+def compute_tablebase(width=SIZE, height=SIZE, k=SIZE):
+    '''
+    Computes the tablebase of the board by retrograde analysis (see the module docstring).
+    '''
+    board = MNKBoard(width, height, k)
+    if board.cells > MAX_CELLS:
+        raise ValueError('The board is too big for a tablebase: {0} cells (the maximum is '
+            '{1}).'.format(board.cells, MAX_CELLS))
+    tablebase = Tablebase(width, height, k, bytearray(3 ** board.cells))
+    entries = tablebase.entries
+    # positions that aren't finished, grouped by the stones on the board
+    layers = [{(0, 0)}]
+    for _ in range(0, board.cells - 1):
+        layer = set()
+        for mover, opponent in layers[-1]:
+            board.masks = [mover, opponent]
+            for cell in board.legal_moves():
+                if board.play(cell, 0):
+                    board.undo(cell, 0)
+                    continue
+                board.undo(cell, 0)
+                if mover | opponent | 1 << cell != board.full:
+                    layer.add((opponent, mover | 1 << cell))
+        layers.append(layer)
+    for layer in reversed(layers):
+        for mover, opponent in layer:
+            board.masks = [mover, opponent]
+            bestWin = None
+            bestDraw = None
+            worstLoss = None
+            for cell in board.legal_moves():
+                child = tablebase.index(opponent, mover | 1 << cell)
+                if board.play(cell, 0):
+                    entries[child] = 0 << DISTANCE_SHIFT | LOSS
+                elif board.is_full():
+                    entries[child] = 0 << DISTANCE_SHIFT | DRAW
+                board.undo(cell, 0)
+                # the result of the opponent after the move
+                result = entries[child] & (1 << DISTANCE_SHIFT) - 1
+                distance = (entries[child] >> DISTANCE_SHIFT) + 1
+                if result == LOSS:
+                    bestWin = distance if bestWin is None else min(bestWin, distance)
+                elif result == DRAW:
+                    bestDraw = distance if bestDraw is None else min(bestDraw, distance)
+                else:
+                    worstLoss = distance if worstLoss is None else max(worstLoss, distance)
+            if bestWin is not None:
+                entry = bestWin << DISTANCE_SHIFT | WIN
+            elif bestDraw is not None:
+                entry = bestDraw << DISTANCE_SHIFT | DRAW
+            else:
+                entry = worstLoss << DISTANCE_SHIFT | LOSS
+            entries[tablebase.index(mover, opponent)] = entry
+    return tablebase
+
+# How good a move is for the player that makes it, for every entry of the position after it
+# (see 'Tablebase.best_moves')
+MOVE_RANKS = tuple(__move_rank__(entry) for entry in range(0, 256))
+
+def main(args):
+    width, height, k = [int(arg) for arg in args[:3]] if len(args) >= 3 else (SIZE, SIZE, SIZE)
+    start = time.perf_counter()
+    tablebase = load_tablebase(width, height, k)
+    elapsed = time.perf_counter() - start
+    print(tablebase)
+    print('Loaded in {0:.1f} ms from {1}'.format(elapsed * 1000, tablebase_path(width, height, k)))
+    print('Empty board: {0} in {1} moves for the first player, best opening: cell {2}'.format(
+        RESULTS[tablebase.result(0, 0)], tablebase.distance(0, 0), tablebase.best_move(0, 0) + 1))
+
+# Script call to main function
+
+if __name__ == '__main__':
+    main(argv[1:])